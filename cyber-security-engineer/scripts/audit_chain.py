@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""Hash chain and HMAC checkpoints for the privileged audit log, and its verifier.
+
+audit_logger appends two fields, last, to every record it writes:
+
+  seq   position in the chain: 1, 2, 3, ... across rotated segments
+  prev  sha256 (hex) of the previous record's line, without the newline;
+        64 zeros for the first record ever chained, or the digest of the
+        last unchained line when an existing log is upgraded
+
+Every OPENCLAW_AUDIT_CHECKPOINT_EVERY records (default 256) the writer
+inserts an "audit_checkpoint" record whose "hmac" is
+HMAC-SHA256(key, "<seq>:<prev>") with the key in
+~/.openclaw/security/audit-hmac.key (created 0600 on first use; override
+with OPENCLAW_AUDIT_HMAC_KEY_FILE). Batches are chained and appended under
+the exclusive log lock, so seq order is file order. Rotation stores the
+chain head in "<log>.chain" so the next segment continues the chain.
+
+`audit_chain.py verify` starts from the last verified checkpoint in
+~/.openclaw/security/audit-verify-state.json, re-checks that the anchor record
+is unchanged, skips sealed segments that end before it (manifest seq
+ranges), seeks into the rest via the audit_index sidecar, and checks every
+later record's seq and prev and every checkpoint's HMAC. On success the
+newest checkpoint becomes the next anchor, so each run costs roughly the
+records written since the previous one, and the last record verified is
+remembered so a later run notices if it was cut off or changed. --full
+re-verifies everything.
+
+What this detects: edits, deletions, insertions and reordering of records,
+and truncation of anything verified before. An attacker running as the same user
+can read the key and rebuild the chain from scratch, so keep the digest
+that verify prints (live_assessment records it each cycle) somewhere that
+user cannot write, or point OPENCLAW_AUDIT_HMAC_KEY_FILE at storage they
+cannot read. No network calls are made.
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Allow importing sibling modules when executed from arbitrary cwd.
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from audit_segments import (  # noqa: E402
+    AUDIT_LOG,
+    PENDING_PREFIX,
+    file_lock,
+    load_manifest,
+    manifest_lock_path,
+    segment_files,
+)
+
+GENESIS = "0" * 64
+CHECKPOINT_ACTION = "audit_checkpoint"
+DEFAULT_CHECKPOINT_EVERY = 256
+KEY_PATH = Path.home() / ".openclaw" / "security" / "audit-hmac.key"
+VERIFY_STATE = Path.home() / ".openclaw" / "security" / "audit-verify-state.json"
+_TAIL_READ = 65536
+
+
+def checkpoint_every() -> int:
+    try:
+        value = int(os.environ.get("OPENCLAW_AUDIT_CHECKPOINT_EVERY", DEFAULT_CHECKPOINT_EVERY))
+    except ValueError:
+        return DEFAULT_CHECKPOINT_EVERY
+    return value if value > 0 else DEFAULT_CHECKPOINT_EVERY
+
+
+def key_path() -> Path:
+    override = os.environ.get("OPENCLAW_AUDIT_HMAC_KEY_FILE")
+    return Path(override).expanduser() if override else KEY_PATH
+
+
+def load_key(create: bool = False) -> Optional[bytes]:
+    """The checkpoint HMAC key; with create=True a random one is made (0600) if missing."""
+    path = key_path()
+    try:
+        return bytes.fromhex(path.read_text(encoding="utf-8").strip())
+    except FileNotFoundError:
+        if not create:
+            return None
+    except (OSError, ValueError):
+        return None
+    key = os.urandom(32)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(str(path), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        return load_key(create=False)  # another process won the race
+    except OSError:
+        return None
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(key.hex() + "\n")
+    return key
+
+
+def line_digest(line: bytes) -> str:
+    return hashlib.sha256(line.rstrip(b"\n")).hexdigest()
+
+
+def checkpoint_mac(key: bytes, seq: int, prev: str) -> str:
+    return hmac.new(key, f"{seq}:{prev}".encode("ascii"), hashlib.sha256).hexdigest()
+
+
+def _seq_of(line: bytes) -> Optional[int]:
+    try:
+        seq = json.loads(line).get("seq")
+    except (ValueError, AttributeError):
+        return None
+    return seq if isinstance(seq, int) else None
+
+
+def _last_line(path: Path) -> Optional[bytes]:
+    """Last complete line of a file (reads at most its final 64 KiB)."""
+    try:
+        with path.open("rb") as f:
+            size = f.seek(0, os.SEEK_END)
+            f.seek(max(0, size - _TAIL_READ))
+            tail = f.read()
+    except OSError:
+        return None
+    end = tail.rfind(b"\n")
+    if end < 0:
+        return None
+    start = tail.rfind(b"\n", 0, end) + 1
+    line = tail[start : end + 1]
+    return line if line.strip() else None
+
+
+def head_path(active: Path) -> Path:
+    return active.with_name(active.name + ".chain")
+
+
+def head_of(active: Path) -> Tuple[int, str]:
+    """(seq, digest) of the newest record: the active log's last line, else the head saved at rotation."""
+    last = _last_line(active)
+    if last is not None:
+        return _seq_of(last) or 0, line_digest(last)
+    try:
+        data = json.loads(head_path(active).read_text(encoding="utf-8"))
+        return int(data["seq"]), str(data["digest"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return 0, GENESIS
+
+
+def save_head(active: Path) -> None:
+    """Record the chain head before the active log is rotated away (caller holds the log lock)."""
+    last = _last_line(active)
+    if last is None:
+        return
+    path = head_path(active)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    fd = os.open(str(tmp), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({"seq": _seq_of(last) or 0, "digest": line_digest(last)}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _link(line: bytes, seq: int, prev: str) -> bytes:
+    body = line.rstrip(b"\n")
+    return body[:-1] + f',"seq":{seq},"prev":"{prev}"}}\n'.encode("ascii")
+
+
+class Chain:
+    """Links batches onto the chain for one appender; call under the exclusive log lock."""
+
+    def __init__(self, active: Path, every: Optional[int] = None):
+        self.active = active
+        self.every = every or checkpoint_every()
+        self._key: Optional[bytes] = None
+        # (inode, size, seq, digest) after our own last append: skips the tail read
+        # when nobody else has written since.
+        self._known: Optional[Tuple[int, int, int, str]] = None
+        self._pending: Optional[Tuple[int, str]] = None
+
+    def link(self, fd: int, lines: List[bytes]) -> List[bytes]:
+        st = os.fstat(fd)
+        if self._known is not None and self._known[:2] == (st.st_ino, st.st_size):
+            seq, prev = self._known[2], self._known[3]
+        else:
+            seq, prev = head_of(self.active)
+        out = []
+        for line in lines:
+            seq += 1
+            linked = _link(line, seq, prev)
+            out.append(linked)
+            prev = line_digest(linked)
+            if seq % self.every == 0:
+                checkpoint = self._checkpoint(seq + 1, prev)
+                if checkpoint is not None:
+                    seq += 1
+                    out.append(checkpoint)
+                    prev = line_digest(checkpoint)
+        self._pending = (seq, prev)
+        return out
+
+    def written(self, fd: Optional[int]) -> None:
+        """Remember the head after a successful append (fd=None forgets it after a failed one)."""
+        if fd is None or self._pending is None:
+            self._known = None
+            return
+        st = os.fstat(fd)
+        self._known = (st.st_ino, st.st_size, *self._pending)
+
+    def _checkpoint(self, seq: int, prev: str) -> Optional[bytes]:
+        if self._key is None:
+            self._key = load_key(create=True)
+        if self._key is None:
+            return None
+        ts = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+        event = {"ts_utc": ts, "action": CHECKPOINT_ACTION, "hmac": checkpoint_mac(self._key, seq, prev)}
+        return _link((json.dumps(event, separators=(",", ":")) + "\n").encode("utf-8"), seq, prev)
+
+
+def load_state(path: Path = VERIFY_STATE) -> Optional[Dict[str, Any]]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if isinstance(data, dict) and isinstance(data.get("seq"), int) and isinstance(data.get("digest"), str):
+        return data
+    return None
+
+
+def _save_state(path: Path, state: Dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    fd = os.open(str(tmp), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+class _Verifier:
+    def __init__(self, key: Optional[bytes], anchor: Optional[Dict[str, Any]]):
+        self.key = key
+        self.anchor = anchor
+        self.reached = anchor is None
+        self.chained = anchor is not None
+        self.legacy = False
+        self.seq = anchor["seq"] if anchor else 0
+        self.prev = anchor["digest"] if anchor else GENESIS
+        self.records = 0
+        self.checkpoints = 0
+        self.checkpoint: Optional[Tuple[int, str]] = None
+        # Last record the previous run verified: it must still be there, unchanged.
+        self.head: Optional[Tuple[int, str]] = None
+        self.error: Optional[Dict[str, Any]] = None
+
+    def fail(self, path: Path, seq: Optional[int], problem: str) -> bool:
+        self.error = {"file": path.name, "seq": seq, "problem": problem}
+        return False
+
+    def feed(self, path: Path, line: bytes) -> bool:
+        digest = line_digest(line)
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        if not isinstance(record, dict):
+            return self.fail(path, None, f"unparseable record after seq {self.seq}")
+        seq = record.get("seq")
+        if not self.reached:
+            anchor = self.anchor or {}
+            if not isinstance(seq, int) or seq < anchor["seq"]:
+                return True
+            if seq != anchor["seq"] or digest != anchor["digest"]:
+                return self.fail(path, seq, f"anchor record seq {anchor['seq']} changed or missing")
+            self.reached = True
+            return True
+        if not isinstance(seq, int):
+            if self.chained:
+                return self.fail(path, None, f"unchained record after seq {self.seq}")
+            self.prev, self.legacy = digest, True  # pre-chain history: the first chained record links to it
+            return True
+        prev = record.get("prev")
+        if self.chained and seq != self.seq + 1:
+            return self.fail(path, seq, f"expected seq {self.seq + 1}")
+        # The oldest retained record may link to a segment retention deleted; anything later must match.
+        if (self.chained or self.legacy) and prev != self.prev:
+            return self.fail(path, seq, "prev digest does not match the preceding record")
+        if record.get("action") == CHECKPOINT_ACTION:
+            if self.key is None:
+                return self.fail(path, seq, f"checkpoint present but no key at {key_path()}")
+            if not hmac.compare_digest(str(record.get("hmac")), checkpoint_mac(self.key, seq, str(prev))):
+                return self.fail(path, seq, "checkpoint HMAC mismatch")
+            self.checkpoints += 1
+            self.checkpoint = (seq, digest)
+        if self.head and seq == self.head[0] and digest != self.head[1]:
+            return self.fail(path, seq, "previously verified record changed")
+        self.chained = True
+        self.seq, self.prev = seq, digest
+        self.records += 1
+        return True
+
+
+def _verify_pass(
+    active: Path, key: Optional[bytes], state: Optional[Dict[str, Any]], anchor: Optional[Dict[str, Any]]
+) -> Tuple["_Verifier", int, int]:
+    """One listing-and-reading pass over the log files; returns the verifier and files read/skipped."""
+    from audit_index import load_index, read_from
+
+    v = _Verifier(key, anchor)
+    if state and isinstance(state.get("head_seq"), int):
+        v.head = (state["head_seq"], str(state.get("head_digest")))
+    files_read = files_skipped = 0
+    # Sealing is blocked for the duration, so sealed and pending segments stay put between
+    # listing and reading; only a rotation of the active log can still move records (see verify).
+    with file_lock(manifest_lock_path(active), exclusive=True):
+        sealed = {s["file"]: s for s in load_manifest(active)}
+        for path in segment_files(active):
+            if not path.exists():
+                continue
+            entry = sealed.get(path.name)
+            last_seq = entry.get("last_seq") if entry else None
+            if anchor and isinstance(last_seq, int) and last_seq < anchor["seq"]:
+                files_skipped += 1
+                continue
+            # A lagging active index still locates older records; verify never rewrites it.
+            index = None if path.name.startswith(PENDING_PREFIX) else load_index(path)
+            if index and path.suffix != ".gz" and index.get("ino") != _inode(path):
+                index = None
+            first = 0
+            if anchor and not v.reached and index and isinstance(index.get("last_seq"), int):
+                if index["last_seq"] < anchor["seq"] and path.suffix == ".gz":
+                    files_skipped += 1
+                    continue
+                if index["first_seq"] <= anchor["seq"]:
+                    first = index["first_seq_record"] + anchor["seq"] - index["first_seq"]
+            files_read += 1
+            lines = read_from(path, index, first) if index else _complete_lines(path)
+            if not all(v.feed(path, line) for line in lines):
+                break
+    if v.error is None and not v.reached:
+        v.error = {"file": None, "seq": anchor["seq"] if anchor else None, "problem": "anchor record not found (log truncated?)"}
+    if v.error is None and v.head and v.seq < v.head[0]:
+        v.error = {"file": None, "seq": v.seq, "problem": f"log ends before seq {v.head[0]}, verified earlier (truncated)"}
+    return v, files_read, files_skipped
+
+
+def verify(
+    active: Path = AUDIT_LOG,
+    state_path: Path = VERIFY_STATE,
+    full: bool = False,
+    save: bool = True,
+) -> Dict[str, Any]:
+    """Verify the chain from the last verified checkpoint (or from the start with full=True)."""
+    from audit_index import load_index, read_from
+
+    start = time.perf_counter()
+    state = load_state(state_path)
+    anchor = None if full else state
+    key = load_key(create=False)
+    ino = _inode(active)
+    v, files_read, files_skipped = _verify_pass(active, key, state, anchor)
+    if v.error is not None and _inode(active) != ino:
+        # A rotation renamed the active log to a pending segment after it was listed; list again.
+        v, files_read, files_skipped = _verify_pass(active, key, state, anchor)
+    ok = v.error is None
+    if ok and save and (v.checkpoint is not None or state is not None):
+        seq, digest = v.checkpoint or (state["seq"], state["digest"])  # type: ignore[index]
+        _save_state(
+            state_path,
+            {
+                "seq": seq,
+                "digest": digest,
+                "head_seq": v.seq,
+                "head_digest": v.prev,
+                "verified_utc": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+            },
+        )
+    return {
+        "status": "ok" if ok else "fail",
+        "from_seq": anchor["seq"] if anchor else 0,
+        "to_seq": v.seq,
+        "head_digest": v.prev,
+        "records_verified": v.records,
+        "checkpoints_verified": v.checkpoints,
+        "anchor_seq": v.checkpoint[0] if (ok and v.checkpoint) else (anchor["seq"] if anchor else None),
+        "files_read": files_read,
+        "files_skipped": files_skipped,
+        "error": v.error,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+
+
+def _inode(path: Path) -> Optional[int]:
+    try:
+        return path.stat().st_ino
+    except OSError:
+        return None
+
+
+def _complete_lines(path: Path):
+    import gzip
+
+    try:
+        f = gzip.open(path, "rb") if path.suffix == ".gz" else path.open("rb")
+    except OSError:
+        return
+    with f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                return
+            if line.strip():
+                yield line
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Verify the privileged audit log hash chain")
+    p.add_argument("command", choices=["verify"], help="verify: check records since the last verified checkpoint")
+    p.add_argument("--audit-log", default=str(AUDIT_LOG), help="Active audit log path")
+    p.add_argument("--state-file", default=str(VERIFY_STATE), help="Last verified checkpoint")
+    p.add_argument("--full", action="store_true", help="Re-verify the whole chain, ignoring the saved checkpoint")
+    p.add_argument("--no-save", action="store_true", help="Do not advance the saved checkpoint")
+    return p.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    result = verify(
+        Path(args.audit_log).expanduser(),
+        Path(args.state_file).expanduser(),
+        full=args.full,
+        save=not args.no_save,
+    )
+    print(json.dumps(result, indent=2))
+    return 0 if result["status"] == "ok" else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""Sidecar block index for audit log files, used by audit_query.py.
+
+Records are grouped in file order into blocks of BLOCK_RECORDS. For each
+file, "<file>.idx" (mode 0600) holds:
+
+  blocks    [min_ts, max_ts, offset, count] per block, ts as epoch seconds.
+            offset is the byte offset of the block's first line in a .jsonl
+            file, or the start of the block's gzip member in a sealed
+            .jsonl.gz (sealed segments are written one member per block,
+            so any block decompresses on its own)
+  postings  {"action"|"session_id"|"argv0": {value: [record numbers]}};
+            record n is line n % BLOCK_RECORDS of block n // BLOCK_RECORDS
+  first_seq / last_seq / first_seq_record
+            hash-chain sequence numbers (audit_chain.py) of the first and
+            last chained record, and the record number of the first, so
+            record number = first_seq_record + (seq - first_seq)
+  indexed   bytes of the source already indexed (.jsonl only), so updates
+            only read what was appended since; a changed inode (rotation)
+            starts the index over
+
+Time bounds become a block range by binary search over the running max of
+max_ts (lower bound) and the suffix min of min_ts (upper bound), which stay
+sorted even though concurrent writers append slightly out of order. Field
+filters intersect posting lists within that range; only blocks holding a
+surviving record are read, only those records are parsed, and each is still
+checked exactly.
+
+The index is a cache: deleting it only costs a rebuild. No network calls
+are made.
+"""
+import bisect
+import gzip
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+# Allow importing sibling modules when executed from arbitrary cwd.
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from audit_segments import file_lock, parse_ts, record_ts  # noqa: E402
+
+INDEX_VERSION = 2
+BLOCK_RECORDS = 128
+FIELDS = ("action", "session_id", "argv0")
+
+
+def index_path(path: Path) -> Path:
+    return path.with_name(path.name + ".idx")
+
+
+def _index_lock(path: Path) -> Path:
+    return path.with_name(path.name + ".idx.lock")
+
+
+def _new_index(ino: int = 0) -> Dict[str, Any]:
+    return {
+        "version": INDEX_VERSION,
+        "ino": ino,
+        "indexed": 0,
+        "records": 0,
+        "first_ts": None,
+        "last_ts": None,
+        "first_seq": None,
+        "last_seq": None,
+        "first_seq_record": None,
+        "blocks": [],
+        "postings": {field: {} for field in FIELDS},
+    }
+
+
+def field_values(record: Dict[str, Any]) -> Dict[str, str]:
+    values = {}
+    for field in ("action", "session_id"):
+        if isinstance(record.get(field), str):
+            values[field] = record[field]
+    argv = record.get("argv")
+    if isinstance(argv, list) and argv and isinstance(argv[0], str):
+        values["argv0"] = argv[0]
+    return values
+
+
+def _add(index: Dict[str, Any], line: bytes, offset: int) -> None:
+    """Index one non-blank line; offset is only used when it starts a new block."""
+    blocks = index["blocks"]
+    if not blocks or blocks[-1][3] >= BLOCK_RECORDS:
+        blocks.append([None, None, offset, 0])
+    block = blocks[-1]
+    block[3] += 1
+    index["records"] += 1
+    ts_text = record_ts(line)
+    ts = parse_ts(ts_text)
+    if ts is not None:
+        epoch = ts.timestamp()
+        block[0] = epoch if block[0] is None else min(block[0], epoch)
+        block[1] = epoch if block[1] is None else max(block[1], epoch)
+        index["first_ts"] = index["first_ts"] or ts_text
+        index["last_ts"] = ts_text
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return
+    if not isinstance(record, dict):
+        return
+    number = index["records"] - 1
+    seq = record.get("seq")
+    if isinstance(seq, int):
+        if index["first_seq"] is None:
+            index["first_seq"], index["first_seq_record"] = seq, number
+        index["last_seq"] = seq
+    for field, value in field_values(record).items():
+        index["postings"][field].setdefault(value, []).append(number)
+
+
+def load_index(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        index = json.loads(index_path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(index, dict) or index.get("version") != INDEX_VERSION:
+        return None
+    return index
+
+
+def save_index(path: Path, index: Dict[str, Any]) -> None:
+    dest = index_path(path)
+    tmp = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+    fd = os.open(str(tmp), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        # dumps() uses the C encoder; dump() to a stream does not.
+        f.write(json.dumps(index, separators=(",", ":")))
+    os.replace(tmp, dest)
+
+
+def compress_blocks(src: BinaryIO, out: BinaryIO) -> Dict[str, Any]:
+    """Write src's records to out as one gzip member per block; return the sealed file's index."""
+    index = _new_index()
+    pending: List[bytes] = []
+
+    def emit() -> None:
+        offset = out.tell()
+        for line in pending:
+            _add(index, line, offset)
+        out.write(gzip.compress(b"".join(pending), mtime=0))
+        pending.clear()
+
+    for line in src:
+        if not line.strip():
+            continue
+        pending.append(line if line.endswith(b"\n") else line + b"\n")
+        if len(pending) == BLOCK_RECORDS:
+            emit()
+    if pending:
+        emit()
+    return index
+
+
+def update_index(path: Path, wait: bool = True) -> Optional[Dict[str, Any]]:
+    """Bring a .jsonl file's index up to date with what was appended; None if busy (wait=False) or missing."""
+    try:
+        with file_lock(_index_lock(path), exclusive=True, wait=wait):
+            with path.open("rb") as f:
+                st = os.fstat(f.fileno())
+                index = load_index(path)
+                if index is None or index.get("ino") != st.st_ino or index.get("indexed", 0) > st.st_size:
+                    index = _new_index(st.st_ino)
+                start = offset = index["indexed"]
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # a record still being written; picked up next time
+                    if line.strip():
+                        _add(index, line, offset)
+                    offset += len(line)
+                index["indexed"] = offset
+            if offset != start or not index_path(path).exists():
+                save_index(path, index)
+            return index
+    except BlockingIOError:
+        return None
+    except FileNotFoundError:
+        return None
+
+
+def index_for(path: Path) -> Optional[Dict[str, Any]]:
+    """Current index of an audit file: sealed segments are immutable, active logs are caught up first."""
+    if path.suffix == ".gz":
+        return load_index(path)
+    return update_index(path)
+
+
+def _intersect(a: List[int], b: List[int]) -> List[int]:
+    if len(a) > len(b):
+        a, b = b, a
+    members = set(b)
+    return [n for n in a if n in members]
+
+
+def candidates(
+    index: Dict[str, Any],
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    filters: Optional[Dict[str, str]] = None,
+) -> List[Tuple[int, Optional[List[int]]]]:
+    """(block, positions within it or None for all) to read, in file order."""
+    blocks = index["blocks"]
+    lo, hi = 0, len(blocks)
+    if since is not None:
+        running, cummax = float("-inf"), []
+        for block in blocks:
+            if block[1] is not None:
+                running = max(running, block[1])
+            cummax.append(running)
+        lo = bisect.bisect_left(cummax, since)
+    if until is not None:
+        running, sufmin = float("inf"), [0.0] * len(blocks)
+        for i in range(len(blocks) - 1, -1, -1):
+            if blocks[i][0] is not None:
+                running = min(running, blocks[i][0])
+            sufmin[i] = running
+        hi = bisect.bisect_right(sufmin, until)
+    if lo >= hi:
+        return []
+    if not filters:
+        return [(number, None) for number in range(lo, hi)]
+    # Every block but the last is full, so block i starts at record i * BLOCK_RECORDS.
+    first, end = lo * BLOCK_RECORDS, hi * BLOCK_RECORDS
+    result: Optional[List[int]] = None
+    for field, value in filters.items():
+        plist = index["postings"].get(field, {}).get(value, [])
+        plist = plist[bisect.bisect_left(plist, first) : bisect.bisect_left(plist, end)]
+        result = plist if result is None else _intersect(result, plist)
+        if not result:
+            return []
+    grouped: Dict[int, List[int]] = {}
+    for number in result or []:
+        grouped.setdefault(number // BLOCK_RECORDS, []).append(number % BLOCK_RECORDS)
+    return list(grouped.items())
+
+
+def read_block(path: Path, index: Dict[str, Any], number: int, positions: Optional[List[int]] = None) -> Iterator[bytes]:
+    """Raw lines of one block, or only those at the given (sorted) positions."""
+    _, _, offset, count = index["blocks"][number]
+    wanted = iter(positions) if positions is not None else None
+    target = next(wanted, count) if wanted is not None else 0
+    with path.open("rb") as f:
+        f.seek(offset)
+        stream: BinaryIO = gzip.GzipFile(fileobj=f, mode="rb") if path.suffix == ".gz" else f  # type: ignore[assignment]
+        seen = 0
+        for line in stream:
+            if not line.strip():
+                continue
+            if wanted is None:
+                yield line
+            elif seen == target:
+                yield line
+                target = next(wanted, count)
+            seen += 1
+            if seen >= count or target >= count:
+                return
+
+
+def read_from(path: Path, index: Dict[str, Any], number: int) -> Iterator[bytes]:
+    """Complete raw lines from record number onward, starting at its block.
+
+    The index may lag an active log: records past what it covers are reached
+    by reading on from its last block.
+    """
+    blocks = index["blocks"]
+    block = min(number // BLOCK_RECORDS, len(blocks) - 1)
+    skip = number - block * BLOCK_RECORDS if block >= 0 else number
+    with path.open("rb") as f:
+        f.seek(blocks[block][2] if block >= 0 else 0)
+        stream: BinaryIO = gzip.GzipFile(fileobj=f, mode="rb") if path.suffix == ".gz" else f  # type: ignore[assignment]
+        for line in stream:
+            if not line.endswith(b"\n"):
+                return  # a record still being written
+            if not line.strip():
+                continue
+            if skip:
+                skip -= 1
+                continue
+            yield line
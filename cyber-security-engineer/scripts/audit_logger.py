@@ -1,28 +1,312 @@
 #!/usr/bin/env python3
+"""Append-only JSONL audit timeline for privileged actions.
+
+append_audit() stamps the event and hands it to a group-commit writer: a
+bounded queue drained by one background thread. The thread writes whatever
+has queued since its last pass as a batch through a single O_APPEND file
+descriptor, one write() per record, so concurrent writers (threads or
+processes) never interleave within a line. Each record is linked onto the
+audit_chain hash chain (seq, prev, periodic HMAC checkpoints) as it is
+written. The thread then syncs the file according to the fsync policy:
+
+  none   never fsync (the page cache decides; the pre-writer behavior)
+  batch  one fsync per batch (default)
+  event  fsync after every record
+
+The policy comes from OPENCLAW_AUDIT_FSYNC. flush_audit() waits (bounded)
+until everything queued so far is written and synced, and is registered to
+run at process exit. Auditing stays best-effort: if the queue is full or
+the thread cannot run, the record is written synchronously by the caller
+instead, and write errors are swallowed. That direct write never waits for
+the log lock: when another writer holds it, the record goes to a bounded
+spill buffer that the next batch or direct write drains first (records
+beyond SPILL_MAX are counted as failed).
+
+Appends hold an exclusive flock on the log's ".lock" file, which keeps the
+chain in file order, and reopen the log when its inode changed. After a
+batch the writer thread checks the size/age rotation trigger and, when due,
+closes the segment via audit_segments (off the caller's path, after any
+waiting flush_audit() has been released), then brings the audit_index
+sidecar index up to date (at most once per INDEX_INTERVAL_SEC, and not at
+exit; audit_query catches up the rest).
+"""
+import atexit
 import json
+import os
+import queue
+import sys
+import threading
+import time
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional, Union
+
+# Allow importing sibling modules when executed from arbitrary cwd.
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from audit_chain import Chain  # noqa: E402
+from audit_segments import Rotator, file_lock, lock_path  # noqa: E402
 
 
 AUDIT_LOG = Path.home() / ".openclaw" / "security" / "privileged-audit.jsonl"
+FSYNC_POLICIES = ("none", "batch", "event")
+DEFAULT_FSYNC = "batch"
+QUEUE_SIZE = 1024
+SPILL_MAX = 1024
+BATCH_MAX = 256
+FLUSH_TIMEOUT_SEC = 2.0
+INDEX_INTERVAL_SEC = 1.0
+_STOP = object()
 
 
 def _utc_now_iso() -> str:
     return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
 
 
+def fsync_policy_from_env() -> str:
+    value = os.environ.get("OPENCLAW_AUDIT_FSYNC", DEFAULT_FSYNC).strip().lower()
+    return value if value in FSYNC_POLICIES else DEFAULT_FSYNC
+
+
+def _open_append(path: Path) -> int:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_CLOEXEC", 0)
+    return os.open(str(path), flags, 0o666)
+
+
+class AuditWriter:
+    """Group-commit JSONL appender with a bounded queue and one writer thread."""
+
+    def __init__(self, path: Optional[Path] = None, fsync: Optional[str] = None, maxsize: int = QUEUE_SIZE):
+        self._path = path
+        self.fsync = fsync if fsync in FSYNC_POLICIES else fsync_policy_from_env()
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._pid = -1
+        self._queue: Optional["queue.Queue[Any]"] = None
+        self._thread: Optional[threading.Thread] = None
+        self._fd: Optional[int] = None
+        self._rotator: Optional[Rotator] = None
+        self._chain: Optional[Chain] = None
+        self._indexed_at = float("-inf")
+        self._atexit = False
+        self._spill: List[bytes] = []
+        self._spill_lock = threading.Lock()
+        self.stats = {"queued": 0, "written": 0, "batches": 0, "direct": 0, "spilled": 0, "failed": 0, "rotations": 0}
+
+    @property
+    def path(self) -> Path:
+        # Resolved per use so callers may repoint the module-level AUDIT_LOG.
+        return self._path if self._path is not None else AUDIT_LOG
+
+    def append(self, line: bytes) -> None:
+        q = self._ensure_thread()
+        if q is not None:
+            try:
+                q.put_nowait(line)
+                self.stats["queued"] += 1
+                return
+            except queue.Full:
+                pass
+        self._write_direct(line)
+
+    def flush(self, timeout: float = FLUSH_TIMEOUT_SEC) -> bool:
+        """Wait until records queued before this call are written (and synced per policy)."""
+        q = self._queue
+        if q is None or self._pid != os.getpid() or not self._alive():
+            return True
+        done = threading.Event()
+        try:
+            q.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout: float = FLUSH_TIMEOUT_SEC) -> None:
+        """Flush, stop the writer thread and close the descriptor (best-effort)."""
+        with self._lock:
+            q, thread = self._queue, self._thread
+            if q is None or thread is None or self._pid != os.getpid():
+                return
+            self._queue = None
+            self._thread = None
+        try:
+            q.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+
+    def _alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _ensure_thread(self) -> Optional["queue.Queue[Any]"]:
+        if self._pid == os.getpid() and self._alive():
+            return self._queue
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forked child: the parent's thread does not exist here and its
+                # descriptor is shared; start over with our own.
+                self._queue, self._thread, self._fd = None, None, None
+                self._pid = os.getpid()
+            if self._alive():
+                return self._queue
+            q: "queue.Queue[Any]" = queue.Queue(maxsize=self.maxsize)
+            thread = threading.Thread(target=self._run, args=(q,), name="audit-writer", daemon=True)
+            try:
+                thread.start()
+            except RuntimeError:
+                return None
+            self._queue, self._thread = q, thread
+            if not self._atexit:
+                atexit.register(self.close)
+                self._atexit = True
+            return q
+
+    def _run(self, q: "queue.Queue[Any]") -> None:
+        while True:
+            batch = [q.get()]
+            while len(batch) < BATCH_MAX:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            lines = self._take_spill() + [item for item in batch if isinstance(item, bytes)]
+            st = self._write_batch(lines) if lines else None
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+            stopping = any(item is _STOP for item in batch)
+            if st is not None:
+                self._maybe_rotate(st)
+                if not stopping and time.monotonic() - self._indexed_at >= INDEX_INTERVAL_SEC:
+                    self._update_index()
+            if stopping:
+                self._close_fd()
+                return
+
+    def _close_fd(self) -> None:
+        if self._fd is not None:
+            try:
+                os.close(self._fd)
+            except OSError:
+                pass
+            self._fd = None
+
+    def _write_batch(self, lines: List[bytes]) -> Optional[os.stat_result]:
+        path = self.path
+        try:
+            with file_lock(lock_path(path), exclusive=True):
+                if self._fd is not None:
+                    # A rotation renamed the file we hold open: follow the path to the new segment.
+                    try:
+                        if os.stat(path).st_ino != os.fstat(self._fd).st_ino:
+                            self._close_fd()
+                    except FileNotFoundError:
+                        self._close_fd()
+                if self._fd is None:
+                    self._fd = _open_append(path)
+                self._append(path, self._fd, lines, self.fsync == "batch")
+                st = os.fstat(self._fd)
+            self.stats["written"] += len(lines)
+            self.stats["batches"] += 1
+            return st
+        except OSError:
+            self.stats["failed"] += len(lines)
+            self._close_fd()
+            return None
+
+    def _append(self, path: Path, fd: int, lines: List[bytes], sync: bool) -> None:
+        """Link lines onto the hash chain and write them; the caller holds the exclusive log lock."""
+        if self._chain is None or self._chain.active != path:
+            self._chain = Chain(path)
+        try:
+            for line in self._chain.link(fd, lines):
+                os.write(fd, line)
+                if self.fsync == "event":
+                    os.fsync(fd)
+            if sync:
+                os.fsync(fd)
+        except OSError:
+            self._chain.written(None)
+            raise
+        self._chain.written(fd)
+
+    def _maybe_rotate(self, st: os.stat_result) -> None:
+        try:
+            if self._rotator is None or self._rotator.active != self.path:
+                self._rotator = Rotator(self.path)
+            if self._rotator.due(st) and self._rotator.rotate():
+                self.stats["rotations"] += 1
+                self._close_fd()
+        except Exception:
+            return
+
+    def _update_index(self) -> None:
+        """Keep audit_query's sidecar index caught up; skipped if another process is already updating it."""
+        self._indexed_at = time.monotonic()
+        try:
+            from audit_index import update_index
+
+            update_index(self.path, wait=False)
+        except Exception:
+            return
+
+    def _take_spill(self) -> List[bytes]:
+        with self._spill_lock:
+            lines, self._spill = self._spill, []
+        return lines
+
+    def _write_direct(self, line: bytes) -> None:
+        """Write on the caller's thread without waiting for the log lock; spill the record if it is held."""
+        path = self.path
+        lines = self._take_spill() + [line]
+        try:
+            with file_lock(lock_path(path), exclusive=True, wait=False):
+                fd = _open_append(path)
+                try:
+                    self._append(path, fd, lines, self.fsync != "none")
+                finally:
+                    os.close(fd)
+            self.stats["direct"] += len(lines)
+        except BlockingIOError:
+            # Put them back ahead of anything spilled meanwhile; the newest overflow is lost.
+            with self._spill_lock:
+                merged = lines + self._spill
+                self._spill = merged[:SPILL_MAX]
+            self.stats["spilled"] += 1
+            self.stats["failed"] += len(merged) - SPILL_MAX if len(merged) > SPILL_MAX else 0
+        except OSError:
+            self.stats["failed"] += len(lines)
+
+
+_WRITER = AuditWriter()
+
+
+def encode_event(event: Dict[str, Any]) -> bytes:
+    payload = {"ts_utc": _utc_now_iso(), **event}
+    return (json.dumps(payload, separators=(",", ":")) + "\n").encode("utf-8")
+
+
 def append_audit(event: Dict[str, Any]) -> None:
     """
     Append an audit event to an on-disk JSONL timeline.
 
     Best-effort only: audit logging must never block privileged operations.
+    The event is timestamped here and written by the background writer; use
+    flush_audit() where it must be on disk before continuing.
     """
     try:
-        AUDIT_LOG.parent.mkdir(parents=True, exist_ok=True)
-        payload = {"ts_utc": _utc_now_iso(), **event}
-        with AUDIT_LOG.open("a", encoding="utf-8") as f:
-            f.write(json.dumps(payload, separators=(",", ":")) + "\n")
+        _WRITER.append(encode_event(event))
     except Exception:
         return
 
+
+def flush_audit(timeout: float = FLUSH_TIMEOUT_SEC) -> bool:
+    """Block (up to timeout seconds) until queued audit events are written."""
+    try:
+        return _WRITER.flush(timeout)
+    except Exception:
+        return False
+
+
+def audit_stats() -> Dict[str, Union[int, str]]:
+    return {"fsync": _WRITER.fsync, **_WRITER.stats}
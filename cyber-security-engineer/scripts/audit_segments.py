@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""Rotation, compression, manifest and retention for the privileged audit log.
+
+Layout, next to the active log:
+
+  privileged-audit.jsonl            active segment, appended to by audit_logger
+  privileged-audit.jsonl.lock       flock held per append batch and to rotate
+  privileged-audit.jsonl.chain      hash-chain head at the last rotation (audit_chain)
+  audit-segments/*.jsonl.gz         closed, gzip-compressed segments (mode 0600)
+  audit-segments/manifest.json      one entry per closed segment: file, first_ts,
+                                    last_ts, records, first_seq,
+                                    last_seq, bytes, compressed_bytes
+
+The active segment is closed when it reaches OPENCLAW_AUDIT_ROTATE_BYTES
+(default 8 MiB) or its first record is older than OPENCLAW_AUDIT_ROTATE_HOURS
+(default 24). Rotation renames it into audit-segments/ under the exclusive
+lock, so appenders reopen a fresh file on their next batch, then compresses
+it and records it in the manifest outside that lock. Closed segments whose
+last record is older than OPENCLAW_AUDIT_RETENTION_DAYS (default 365, 0
+keeps everything) are deleted.
+
+iter_records(since, until) reads segments oldest first and skips every
+segment whose manifest time range is outside the window without opening it.
+
+Run directly to print the manifest (--rotate closes the active segment
+first). No network calls are made.
+"""
+import argparse
+import json
+import os
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locking.
+    fcntl = None  # type: ignore[assignment]
+
+AUDIT_LOG = Path.home() / ".openclaw" / "security" / "privileged-audit.jsonl"
+SEGMENT_DIR_NAME = "audit-segments"
+MANIFEST_NAME = "manifest.json"
+PENDING_PREFIX = ".pending-"
+DEFAULT_ROTATE_BYTES = 8 * 1024 * 1024
+DEFAULT_ROTATE_HOURS = 24.0
+DEFAULT_RETENTION_DAYS = 365.0
+_TS_PREFIX = b'{"ts_utc":"'
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        value = float(os.environ.get(name, default))
+    except ValueError:
+        return default
+    return value if value >= 0 else default
+
+
+@dataclass
+class RotationPolicy:
+    max_bytes: int = DEFAULT_ROTATE_BYTES
+    max_age_hours: float = DEFAULT_ROTATE_HOURS
+    retention_days: float = DEFAULT_RETENTION_DAYS
+
+    @classmethod
+    def from_env(cls) -> "RotationPolicy":
+        return cls(
+            max_bytes=int(_env_float("OPENCLAW_AUDIT_ROTATE_BYTES", DEFAULT_ROTATE_BYTES)),
+            max_age_hours=_env_float("OPENCLAW_AUDIT_ROTATE_HOURS", DEFAULT_ROTATE_HOURS),
+            retention_days=_env_float("OPENCLAW_AUDIT_RETENTION_DAYS", DEFAULT_RETENTION_DAYS),
+        )
+
+
+def segment_dir(active: Path) -> Path:
+    return active.parent / SEGMENT_DIR_NAME
+
+
+def manifest_path(active: Path) -> Path:
+    return segment_dir(active) / MANIFEST_NAME
+
+
+def lock_path(active: Path) -> Path:
+    return active.with_name(active.name + ".lock")
+
+
+def manifest_lock_path(active: Path) -> Path:
+    """Held while sealing; audit_chain's verifier holds it so segments do not move under it."""
+    return segment_dir(active) / "manifest.lock"
+
+
+def parse_ts(value: Any) -> Optional[datetime]:
+    if not isinstance(value, str):
+        return None
+    try:
+        dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def record_ts(line: bytes) -> Optional[str]:
+    """ts_utc of a raw JSONL record; audit_logger always writes it first, so no full parse."""
+    if line.startswith(_TS_PREFIX):
+        end = line.find(b'"', len(_TS_PREFIX))
+        if end > 0:
+            return line[len(_TS_PREFIX) : end].decode("ascii", "replace")
+    try:
+        value = json.loads(line).get("ts_utc")
+    except (ValueError, AttributeError):
+        return None
+    return value if isinstance(value, str) else None
+
+
+def first_record_ts(path: Path) -> Optional[str]:
+    try:
+        with path.open("rb") as f:
+            return record_ts(f.readline(65536))
+    except OSError:
+        return None
+
+
+@contextmanager
+def file_lock(path: Path, exclusive: bool, wait: bool = True) -> Iterator[None]:
+    """flock on path (created if missing); with wait=False raises BlockingIOError when held."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(str(path), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | (0 if wait else fcntl.LOCK_NB))
+        yield
+    finally:
+        os.close(fd)
+
+
+def load_manifest(active: Path = AUDIT_LOG) -> List[Dict[str, Any]]:
+    try:
+        data = json.loads(manifest_path(active).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return []
+    segments = data.get("segments") if isinstance(data, dict) else None
+    if not isinstance(segments, list):
+        return []
+    return [s for s in segments if isinstance(s, dict) and isinstance(s.get("file"), str)]
+
+
+def _save_manifest(active: Path, segments: List[Dict[str, Any]]) -> None:
+    path = manifest_path(active)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    fd = os.open(str(tmp), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({"segments": segments}, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _seal(active: Path, raw: Path) -> Optional[Dict[str, Any]]:
+    """Compress one pending raw segment and write its index; names derive from the raw file, so a retry overwrites."""
+    from audit_index import compress_blocks, save_index
+
+    stamp_src = first_record_ts(raw)
+    stamp = (parse_ts(stamp_src) or datetime.now(timezone.utc)).strftime("%Y%m%dT%H%M%SZ")
+    name = f"{active.stem}-{stamp}-{raw.stem[len(PENDING_PREFIX):]}.jsonl.gz"
+    dest = raw.with_name(name)
+    tmp = raw.with_name(f".{name}.tmp")
+    fd = os.open(str(tmp), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as out:
+        with raw.open("rb") as src:
+            index = compress_blocks(src, out)
+        out.flush()
+        os.fsync(out.fileno())
+    if index["records"] == 0:
+        tmp.unlink()
+        raw.unlink()
+        return None
+    save_index(dest, index)
+    os.replace(tmp, dest)
+    return {
+        "file": name,
+        "first_ts": index["first_ts"],
+        "last_ts": index["last_ts"],
+        "records": index["records"],
+        "first_seq": index["first_seq"],
+        "last_seq": index["last_seq"],
+        "bytes": raw.stat().st_size,
+        "compressed_bytes": dest.stat().st_size,
+    }
+
+
+def _expired(segment: Dict[str, Any], policy: RotationPolicy, now: datetime) -> bool:
+    if policy.retention_days <= 0:
+        return False
+    last = parse_ts(segment.get("last_ts"))
+    return last is not None and last < now - timedelta(days=policy.retention_days)
+
+
+def _segment_order(segment: Dict[str, Any]) -> Tuple[int, str, int]:
+    # Chain order, not timestamp order: ts_utc is stamped when an event is queued,
+    # so concurrent writers can land a slightly older timestamp in a later segment.
+    seq = segment.get("first_seq")
+    if isinstance(seq, int):
+        return (1, "", seq)
+    return (0, str(segment.get("first_ts") or ""), 0)
+
+
+def seal_pending(active: Path = AUDIT_LOG, policy: Optional[RotationPolicy] = None) -> List[Dict[str, Any]]:
+    """Compress every rotated-but-unsealed segment, update the manifest and apply retention."""
+    policy = policy or RotationPolicy.from_env()
+    seg_dir = segment_dir(active)
+    with file_lock(manifest_lock_path(active), exclusive=True):
+        pending = sorted(seg_dir.glob(f"{PENDING_PREFIX}*.jsonl"))
+        segments = load_manifest(active)
+        sealed = []
+        for raw in pending:
+            entry = _seal(active, raw)
+            if entry is not None:
+                segments = [s for s in segments if s["file"] != entry["file"]] + [entry]
+                sealed.append(entry)
+        now = datetime.now(timezone.utc)
+        kept = []
+        for segment in segments:
+            if _expired(segment, policy, now):
+                for doomed in (seg_dir / segment["file"], seg_dir / (segment["file"] + ".idx")):
+                    try:
+                        doomed.unlink()
+                    except FileNotFoundError:
+                        pass
+            else:
+                kept.append(segment)
+        if sealed or len(kept) != len(segments):
+            kept.sort(key=_segment_order)
+            _save_manifest(active, kept)
+        # Only now that the manifest names the gzip copies are the raw files redundant.
+        for raw in pending:
+            try:
+                raw.unlink()
+            except FileNotFoundError:
+                pass
+    return sealed
+
+
+def rotate(active: Path = AUDIT_LOG, policy: Optional[RotationPolicy] = None) -> bool:
+    """Close the active segment (if non-empty) and seal it. Returns whether a segment was closed."""
+    from audit_chain import save_head
+
+    seg_dir = segment_dir(active)
+    seg_dir.mkdir(parents=True, exist_ok=True, mode=0o700)
+    with file_lock(lock_path(active), exclusive=True):
+        try:
+            if active.stat().st_size == 0:
+                return False
+        except FileNotFoundError:
+            return False
+        # Appenders hold this lock per batch and reopen when the inode changes.
+        save_head(active)
+        os.replace(active, seg_dir / f"{PENDING_PREFIX}{os.getpid()}-{os.urandom(4).hex()}.jsonl")
+    seal_pending(active, policy)
+    return True
+
+
+class Rotator:
+    """Rotation trigger for one appender; caches the active segment's first timestamp per inode."""
+
+    def __init__(self, active: Path, policy: Optional[RotationPolicy] = None):
+        self.active = active
+        self.policy = policy or RotationPolicy.from_env()
+        self._first: Tuple[int, Optional[datetime]] = (-1, None)
+
+    def due(self, st: os.stat_result, now: Optional[datetime] = None) -> bool:
+        if st.st_size == 0:
+            return False
+        if self.policy.max_bytes and st.st_size >= self.policy.max_bytes:
+            return True
+        if not self.policy.max_age_hours:
+            return False
+        if self._first[0] != st.st_ino:
+            self._first = (st.st_ino, parse_ts(first_record_ts(self.active)))
+        first = self._first[1]
+        now = now or datetime.now(timezone.utc)
+        return first is not None and now - first >= timedelta(hours=self.policy.max_age_hours)
+
+    def rotate(self) -> bool:
+        return rotate(self.active, self.policy)
+
+
+def _overlaps(segment: Dict[str, Any], since: Optional[datetime], until: Optional[datetime]) -> bool:
+    first, last = parse_ts(segment.get("first_ts")), parse_ts(segment.get("last_ts"))
+    if since is not None and last is not None and last < since:
+        return False
+    if until is not None and first is not None and first > until:
+        return False
+    return True
+
+
+def segment_files(
+    active: Path = AUDIT_LOG, since: Optional[datetime] = None, until: Optional[datetime] = None
+) -> List[Path]:
+    """Files holding records in [since, until], oldest first: sealed segments, pending ones, the active log."""
+    seg_dir = segment_dir(active)
+    files = [seg_dir / s["file"] for s in load_manifest(active) if _overlaps(s, since, until)]
+    pending = []
+    for path in seg_dir.glob(f"{PENDING_PREFIX}*.jsonl"):
+        try:
+            pending.append((path.stat().st_mtime, path))
+        except OSError:
+            continue  # sealed (renamed to .gz) since the glob; the manifest has it next time
+    files += [path for _, path in sorted(pending)]
+    files.append(active)
+    return files
+
+
+def iter_records(
+    active: Path = AUDIT_LOG, since: Optional[datetime] = None, until: Optional[datetime] = None
+) -> Iterator[Dict[str, Any]]:
+    """Yield audit records with since <= ts_utc <= until (either bound optional), oldest first."""
+    import gzip
+
+    for path in segment_files(active, since, until):
+        try:
+            f = gzip.open(path, "rb") if path.suffix == ".gz" else path.open("rb")
+        except OSError:
+            continue
+        with f:
+            try:
+                for line in f:
+                    if since is not None or until is not None:
+                        ts = parse_ts(record_ts(line))
+                        if ts is None or (since is not None and ts < since) or (until is not None and ts > until):
+                            continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if isinstance(record, dict):
+                        yield record
+            except (OSError, EOFError):
+                continue
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Show (and optionally rotate) privileged audit log segments")
+    p.add_argument("--audit-log", default=str(AUDIT_LOG), help="Active audit log path")
+    p.add_argument("--rotate", action="store_true", help="Close and compress the active segment now")
+    return p.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    active = Path(args.audit_log).expanduser()
+    rotated = rotate(active) if args.rotate else False
+    if not args.rotate:
+        seal_pending(active)
+    print(json.dumps({"rotated": rotated, "segments": load_manifest(active)}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
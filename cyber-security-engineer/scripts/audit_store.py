@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""SQLite analytics store fed from the privileged audit log.
+
+  audit_store.py ingest [--follow 30]
+  audit_store.py report --since 30d [--query approvals]
+
+ingest tails the audit timeline into ~/.openclaw/security/audit-analytics.db
+(mode 0600, WAL journal, so reports never block an ingest and vice versa):
+
+  - the active log is read from the (inode, offset) saved by the previous
+    ingest, complete lines only
+  - after rotation, the sealed segment the log became is read from just
+    past the run of its chain seqs already stored, found through its
+    audit_index seq range; fully read segments are never opened again
+  - pending (mid-rotation) files are read from the saved offset when they
+    are the file last tailed, otherwise whole
+  - each row is keyed by the sha256 of its line, so anything read twice
+    (unchained pre-chain lines, a file caught mid-rotation) is stored once
+
+Offsets and rows are committed in one transaction per file, so an
+interrupted ingest resumes where the last commit left off. Rows older than
+OPENCLAW_AUDIT_RETENTION_DAYS are pruned, as the log segments are.
+
+report runs the canned aggregate queries in QUERIES over an optional
+window (same time forms as audit_query.py) and prints JSON. The database
+is a cache: deleting it only costs a re-ingest. No network calls are made.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Allow importing sibling modules when executed from arbitrary cwd.
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from audit_index import field_values, load_index, read_from  # noqa: E402
+from audit_segments import (  # noqa: E402
+    AUDIT_LOG,
+    PENDING_PREFIX,
+    RotationPolicy,
+    load_manifest,
+    parse_ts,
+    segment_dir,
+)
+
+DB_PATH = Path.home() / ".openclaw" / "security" / "audit-analytics.db"
+SCHEMA_VERSION = 1
+BUSY_TIMEOUT_SEC = 10.0
+REPORT_LIMIT = 10
+_FAR_FUTURE = 1e12
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    line_hash BLOB NOT NULL UNIQUE,
+    seq INTEGER,
+    ts REAL,
+    ts_utc TEXT,
+    action TEXT,
+    session_id TEXT,
+    argv0 TEXT,
+    reason TEXT,
+    pattern TEXT,
+    returncode INTEGER,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_seq ON events (seq);
+-- Covering indexes: the canned queries never touch the table rows.
+CREATE INDEX IF NOT EXISTS events_ts ON events (ts, action, session_id, argv0);
+CREATE INDEX IF NOT EXISTS events_action_ts ON events (action, ts, argv0, returncode);
+CREATE INDEX IF NOT EXISTS events_session_ts ON events (session_id, ts);
+CREATE INDEX IF NOT EXISTS events_argv0_ts ON events (argv0, ts);
+CREATE TABLE IF NOT EXISTS tail (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    ino INTEGER,
+    offset INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS segments (
+    file TEXT PRIMARY KEY
+);
+"""
+
+# Canned aggregates. Every query takes :since and :until (epoch seconds) and
+# may use :limit.
+QUERIES: Dict[str, str] = {
+    "overview": """
+        SELECT COUNT(*) AS events,
+               SUM(action = 'exec_start') AS runs,
+               COUNT(DISTINCT session_id) AS sessions,
+               strftime('%Y-%m-%dT%H:%M:%SZ', MIN(ts), 'unixepoch') AS first_utc,
+               strftime('%Y-%m-%dT%H:%M:%SZ', MAX(ts), 'unixepoch') AS last_utc
+        FROM events
+        WHERE ts BETWEEN :since AND :until
+    """,
+    "actions": """
+        SELECT action, COUNT(*) AS count FROM events
+        WHERE ts BETWEEN :since AND :until
+        GROUP BY action ORDER BY count DESC
+    """,
+    "approvals": """
+        SELECT
+            SUM(action = 'approval_requested') AS requested,
+            SUM(action = 'approval_granted') AS granted,
+            SUM(action = 'approval_denied') AS denied,
+            SUM(action = 'approval_token_failed') AS token_failed,
+            SUM(action = 'untrusted_source_block') AS untrusted_blocked,
+            ROUND(1.0 * SUM(action = 'approval_granted')
+                / NULLIF(SUM(action IN ('approval_granted', 'approval_denied')), 0), 4) AS grant_rate
+        FROM events
+        WHERE action IN ('approval_requested', 'approval_granted', 'approval_denied',
+                         'approval_token_failed', 'untrusted_source_block')
+          AND ts BETWEEN :since AND :until
+    """,
+    "policy_blocks": """
+        SELECT
+            SUM(action = 'policy_block') AS blocked,
+            SUM(action = 'exec_start') AS executed,
+            ROUND(1.0 * SUM(action = 'policy_block')
+                / NULLIF(SUM(action IN ('policy_block', 'exec_start')), 0), 4) AS block_rate
+        FROM events
+        WHERE action IN ('policy_block', 'exec_start') AND ts BETWEEN :since AND :until
+    """,
+    "blocked_patterns": """
+        SELECT COALESCE(pattern, reason) AS rule, COUNT(*) AS count FROM events
+        WHERE action = 'policy_block' AND ts BETWEEN :since AND :until
+        GROUP BY rule ORDER BY count DESC LIMIT :limit
+    """,
+    "top_commands": """
+        SELECT argv0,
+               SUM(action = 'exec_start') AS runs,
+               SUM(action = 'exec_finish' AND returncode != 0) AS failures,
+               SUM(action = 'policy_block') AS blocked
+        FROM events
+        WHERE action IN ('exec_start', 'exec_finish', 'policy_block') AND argv0 IS NOT NULL
+          AND ts BETWEEN :since AND :until
+        GROUP BY argv0 ORDER BY runs DESC, blocked DESC LIMIT :limit
+    """,
+    "sessions": """
+        SELECT session_id,
+               COUNT(*) AS events,
+               SUM(action = 'exec_start') AS runs,
+               SUM(action = 'approval_granted') AS approvals,
+               strftime('%Y-%m-%dT%H:%M:%SZ', MIN(ts), 'unixepoch') AS first_utc,
+               strftime('%Y-%m-%dT%H:%M:%SZ', MAX(ts), 'unixepoch') AS last_utc
+        FROM events
+        WHERE session_id IS NOT NULL AND ts BETWEEN :since AND :until
+        GROUP BY session_id ORDER BY MAX(ts) DESC LIMIT :limit
+    """,
+    "daily": """
+        SELECT strftime('%Y-%m-%d', CAST(ts / 86400 AS INTEGER) * 86400, 'unixepoch') AS day,
+               SUM(action = 'exec_start') AS runs,
+               SUM(action = 'approval_granted') AS granted,
+               SUM(action = 'approval_denied') AS denied,
+               SUM(action = 'policy_block') AS blocked
+        FROM events
+        WHERE ts BETWEEN :since AND :until
+        GROUP BY CAST(ts / 86400 AS INTEGER) ORDER BY day
+    """,
+}
+
+
+def connect(db: Path = DB_PATH) -> sqlite3.Connection:
+    """Open (creating 0600 if needed) the store in WAL mode with the current schema."""
+    db.parent.mkdir(parents=True, exist_ok=True)
+    # SQLite creates the -wal/-shm files with the database file's mode.
+    os.close(os.open(str(db), os.O_RDWR | os.O_CREAT, 0o600))
+    conn = sqlite3.connect(str(db), timeout=BUSY_TIMEOUT_SEC, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+        conn.execute("BEGIN IMMEDIATE")
+        if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            for table in ("events", "tail", "segments"):
+                conn.execute(f"DROP TABLE IF EXISTS {table}")
+            for statement in SCHEMA.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+            conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        conn.execute("COMMIT")
+    return conn
+
+
+def _row(line: bytes) -> Optional[Tuple[Any, ...]]:
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(record, dict):
+        return None
+    ts = parse_ts(record.get("ts_utc"))
+    values = field_values(record)
+    seq = record.get("seq")
+    returncode = record.get("returncode")
+    reason, pattern = record.get("reason"), record.get("pattern")
+    return (
+        hashlib.sha256(line.rstrip(b"\n")).digest(),
+        seq if isinstance(seq, int) else None,
+        ts.timestamp() if ts else None,
+        record.get("ts_utc") if isinstance(record.get("ts_utc"), str) else None,
+        values.get("action"),
+        values.get("session_id"),
+        values.get("argv0"),
+        reason if isinstance(reason, str) else None,
+        pattern if isinstance(pattern, str) else None,
+        returncode if isinstance(returncode, int) else None,
+        line.rstrip(b"\n").decode("utf-8", "replace"),
+    )
+
+
+def _insert(conn: sqlite3.Connection, lines: Iterator[bytes]) -> int:
+    rows = (row for row in map(_row, lines) if row is not None)
+    before = conn.total_changes
+    conn.executemany(
+        "INSERT OR IGNORE INTO events (line_hash, seq, ts, ts_utc, action, session_id, argv0, reason, pattern,"
+        " returncode, record) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+    return conn.total_changes - before
+
+
+def _tail(path: Path, offset: int, progress: Dict[str, int]) -> Iterator[bytes]:
+    """Complete lines of a plain file from offset; progress["offset"] follows the last one."""
+    with path.open("rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                return  # a record still being written
+            offset += len(line)
+            progress["offset"] = offset
+            if line.strip():
+                yield line
+
+
+def _sealed_lines(conn: sqlite3.Connection, path: Path) -> Iterator[bytes]:
+    """Records of a sealed segment, skipping the chained prefix already stored while it was active."""
+    index = load_index(path)
+    first = 0
+    if index and isinstance(index.get("first_seq"), int):
+        lo, hi = index["first_seq"], index["last_seq"]
+        count, top = conn.execute("SELECT COUNT(*), MAX(seq) FROM events WHERE seq BETWEEN ? AND ?", (lo, hi)).fetchone()
+        if count and count == top - lo + 1:
+            if top == hi:
+                return
+            first = index["first_seq_record"] + top + 1 - lo
+    if index:
+        yield from read_from(path, index, first)
+        return
+    import gzip
+
+    with gzip.open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                yield line
+
+
+def ingest(active: Path = AUDIT_LOG, db: Path = DB_PATH) -> Dict[str, Any]:
+    """Store every audit record not yet ingested; returns counts and elapsed time."""
+    start = time.perf_counter()
+    stats = {"inserted": 0, "files": 0, "pruned": 0}
+    conn = connect(db)
+    try:
+        done = {row[0] for row in conn.execute("SELECT file FROM segments")}
+        state = conn.execute("SELECT ino, offset FROM tail WHERE id = 0").fetchone()
+        tail_ino, tail_offset = (state[0], state[1]) if state else (None, 0)
+        seg_dir = segment_dir(active)
+        files = [seg_dir / s["file"] for s in load_manifest(active) if s.get("file") not in done]
+        files += sorted(seg_dir.glob(f"{PENDING_PREFIX}*.jsonl"))
+        files.append(active)
+        for path in files:
+            # One transaction per file: rows and the offset they reach commit together.
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if path.suffix == ".gz":
+                    stats["inserted"] += _insert(conn, _sealed_lines(conn, path))
+                    conn.execute("INSERT OR IGNORE INTO segments (file) VALUES (?)", (path.name,))
+                else:
+                    ino = path.stat().st_ino
+                    offset = tail_offset if ino == tail_ino else 0
+                    if offset > path.stat().st_size:
+                        offset = 0  # truncated and rewritten in place
+                    progress = {"offset": offset}
+                    stats["inserted"] += _insert(conn, _tail(path, offset, progress))
+                    if path == active:
+                        conn.execute(
+                            "INSERT OR REPLACE INTO tail (id, ino, offset) VALUES (0, ?, ?)", (ino, progress["offset"])
+                        )
+                conn.execute("COMMIT")
+            except FileNotFoundError:
+                # Sealed or pruned since the listing; a sealed copy is picked up next run.
+                conn.execute("ROLLBACK")
+                continue
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            stats["files"] += 1
+        policy = RotationPolicy.from_env()
+        if policy.retention_days > 0:
+            cutoff = (datetime.now(timezone.utc) - timedelta(days=policy.retention_days)).timestamp()
+            stats["pruned"] = conn.execute("DELETE FROM events WHERE ts < ?", (cutoff,)).rowcount
+            present = {s.get("file") for s in load_manifest(active)}
+            conn.executemany("DELETE FROM segments WHERE file = ?", [(f,) for f in done - present])
+    finally:
+        conn.close()
+    stats["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 2)  # type: ignore[assignment]
+    return stats
+
+
+def report(
+    db: Path = DB_PATH,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    names: Optional[List[str]] = None,
+    limit: int = REPORT_LIMIT,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Run canned queries (all by default) over [since, until]."""
+    params = {
+        "since": since.timestamp() if since else 0.0,
+        "until": until.timestamp() if until else _FAR_FUTURE,
+        "limit": limit,
+    }
+    conn = connect(db)
+    try:
+        return {
+            name: [dict(row) for row in conn.execute(QUERIES[name], params)] for name in (names or list(QUERIES))
+        }
+    finally:
+        conn.close()
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Tail the privileged audit log into SQLite and report aggregates")
+    p.add_argument("command", choices=["ingest", "report"], help="ingest: store new records; report: run canned queries")
+    p.add_argument("--audit-log", default=str(AUDIT_LOG), help="Active audit log path")
+    p.add_argument("--db", default=str(DB_PATH), help="Analytics database path")
+    p.add_argument("--follow", type=float, default=0.0, help="ingest: repeat every N seconds until interrupted")
+    p.add_argument("--since", help="report: lower time bound (ISO-8601, now/today/yesterday, or 90m/24h/7d ago)")
+    p.add_argument("--until", help="report: upper time bound (same forms as --since)")
+    p.add_argument("--query", action="append", choices=sorted(QUERIES), help="report: query to run (repeatable; default all)")
+    p.add_argument("--limit", type=int, default=REPORT_LIMIT, help="report: rows for top-N queries")
+    p.add_argument("--no-ingest", action="store_true", help="report: do not ingest first")
+    return p.parse_args()
+
+
+def main() -> int:
+    from audit_query import parse_when
+
+    args = parse_args()
+    active = Path(args.audit_log).expanduser()
+    db = Path(args.db).expanduser()
+    if args.command == "ingest":
+        while True:
+            print(json.dumps(ingest(active, db)), flush=True)
+            if args.follow <= 0:
+                return 0
+            try:
+                time.sleep(args.follow)
+            except KeyboardInterrupt:
+                return 0
+    try:
+        since = parse_when(args.since) if args.since else None
+        until = parse_when(args.until) if args.until else None
+    except ValueError as exc:
+        print(str(exc), file=sys.stderr)
+        return 2
+    if not args.no_ingest:
+        ingest(active, db)
+    print(json.dumps(report(db, since, until, args.query, args.limit), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
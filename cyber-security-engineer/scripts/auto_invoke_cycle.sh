@@ -20,15 +20,16 @@ mkdir -p "${LOG_DIR}" "${ASSESS_DIR}"
     python3 "${SKILL_DIR}/scripts/compliance_dashboard.py" init-assessment --system "OpenClaw" --output "${ASSESS_FILE}"
   fi
 
-  python3 "${SKILL_DIR}/scripts/live_assessment.py" --assessment-file "${ASSESS_FILE}"
+  # live_assessment enumerates sockets once and writes both monitor reports from that snapshot.
+  python3 "${SKILL_DIR}/scripts/live_assessment.py" --assessment-file "${ASSESS_FILE}" \
+    --port-report-out "${PORT_OUT}" \
+    --egress-report-out "${EGRESS_OUT}"
   python3 "${SKILL_DIR}/scripts/compliance_dashboard.py" render \
     --assessment-file "${ASSESS_FILE}" \
     --output-html "${HTML_OUT}" \
     --output-summary "${SUMMARY_OUT}"
   # Optional: notify when new violations/partials appear between cycles.
   python3 "${SKILL_DIR}/scripts/notify_on_violation.py" --summary-file "${SUMMARY_OUT}" || true
-  python3 "${SKILL_DIR}/scripts/port_monitor.py" --json > "${PORT_OUT}"
-  python3 "${SKILL_DIR}/scripts/egress_monitor.py" --json > "${EGRESS_OUT}"
 
   echo "[$(date -u +%Y-%m-%dT%H:%M:%SZ)] Completed auto security cycle"
 } >> "${RUN_LOG}" 2>&1
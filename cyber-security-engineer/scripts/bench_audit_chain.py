@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Benchmark audit chain verification: full re-verify vs incremental from the last checkpoint.
+
+Writes --records chained records through AuditWriter (rotating every
+--rotate-bytes, so most history sits in sealed gzip segments), then:
+
+  full         audit_chain.verify(full=True) over the whole history
+  incremental  verify() after each further batch of --new records, starting
+               from the checkpoint the previous run saved; this is what
+               live_assessment.py pays every cycle
+
+Also reported: the writer's append throughput with chaining on, for
+comparison with bench_audit_logger.py. Runs against a temporary log, state
+file and checkpoint key, never the real ones. No network calls are made.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from audit_chain import verify  # noqa: E402
+from audit_logger import AuditWriter, encode_event  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Benchmark full vs incremental audit chain verification")
+    p.add_argument("--records", type=int, default=100000, help="Records of history to write")
+    p.add_argument("--new", type=int, default=200, help="Records appended between incremental runs")
+    p.add_argument("--rotate-bytes", type=int, default=4 * 1024 * 1024, help="Rotation size for the history")
+    p.add_argument("--repeat", type=int, default=5, help="Timed repetitions (median reported)")
+    p.add_argument("--json", action="store_true", help="JSON output")
+    return p.parse_args()
+
+
+def _write(log: Path, count: int, offset: int) -> None:
+    # A writer per batch, closed before verify runs, so its index update never overlaps the timing.
+    writer = AuditWriter(log)
+    for i in range(offset, offset + count):
+        event = {
+            "action": "exec_start",
+            "argv": ["/usr/bin/systemctl", "restart", f"svc-{i}"],
+            "use_sudo": True,
+            "session_id": f"bench-{i % 40}",
+        }
+        writer.append(encode_event(event))
+    writer.close(timeout=60.0)
+
+
+def main() -> int:
+    args = parse_args()
+    result: Dict[str, Any] = {"records": args.records, "new_per_run": args.new}
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["OPENCLAW_AUDIT_HMAC_KEY_FILE"] = str(Path(tmp) / "audit-hmac.key")
+        os.environ["OPENCLAW_AUDIT_ROTATE_BYTES"] = str(args.rotate_bytes)
+        log = Path(tmp) / "privileged-audit.jsonl"
+        state = Path(tmp) / "verify-state.json"
+        t = time.perf_counter()
+        _write(log, args.records, 0)
+        result["write_events_per_sec"] = round(args.records / (time.perf_counter() - t), 1)
+
+        full_ms = []
+        for _ in range(args.repeat):
+            report = verify(log, state, full=True)
+            if report["status"] != "ok":
+                print(json.dumps(report, indent=2))
+                return 1
+            full_ms.append(report["elapsed_ms"])
+        result["full_ms"] = round(statistics.median(full_ms), 2)
+        result["full_records_verified"] = report["records_verified"]
+
+        inc_ms, inc_records, skipped = [], [], []
+        written = args.records
+        for _ in range(args.repeat):
+            _write(log, args.new, written)
+            written += args.new
+            report = verify(log, state)
+            if report["status"] != "ok":
+                print(json.dumps(report, indent=2))
+                return 1
+            inc_ms.append(report["elapsed_ms"])
+            inc_records.append(report["records_verified"])
+            skipped.append(report["files_skipped"])
+        result["incremental_ms"] = round(statistics.median(inc_ms), 2)
+        result["incremental_records_verified"] = statistics.median(inc_records)
+        result["incremental_files_skipped"] = statistics.median(skipped)
+    result = {"status": "ok", **result}
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        for key, value in result.items():
+            print(f"{key:>30}: {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Benchmark audit logging: per-event open/append/close vs the group-commit AuditWriter.
+
+Each client process appends --events records (sized like a guarded sudo's
+exec_start record) and then flushes, as guarded_privileged_exec.py does
+before it spawns a command. Modes:
+
+  legacy        mkdir + open("a") + write + close per event (the previous
+                append_audit), no fsync
+  writer-none   AuditWriter, fsync policy "none"
+  writer-batch  AuditWriter, fsync policy "batch" (default)
+  writer-event  AuditWriter, fsync policy "event"
+
+Reported per mode: events/sec across all clients, the median time a caller
+spends inside append (what privileged execution waits for), and a check
+that every record of the shared log (and any segments
+rotated out of it) parses and none were lost, i.e. records from
+concurrent processes never interleave. Writer modes also check that the
+hash chain (audit_chain.py) verifies end to end.
+
+Runs against a temporary log file and checkpoint key, never the real audit
+log. No network calls are made.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+import sys
+from pathlib import Path
+from typing import Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from audit_chain import CHECKPOINT_ACTION, verify  # noqa: E402
+from audit_logger import AuditWriter, encode_event  # noqa: E402
+from audit_segments import iter_records  # noqa: E402
+
+MODES = ("legacy", "writer-none", "writer-batch", "writer-event")
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Benchmark audit log appends: legacy vs group-commit writer")
+    p.add_argument("--clients", type=int, default=4, help="Concurrent client processes")
+    p.add_argument("--events", type=int, default=2000, help="Events per client")
+    p.add_argument("--json", action="store_true", help="JSON output")
+    return p.parse_args()
+
+
+def _event(worker: int, i: int) -> Dict[str, object]:
+    return {
+        "action": "exec_start",
+        "argv": ["/usr/bin/systemctl", "restart", f"svc-{worker}-{i}"],
+        "use_sudo": True,
+        "policy_version": "0" * 64,
+        "session_id": f"bench-{worker}",
+    }
+
+
+def _legacy_append(path: Path, event: Dict[str, object]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a", encoding="utf-8") as f:
+        f.write(encode_event(event).decode("utf-8"))
+
+
+def client(log: str, mode: str, worker: int, events: int, out: "multiprocessing.Queue[float]") -> None:
+    path = Path(log)
+    writer = None if mode == "legacy" else AuditWriter(path, fsync=mode.split("-", 1)[1])
+    latencies = []
+    for i in range(events):
+        event = _event(worker, i)
+        t = time.perf_counter()
+        if writer is None:
+            _legacy_append(path, event)
+        else:
+            writer.append(encode_event(event))
+        latencies.append(time.perf_counter() - t)
+    if writer is not None:
+        writer.close(timeout=60.0)
+    out.put(statistics.median(latencies))
+
+
+def measure(mode: str, tmp: Path, clients: int, events: int) -> Dict[str, object]:
+    # Own directory per mode: rotated segments live next to the log.
+    log = tmp / mode / "privileged-audit.jsonl"
+    out: "multiprocessing.Queue[float]" = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=client, args=(str(log), mode, w, events, out)) for w in range(clients)]
+    start = time.perf_counter()
+    for proc in procs:
+        proc.start()
+    medians = [out.get() for _ in procs]
+    for proc in procs:
+        proc.join()
+    secs = time.perf_counter() - start
+    # Counts records in rotated segments too; unparseable lines are not counted.
+    parsed = sum(1 for r in iter_records(log) if r.get("action") != CHECKPOINT_ACTION)
+    chained = mode == "legacy" or verify(log, tmp / mode / "verify-state.json", save=False)["status"] == "ok"
+    return {
+        "events_per_sec": round(clients * events / secs, 1),
+        "append_median_us": round(statistics.median(medians) * 1e6, 2),
+        "intact": parsed == clients * events and chained,
+    }
+
+
+def main() -> int:
+    args = parse_args()
+    results: Dict[str, object] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["OPENCLAW_AUDIT_HMAC_KEY_FILE"] = str(Path(tmp) / "audit-hmac.key")
+        for mode in MODES:
+            results[mode] = measure(mode, Path(tmp), args.clients, args.events)
+    ok = all(r["intact"] for r in results.values())  # type: ignore[index]
+    result = {"status": "ok" if ok else "fail", "clients": args.clients, "events_per_client": args.events, **results}
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        for key, value in result.items():
+            print(f"{key:>18}: {value}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
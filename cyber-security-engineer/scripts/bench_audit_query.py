@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""Benchmark audit_query.py against scanning the audit log.
+
+Builds --days of synthetic history (--per-day records a day, 40 task
+sessions, a handful of commands) in a temporary directory. Each day is
+rotated into a sealed segment, the way audit_logger does it, and the
+current day is left in the active log. Three queries are then timed:
+
+  session-yesterday  --since yesterday --until today --session-id S --action exec_start
+  argv0-all          --argv0 /usr/sbin/iptables over the whole history
+  action-week        --since 7d --action approval_denied
+
+Each query runs three ways, and all three must return the same records:
+
+  scan     audit_segments.iter_records over everything, filtered in Python
+  skip     iter_records with the time window (manifest segment skipping only)
+  indexed  audit_query.query (segment skipping + block binary search + postings)
+
+Also reported: the cost of one incremental index update after appending a
+batch of 8 records, the work audit_logger's writer thread adds per batch.
+No network calls are made.
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from audit_index import field_values, update_index  # noqa: E402
+from audit_query import query  # noqa: E402
+from audit_segments import RotationPolicy, iter_records, parse_ts, rotate  # noqa: E402
+
+COMMANDS = ["/usr/bin/systemctl", "/usr/bin/apt-get", "/usr/sbin/iptables", "/usr/bin/chown", "/bin/cp"]
+ACTIONS = ["approval_requested", "approval_granted", "exec_start", "exec_finish", "drop_elevation"]
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Benchmark indexed audit queries vs log scans")
+    p.add_argument("--days", type=int, default=90, help="Days of history")
+    p.add_argument("--per-day", type=int, default=5000, help="Records per day")
+    p.add_argument("--repeat", type=int, default=5, help="Timed repetitions per query (median reported)")
+    p.add_argument("--json", action="store_true", help="JSON output")
+    return p.parse_args()
+
+
+def _line(ts: datetime, rng: random.Random) -> bytes:
+    action = "approval_denied" if rng.random() < 0.002 else rng.choice(ACTIONS)
+    event = {
+        "action": action,
+        "argv": [rng.choice(COMMANDS), "arg"],
+        "session_id": f"task-{rng.randrange(40)}",
+    }
+    # Same shape as audit_logger.encode_event, with a synthetic timestamp.
+    payload = {"ts_utc": ts.isoformat().replace("+00:00", "Z"), **event}
+    return (json.dumps(payload, separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def build_history(active: Path, days: int, per_day: int, now: datetime) -> None:
+    rng = random.Random(7)
+    policy = RotationPolicy(retention_days=0)
+    start = (now - timedelta(days=days - 1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    step = 86400.0 / per_day
+    for day in range(days):
+        with active.open("ab") as f:
+            for i in range(per_day):
+                ts = start + timedelta(days=day, seconds=i * step)
+                if ts > now:
+                    break
+                f.write(_line(ts, rng))
+        if day < days - 1:
+            rotate(active, policy)
+    update_index(active)
+
+
+def _scan(active: Path, since: Optional[datetime], until: Optional[datetime], filters: Dict[str, str], skip: bool):
+    out = []
+    lo, hi = (since, until) if skip else (None, None)
+    for record in iter_records(active, lo, hi):
+        ts = parse_ts(record.get("ts_utc"))
+        if ts is None or (since and ts < since) or (until and ts > until):
+            continue
+        values = field_values(record)
+        if all(values.get(k) == v for k, v in filters.items()):
+            out.append(record)
+    return out
+
+
+def _timed(fn: Callable[[], List[Any]], repeat: int) -> Dict[str, Any]:
+    times, result = [], []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - t) * 1000)
+    return {"ms": round(statistics.median(times), 2), "records": result}
+
+
+def main() -> int:
+    args = parse_args()
+    now = datetime.now(timezone.utc)
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    queries = {
+        "session-yesterday": (midnight - timedelta(days=1), midnight, {"session_id": "task-7", "action": "exec_start"}),
+        "argv0-all": (None, None, {"argv0": "/usr/sbin/iptables"}),
+        "action-week": (now - timedelta(days=7), None, {"action": "approval_denied"}),
+    }
+    results: Dict[str, Any] = {}
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        active = Path(tmp) / "privileged-audit.jsonl"
+        t = time.perf_counter()
+        build_history(active, args.days, args.per_day, now)
+        results["build_s"] = round(time.perf_counter() - t, 1)
+        for name, (since, until, filters) in queries.items():
+            # Capture loop variables explicitly for the closures.
+            runs = {
+                "scan": _timed(lambda s=since, u=until, f=filters: _scan(active, s, u, f, skip=False), args.repeat),
+                "skip": _timed(lambda s=since, u=until, f=filters: _scan(active, s, u, f, skip=True), args.repeat),
+                "indexed": _timed(lambda s=since, u=until, f=filters: list(query(active, s, u, f)), args.repeat),
+            }
+            same = runs["scan"]["records"] == runs["skip"]["records"] == runs["indexed"]["records"]
+            ok = ok and same
+            results[name] = {
+                "matches": len(runs["indexed"]["records"]),
+                **{f"{mode}_ms": run["ms"] for mode, run in runs.items()},
+                "same_results": same,
+            }
+        rng = random.Random(1)
+        update_ms = []
+        for _ in range(args.repeat * 4):
+            with active.open("ab") as f:
+                for _ in range(8):
+                    f.write(_line(datetime.now(timezone.utc), rng))
+            t = time.perf_counter()
+            update_index(active)
+            update_ms.append((time.perf_counter() - t) * 1000)
+        results["index_update_per_batch_ms"] = round(statistics.median(update_ms), 2)
+    result = {"status": "ok" if ok else "fail", "days": args.days, "records_per_day": args.per_day, **results}
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        for key, value in result.items():
+            print(f"{key:>26}: {value}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Benchmark audit_store.py: canned SQLite aggregates vs computing them from the JSONL.
+
+Builds the same synthetic history as bench_audit_query.py (--days of
+--per-day records, one sealed segment per day), then reports:
+
+  ingest_initial   first ingest of the whole history (records/sec)
+  ingest_batch     one incremental ingest after appending --batch records,
+                   what each live_assessment cycle pays
+  <query>          median time of the canned query over --window vs the
+                   same aggregate computed by scanning the log with
+                   audit_segments.iter_records; both must agree
+
+Runs against a temporary log and database. No network calls are made.
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from audit_index import field_values  # noqa: E402
+from audit_segments import iter_records  # noqa: E402
+from audit_store import ingest, report  # noqa: E402
+from bench_audit_query import _line, build_history  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Benchmark SQLite audit aggregates vs JSONL scans")
+    p.add_argument("--days", type=int, default=90, help="Days of history")
+    p.add_argument("--per-day", type=int, default=5000, help="Records per day")
+    p.add_argument("--window", type=int, default=30, help="Report window in days")
+    p.add_argument("--batch", type=int, default=200, help="Records appended before the incremental ingest")
+    p.add_argument("--repeat", type=int, default=5, help="Timed repetitions (median reported)")
+    p.add_argument("--json", action="store_true", help="JSON output")
+    return p.parse_args()
+
+
+def _timed(fn: Callable[[], Any], repeat: int) -> Dict[str, Any]:
+    times, result = [], None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - t) * 1000)
+    return {"ms": round(statistics.median(times), 2), "result": result}
+
+
+def _scan_counts(active: Path, since: datetime) -> Dict[str, Any]:
+    actions: Counter = Counter()
+    commands: Counter = Counter()
+    for record in iter_records(active, since, None):
+        values = field_values(record)
+        actions[values.get("action")] += 1
+        if values.get("action") == "exec_start" and "argv0" in values:
+            commands[values["argv0"]] += 1
+    return {"actions": dict(actions), "top_commands": dict(commands.most_common(3))}
+
+
+def _sql_counts(db: Path, since: datetime) -> Dict[str, Any]:
+    rows = report(db, since, None, ["actions", "top_commands"], limit=3)
+    return {
+        "actions": {r["action"]: r["count"] for r in rows["actions"]},
+        "top_commands": {r["argv0"]: r["runs"] for r in rows["top_commands"]},
+    }
+
+
+def main() -> int:
+    args = parse_args()
+    now = datetime.now(timezone.utc)
+    since = now - timedelta(days=args.window)
+    result: Dict[str, Any] = {"days": args.days, "records_per_day": args.per_day, "window_days": args.window}
+    with tempfile.TemporaryDirectory() as tmp:
+        active = Path(tmp) / "privileged-audit.jsonl"
+        db = Path(tmp) / "audit-analytics.db"
+        build_history(active, args.days, args.per_day, now)
+        t = time.perf_counter()
+        stats = ingest(active, db)
+        secs = time.perf_counter() - t
+        result["ingest_initial"] = {"records": stats["inserted"], "s": round(secs, 2), "records_per_sec": round(stats["inserted"] / secs)}
+
+        rng = random.Random(3)
+        batch_ms: List[float] = []
+        for _ in range(args.repeat):
+            with active.open("ab") as f:
+                for _ in range(args.batch):
+                    f.write(_line(datetime.now(timezone.utc), rng))
+            batch_ms.append(ingest(active, db)["elapsed_ms"])
+        result["ingest_batch_ms"] = round(statistics.median(batch_ms), 2)
+
+        scan = _timed(lambda: _scan_counts(active, since), args.repeat)
+        sql = _timed(lambda: _sql_counts(db, since), args.repeat)
+        same = scan["result"] == sql["result"]
+        result["actions+top_commands"] = {"scan_ms": scan["ms"], "sqlite_ms": sql["ms"], "same_results": same}
+        full: Optional[Dict[str, Any]] = None
+        t = time.perf_counter()
+        full = report(db, since, None)
+        result["all_canned_queries_ms"] = round((time.perf_counter() - t) * 1000, 2)
+        result["db_mb"] = round(db.stat().st_size / 1e6, 1)
+        result["approvals"] = full["approvals"][0]
+    result = {"status": "ok" if same else "fail", **result}
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        for key, value in result.items():
+            print(f"{key:>22}: {value}")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Benchmark command-policy regex matching: combined alternation scan vs per-pattern loop.
+
+Builds a synthetic deny list, checks that both evaluators reach the same
+decision for every sample command (and that the reported pattern really
+matches), and reports per-decision latency.
+No network calls are made and no policy files are read or written.
+"""
+import argparse
+import json
+import random
+import re
+import shlex
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from command_policy import PatternSet  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Benchmark command-policy deny/allow matching")
+    p.add_argument("--patterns", type=int, default=1000, help="Synthetic deny patterns")
+    p.add_argument("--commands", type=int, default=2000, help="Synthetic commands evaluated")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--json", action="store_true", help="JSON output")
+    return p.parse_args()
+
+
+def loop_match(patterns: List[re.Pattern], text: str) -> Optional[str]:
+    # The pre-combination algorithm, kept here as the baseline.
+    for p in patterns:
+        if p.search(text):
+            return p.pattern
+    return None
+
+
+def synth_patterns(count: int) -> List[str]:
+    out: List[str] = []
+    for i in range(count):
+        kind = i % 4
+        if kind == 0:
+            out.append(rf"\bdangerous-tool-{i}\b")
+        elif kind == 1:
+            out.append(rf"^/opt/vendor{i}/bin/\w+\s+--purge")
+        elif kind == 2:
+            out.append(rf"\brm\s+-rf\s+/srv/data{i}\b")
+        else:
+            out.append(rf"--token=secret{i}(\s|$)")
+    return out
+
+
+def synth_commands(count: int, pattern_count: int, rng: random.Random) -> List[str]:
+    cmds: List[str] = []
+    for i in range(count):
+        if i % 10 == 0:
+            argv = ["/bin/rm", "-rf", f"/srv/data{rng.randrange(pattern_count)}"]
+        else:
+            argv = ["/usr/bin/systemctl", "restart", f"service{rng.randrange(10000)}"]
+        cmds.append(shlex.join(argv))
+    return cmds
+
+
+def main() -> int:
+    args = parse_args()
+    rng = random.Random(args.seed)
+    sources = synth_patterns(args.patterns)
+    commands = synth_commands(args.commands, args.patterns, rng)
+
+    start = time.perf_counter()
+    compiled = [re.compile(s) for s in sources]
+    loop_compile_ms = (time.perf_counter() - start) * 1000.0
+
+    start = time.perf_counter()
+    pattern_set = PatternSet(sources)
+    combined_compile_ms = (time.perf_counter() - start) * 1000.0
+
+    start = time.perf_counter()
+    loop_results = [loop_match(compiled, c) for c in commands]
+    loop_ms = (time.perf_counter() - start) * 1000.0
+
+    start = time.perf_counter()
+    combined_results = [pattern_set.search(c) for c in commands]
+    combined_ms = (time.perf_counter() - start) * 1000.0
+
+    mismatches = sum(1 for a, b in zip(loop_results, combined_results) if (a is None) != (b is None))
+    # The reported pattern must itself match the command it was attributed to.
+    misattributed = sum(
+        1 for c, r in zip(commands, combined_results) if r is not None and not re.search(r, c)
+    )
+    result = {
+        "patterns": len(sources),
+        "commands": len(commands),
+        "denied": sum(1 for r in combined_results if r is not None),
+        "loop_compile_ms": round(loop_compile_ms, 2),
+        "combined_compile_ms": round(combined_compile_ms, 2),
+        "loop_per_decision_us": round(loop_ms * 1000.0 / len(commands), 2),
+        "combined_per_decision_us": round(combined_ms * 1000.0 / len(commands), 2),
+        "decision_mismatches": mismatches,
+        "misattributed": misattributed,
+    }
+    if args.json:
+        print(json.dumps({"status": "ok", **result}, indent=2))
+    else:
+        for key, value in result.items():
+            print(f"{key:>32}: {value}")
+    return 0 if mismatches == 0 and misattributed == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""Benchmark the compiled egress allowlist index against the linear rule scan.
+
+Builds a synthetic allowlist (exact hosts, host_regex, cidr and port-only
+rules) and a synthetic connection snapshot, checks that both evaluators agree,
+and reports per-snapshot cost. A fixed set of host_regex edge cases (inline
+flags, group references) is also checked for agreement, since those patterns
+cannot share the combined per-bucket regex. No network calls are made.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from egress_allowlist import compile_allowlist  # noqa: E402
+from egress_monitor import is_allowed  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Benchmark egress allowlist evaluation")
+    p.add_argument("--rules", type=int, default=5000, help="Synthetic allowlist size")
+    p.add_argument("--connections", type=int, default=50000, help="Synthetic connections per snapshot")
+    p.add_argument(
+        "--linear-sample",
+        type=int,
+        default=500,
+        help="Connections timed with the linear scan (extrapolated to the full snapshot)",
+    )
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--json", action="store_true", help="JSON output")
+    return p.parse_args()
+
+
+def synth_rules(count: int, rng: random.Random) -> List[Dict[str, object]]:
+    rules: List[Dict[str, object]] = []
+    for i in range(count):
+        kind = i % 4
+        port = rng.choice([443, 80, 8443, 5432, 6379])
+        if kind == 0:
+            rules.append({"protocol": "tcp", "port": port, "host": f"10.{i % 256}.{(i // 256) % 256}.{i % 7}"})
+        elif kind == 1:
+            rules.append({"protocol": "tcp", "port": port, "host_regex": rf"^svc{i}\.example\.com$"})
+        elif kind == 2:
+            rules.append({"protocol": "tcp", "port": port, "cidr": f"172.{16 + i % 16}.{i % 256}.0/24"})
+        else:
+            rules.append({"protocol": "tcp", "port": 20000 + i, "command": f"worker{i}"})
+    return rules
+
+
+def synth_connections(count: int, rng: random.Random) -> List[Dict[str, object]]:
+    conns: List[Dict[str, object]] = []
+    for i in range(count):
+        kind = i % 4
+        if kind == 0:
+            host = f"10.{rng.randrange(256)}.{rng.randrange(4)}.{rng.randrange(7)}"
+        elif kind == 1:
+            host = f"svc{rng.randrange(6000)}.example.com"
+        elif kind == 2:
+            host = f"172.{16 + rng.randrange(16)}.{rng.randrange(256)}.{rng.randrange(256)}"
+        else:
+            host = f"203.0.113.{rng.randrange(256)}"
+        conns.append(
+            {
+                "command": f"worker{rng.randrange(6000)}",
+                "pid": 1000 + i,
+                "remote_host": host,
+                "remote_port": rng.choice([443, 80, 8443, 5432, 6379, 20000 + rng.randrange(6000)]),
+                "protocol": "tcp",
+            }
+        )
+    return conns
+
+
+# (rules, hosts): each host is checked against the rules with both evaluators.
+EDGE_CASES = [
+    (
+        [{"host_regex": r"(?i)^internal\.corp$"}, {"host_regex": r"^api\.example\.com$"}],
+        ["API.EXAMPLE.COM", "api.example.com", "INTERNAL.CORP"],
+    ),
+    (
+        [{"host_regex": r"^(a+)\.\1\.example$"}, {"host_regex": r"^(x)?(?(1)y|z)\.example$"}],
+        ["aa.aa.example", "aa.a.example", "xy.example", "z.example", "xz.example"],
+    ),
+    (
+        [{"host_regex": r"^(?P<n>db)\d+$"}, {"host_regex": r"^(?P<n>cache)\d+$"}, {"host_regex": r"^web\d+$"}],
+        ["db1", "cache2", "web3", "mail4"],
+    ),
+]
+
+
+def edge_case_mismatches() -> int:
+    mismatches = 0
+    for rules, hosts in EDGE_CASES:
+        index = compile_allowlist(rules)
+        for host in hosts:
+            conn = {"command": "curl", "remote_host": host, "remote_port": 443, "protocol": "tcp"}
+            mismatches += index.allows(conn) != is_allowed(conn, rules)
+    return mismatches
+
+
+def main() -> int:
+    args = parse_args()
+    rng = random.Random(args.seed)
+    rules = synth_rules(args.rules, rng)
+    conns = synth_connections(args.connections, rng)
+
+    start = time.perf_counter()
+    index = compile_allowlist(rules)
+    compile_ms = (time.perf_counter() - start) * 1000.0
+
+    start = time.perf_counter()
+    verdicts = [index.allows(c) for c in conns]
+    index_ms = (time.perf_counter() - start) * 1000.0
+
+    sample = conns[: max(1, min(args.linear_sample, len(conns)))]
+    start = time.perf_counter()
+    linear = [is_allowed(c, rules) for c in sample]
+    linear_sample_ms = (time.perf_counter() - start) * 1000.0
+    mismatches = sum(1 for a, b in zip(linear, verdicts) if a != b)
+    edge = edge_case_mismatches()
+
+    result = {
+        "rules": len(rules),
+        "connections": len(conns),
+        "allowed": sum(verdicts),
+        "compile_ms": round(compile_ms, 2),
+        "index_snapshot_ms": round(index_ms, 2),
+        "index_per_connection_us": round(index_ms * 1000.0 / len(conns), 2),
+        "linear_per_connection_us": round(linear_sample_ms * 1000.0 / len(sample), 2),
+        "linear_snapshot_ms_extrapolated": round(linear_sample_ms * len(conns) / len(sample), 2),
+        "verdict_mismatches_in_sample": mismatches,
+        "edge_case_mismatches": edge,
+    }
+    if args.json:
+        print(json.dumps({"status": "ok", **result}, indent=2))
+    else:
+        for key, value in result.items():
+            print(f"{key:>32}: {value}")
+    return 0 if mismatches == 0 and edge == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
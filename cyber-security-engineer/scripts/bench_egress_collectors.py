@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Benchmark egress_monitor connection collectors on synthetic socket counts.
+
+Opens N loopback TCP connections inside this process, then times each
+available backend (netlink, procfs, lsof, ss) collecting ESTABLISHED sockets.
+Loopback only; no external network calls are made.
+"""
+import argparse
+import json
+import shutil
+import socket
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import egress_monitor  # noqa: E402
+import socket_table  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore[assignment]
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Benchmark egress connection collectors")
+    p.add_argument("--counts", type=int, nargs="+", default=[100, 1000, 5000], help="Synthetic connection counts")
+    p.add_argument("--repeat", type=int, default=3, help="Timed runs per backend and count")
+    p.add_argument("--json", action="store_true", help="JSON output")
+    return p.parse_args()
+
+
+def raise_fd_limit(needed: int) -> None:
+    if resource is None:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    target = min(hard, max(soft, needed)) if hard != resource.RLIM_INFINITY else max(soft, needed)
+    if target > soft:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (target, hard))
+
+
+def open_connections(count: int) -> List[socket.socket]:
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(1024)
+    addr = listener.getsockname()
+    socks = [listener]
+    for _ in range(count):
+        client = socket.create_connection(addr)
+        server, _ = listener.accept()
+        socks.extend((client, server))
+    return socks
+
+
+def backends() -> Dict[str, Callable[[], List[Dict[str, object]]]]:
+    out: Dict[str, Callable[[], List[Dict[str, object]]]] = {}
+    if socket_table.netlink_available():
+        out["netlink"] = egress_monitor.collect_netlink
+    if socket_table.procfs_available():
+        out["procfs"] = egress_monitor.collect_procfs
+    if shutil.which("lsof"):
+        out["lsof"] = lambda: egress_monitor.parse_lsof(egress_monitor.run_lsof())
+    if shutil.which("ss"):
+        out["ss"] = lambda: egress_monitor.parse_ss(egress_monitor.run_ss())
+    return out
+
+
+def time_backend(fn: Callable[[], List[Dict[str, object]]], repeat: int) -> Dict[str, object]:
+    samples: List[float] = []
+    found = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        found = len(fn())
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return {"median_ms": round(statistics.median(samples), 2), "min_ms": round(min(samples), 2), "records": found}
+
+
+def main() -> int:
+    args = parse_args()
+    raise_fd_limit(max(args.counts) * 2 + 256)
+    results: List[Dict[str, object]] = []
+    for count in args.counts:
+        socks = open_connections(count)
+        try:
+            for name, fn in backends().items():
+                try:
+                    row = time_backend(fn, args.repeat)
+                except Exception as exc:
+                    row = {"error": str(exc)}
+                results.append({"connections": count, "backend": name, **row})
+        finally:
+            for s in socks:
+                s.close()
+
+    if args.json:
+        print(json.dumps({"status": "ok", "results": results}, indent=2))
+        return 0
+    print(f"{'connections':>11}  {'backend':<8} {'median_ms':>10} {'min_ms':>10} {'records':>8}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['connections']:>11}  {r['backend']:<8} error: {r['error']}")
+            continue
+        print(f"{r['connections']:>11}  {r['backend']:<8} {r['median_ms']:>10} {r['min_ms']:>10} {r['records']:>8}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
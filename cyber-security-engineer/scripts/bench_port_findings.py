@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Benchmark port_monitor finding generation against a large approved baseline.
+
+Compares the indexed build_findings with the previous per-listener linear scan
+of the approved list, on synthetic listeners and rules. No network calls are made.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from port_monitor import ApprovedPorts, build_findings, is_approved  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Benchmark port_monitor build_findings")
+    p.add_argument("--listeners", type=int, default=10000, help="Synthetic listening sockets")
+    p.add_argument("--rules", type=int, default=10000, help="Synthetic approved-port rules")
+    p.add_argument(
+        "--linear-sample",
+        type=int,
+        default=1000,
+        help="Listeners timed with the linear scan (extrapolated to all listeners)",
+    )
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--json", action="store_true", help="JSON output")
+    return p.parse_args()
+
+
+def linear_is_approved(entry: Dict[str, object], approved: List[Dict[str, object]]) -> bool:
+    # The pre-index algorithm, kept here as the baseline.
+    for rule in approved:
+        if int(rule.get("port")) != int(entry["port"]):
+            continue
+        rule_proto = str(rule.get("protocol", "tcp")).lower()
+        if rule_proto != str(entry["protocol"]).lower():
+            continue
+        rule_cmd = rule.get("command")
+        if rule_cmd and str(rule_cmd).lower() != str(entry["command"]).lower():
+            continue
+        return True
+    return False
+
+
+def main() -> int:
+    args = parse_args()
+    rng = random.Random(args.seed)
+    rules = [
+        {"port": 1024 + rng.randrange(30000), "protocol": "tcp", "command": f"svc{rng.randrange(500)}"}
+        for _ in range(args.rules)
+    ]
+    entries = [
+        {
+            "command": f"svc{rng.randrange(500)}",
+            "pid": 1000 + i,
+            "user": "root",
+            "host": rng.choice(["127.0.0.1", "0.0.0.0", "::", "10.0.0.5"]),
+            "port": rng.choice([80, 23]) if i % 50 == 0 else 1024 + rng.randrange(30000),
+            "protocol": "tcp",
+        }
+        for i in range(args.listeners)
+    ]
+
+    start = time.perf_counter()
+    approved = ApprovedPorts(rules)
+    index_ms = (time.perf_counter() - start) * 1000.0
+
+    start = time.perf_counter()
+    findings = build_findings(entries, approved)
+    findings_ms = (time.perf_counter() - start) * 1000.0
+
+    sample = entries[: max(1, min(args.linear_sample, len(entries)))]
+    start = time.perf_counter()
+    linear = [linear_is_approved(e, rules) for e in sample]
+    linear_ms = (time.perf_counter() - start) * 1000.0
+    mismatches = sum(1 for e, ok in zip(sample, linear) if is_approved(e, approved) != ok)
+
+    result = {
+        "listeners": len(entries),
+        "rules": len(rules),
+        "findings": len(findings),
+        "index_build_ms": round(index_ms, 2),
+        "build_findings_ms": round(findings_ms, 2),
+        "linear_approval_ms_extrapolated": round(linear_ms * len(entries) / len(sample), 2),
+        "approval_mismatches_in_sample": mismatches,
+    }
+    if args.json:
+        print(json.dumps({"status": "ok", **result}, indent=2))
+    else:
+        for key, value in result.items():
+            print(f"{key:>32}: {value}")
+    return 0 if mismatches == 0 else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""Benchmark session-guard requests per second: file-based transactions vs guard_daemon.py.
+
+Two workloads, each one guarded_privileged_exec.py invocation per request:
+
+  cycle         authorize -> approve+elevated_used -> drop (the default,
+                three transactions; the drop is written through by the
+                daemon, so both paths pay one fsync per request)
+  keep-session  authorize + elevated_used on an already approved argv
+                (--keep-session; the daemon absorbs these write-behind)
+
+The file-based path locks, loads and atomically saves the state file per
+transaction; the daemon path is one socket round trip per transaction.
+
+Runs against a temporary state file and socket (never the real ~/.openclaw
+state) with N concurrent client processes. No network calls are made.
+"""
+import argparse
+import json
+import multiprocessing
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from guard_daemon import connect, open_guard  # noqa: E402
+from root_session_guard import load_state  # noqa: E402
+
+DAEMON_SCRIPT = Path(__file__).resolve().parent / "guard_daemon.py"
+WORKLOADS = ("cycle", "keep-session")
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Benchmark session guard file path vs resident daemon")
+    p.add_argument("--clients", type=int, default=4, help="Concurrent client processes")
+    p.add_argument("--requests", type=int, default=200, help="Requests per client per workload")
+    p.add_argument("--json", action="store_true", help="JSON output")
+    return p.parse_args()
+
+
+def client(state_file: str, socket_path: str, workload: str, worker: int, requests: int) -> None:
+    state, sock = Path(state_file), Path(socket_path)
+    session = f"bench-{worker}"
+    if workload == "keep-session":
+        argv = ["/usr/bin/true", f"w{worker}"]
+        with open_guard(state, 30, sock) as g:
+            g.approve("bench", argv, session)
+        for _ in range(requests):
+            with open_guard(state, 30, sock) as g:
+                g.authorize(argv, session)
+                g.elevated_used(session)
+        return
+    for i in range(requests):
+        argv = ["/usr/bin/true", f"w{worker}", f"r{i}"]
+        with open_guard(state, 30, sock) as g:
+            g.authorize(argv, session)
+        with open_guard(state, 30, sock) as g:
+            g.approve("bench", argv, session)
+            g.elevated_used(session)
+        with open_guard(state, 30, sock) as g:
+            g.drop("post-command", session)
+
+
+def run_clients(state_file: Path, socket_path: Path, workload: str, clients: int, requests: int) -> float:
+    procs = [
+        multiprocessing.Process(target=client, args=(str(state_file), str(socket_path), workload, w, requests))
+        for w in range(clients)
+    ]
+    start = time.perf_counter()
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+    if any(proc.exitcode != 0 for proc in procs):
+        raise RuntimeError("a client process failed")
+    return time.perf_counter() - start
+
+
+def start_daemon(state_file: Path, socket_path: Path) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, str(DAEMON_SCRIPT), "--state-file", str(state_file), "--socket", str(socket_path)],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    proc.stdout.readline()  # ready line
+    deadline = time.monotonic() + 5.0
+    while time.monotonic() < deadline:
+        sock = connect(socket_path)
+        if sock is not None:
+            sock.close()
+            return proc
+        time.sleep(0.01)
+    proc.terminate()
+    raise RuntimeError("guard daemon did not start")
+
+
+def measure(mode: str, workload: str, tmp: Path, clients: int, requests: int) -> Dict[str, object]:
+    state_file = tmp / f"{mode}-{workload}-state.json"
+    socket_path = tmp / f"{mode}-{workload}.sock"
+    daemon = start_daemon(state_file, socket_path) if mode == "daemon" else None
+    try:
+        secs = run_clients(state_file, socket_path, workload, clients, requests)
+    finally:
+        if daemon is not None:
+            daemon.terminate()
+            daemon.wait(timeout=10)
+    final = load_state(state_file)
+    total = clients * requests
+    expected = ("normal", 0) if workload == "cycle" else ("elevated", clients)
+    return {
+        "requests_per_sec": round(total / secs, 1),
+        "final_state_ok": (final.privilege_mode, final.approval_count()) == expected,
+    }
+
+
+def main() -> int:
+    args = parse_args()
+    workloads: Dict[str, object] = {}
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        for workload in WORKLOADS:
+            file_result = measure("file", workload, Path(tmp), args.clients, args.requests)
+            daemon_result = measure("daemon", workload, Path(tmp), args.clients, args.requests)
+            ok = ok and bool(file_result["final_state_ok"]) and bool(daemon_result["final_state_ok"])
+            workloads[workload] = {
+                "file_rps": file_result["requests_per_sec"],
+                "daemon_rps": daemon_result["requests_per_sec"],
+                "speedup": round(float(daemon_result["requests_per_sec"]) / float(file_result["requests_per_sec"]), 2),
+            }
+    result = {
+        "status": "ok" if ok else "fail",
+        "clients": args.clients,
+        "requests_per_client": args.requests,
+        **workloads,
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        for key, value in result.items():
+            print(f"{key:>20}: {value}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""Benchmark sudo-shim overhead: wall clock from exec until the real command is spawned.
+
+Two launch paths are measured with the same approval flow:
+
+  baseline  bash -> python3 guarded_privileged_exec.py (the pre-optimization
+            shim exec line: site imports on, main script recompiled each run)
+  shim      the ~/.openclaw/bin/sudo wrapper exactly as
+            install-openclaw-runtime-hook.sh renders it
+
+Each run gets OPENCLAW_TRACE_T0 (set just before the spawn) and
+OPENCLAW_EXEC_TRACE; guarded_privileged_exec.py writes its phase marks, and
+the per-phase medians are reported:
+
+  startup    exec -> guarded_privileged_exec's standard-library imports done
+             (bash + interpreter)
+  imports    sibling-module imports
+  checks     argument parsing, binary validation and policy decision
+  authorize  session-guard authorize transaction
+  prompt     approval prompt (answered from a pipe here)
+  approve    approve + elevated-used transaction and audit record
+  spawn      -> just before the real command is spawned
+
+Everything runs under a temporary HOME. The "real sudo" is /usr/bin/env (root-owned,
+runs its arguments) and the command is /bin/true, so nothing is elevated.
+No network calls are made.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+INSTALLER = SCRIPTS_DIR / "install-openclaw-runtime-hook.sh"
+PHASES = [
+    ("startup", "started"),
+    ("imports", "imported"),
+    ("checks", "checked"),
+    ("authorize", "authorized"),
+    ("prompt", "approval"),
+    ("approve", "approved"),
+    ("spawn", "exec"),
+]
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Benchmark sudo shim cold-start overhead by phase")
+    p.add_argument("--runs", type=int, default=20, help="Measured runs per launch path (after one warm-up)")
+    p.add_argument("--real-sudo", default="/usr/bin/env", help="Stand-in for the real sudo binary")
+    p.add_argument("--command", default="/bin/true", help="Command the shim runs")
+    p.add_argument("--json", action="store_true", help="JSON output")
+    return p.parse_args()
+
+
+def render_shim(dest: Path, real_sudo: str) -> None:
+    """Write the wrapper from the installer's heredoc, with the installer's own expansion rules."""
+    text = INSTALLER.read_text(encoding="utf-8")
+    m = re.search(r'cat > "\$\{WRAPPER\}" <<EOF\n(.*?\n)EOF\n', text, re.S)
+    if not m:
+        raise RuntimeError("wrapper heredoc not found in install-openclaw-runtime-hook.sh")
+    script = (
+        f"REAL_SUDO={json.dumps(real_sudo)}\n"
+        f"PYTHON3={json.dumps(sys.executable)}\n"
+        f"SKILL_DIR_DEFAULT={json.dumps(str(SCRIPTS_DIR.parent))}\n"
+        f'cat > {json.dumps(str(dest))} <<EOF\n{m.group(1)}EOF\n'
+    )
+    subprocess.run(["bash", "-c", script], check=True)
+    dest.chmod(0o700)
+
+
+def run_once(cmd: List[str], env: Dict[str, str], trace: Path) -> Dict[str, float]:
+    if trace.exists():
+        trace.unlink()
+    env = dict(env, OPENCLAW_EXEC_TRACE=str(trace))
+    t0 = time.time_ns()
+    env["OPENCLAW_TRACE_T0"] = str(t0)
+    proc = subprocess.run(cmd, env=env, input="y\n", capture_output=True, text=True)
+    wall_ms = (time.time_ns() - t0) / 1e6
+    if proc.returncode != 0:
+        raise RuntimeError(f"{cmd[0]} exited {proc.returncode}: {proc.stderr.strip()[-300:]}")
+    marks = dict(json.loads(trace.read_text(encoding="utf-8"))["marks"])
+    out: Dict[str, float] = {}
+    prev = t0
+    for phase, mark in PHASES:
+        out[phase] = (marks[mark] - prev) / 1e6
+        prev = marks[mark]
+    out["overhead"] = (marks["exec"] - t0) / 1e6
+    out["wall"] = wall_ms
+    return out
+
+
+def measure(cmd: List[str], env: Dict[str, str], trace: Path, runs: int) -> Dict[str, float]:
+    run_once(cmd, env, trace)  # warm-up: bytecode and decision caches
+    samples = [run_once(cmd, env, trace) for _ in range(runs)]
+    return {key: round(statistics.median(s[key] for s in samples), 2) for key in samples[0]}
+
+
+def main() -> int:
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        home = Path(tmp)
+        shim = home / ".openclaw" / "bin" / "sudo"
+        shim.parent.mkdir(parents=True)
+        render_shim(shim, args.real_sudo)
+        env = {
+            "HOME": str(home),
+            "PATH": os.environ.get("PATH", "/usr/bin:/bin"),
+            "OPENCLAW_ALLOW_NONINTERACTIVE_SUDO": "1",
+            "OPENCLAW_REAL_SUDO": args.real_sudo,
+        }
+        trace = home / "trace.json"
+        baseline_cmd = [
+            "bash",
+            "-c",
+            'exec "$@"',
+            "bash",
+            sys.executable,
+            str(SCRIPTS_DIR / "guarded_privileged_exec.py"),
+            "--reason",
+            "bench",
+            "--use-sudo",
+            "--",
+            args.command,
+        ]
+        results = {
+            "baseline": measure(baseline_cmd, env, trace, args.runs),
+            "shim": measure([str(shim), args.command], env, trace, args.runs),
+        }
+    results_ms = {"runs": args.runs, **{name: r for name, r in results.items()}}
+    results_ms["overhead_saved_ms"] = round(results["baseline"]["overhead"] - results["shim"]["overhead"], 2)
+    if args.json:
+        print(json.dumps({"status": "ok", "unit": "ms", **results_ms}, indent=2))
+    else:
+        print(f"{'phase (ms, median)':>20} {'baseline':>10} {'shim':>10}")
+        for key in [p for p, _ in PHASES] + ["overhead", "wall"]:
+            print(f"{key:>20} {results['baseline'][key]:>10} {results['shim'][key]:>10}")
+        print(f"{'overhead saved':>20} {results_ms['overhead_saved_ms']:>10}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,45 +1,249 @@
 #!/usr/bin/env python3
+"""Command allow/deny policy evaluation for guarded privileged execution.
+
+The policy file is compiled once per (device, inode, mtime, size) stamp. The
+compiled form is memoized in-process for long-lived callers and persisted as
+a validated artifact next to the policy, so a cold start with an unchanged
+policy skips hashing and validating it again. Every decision carries the
+policy_version (a content hash) that produced it.
+
+Regex rule classes (allow, deny) are matched with one combined alternation
+scan (see PatternSet) rather than one search per pattern. Exact argv rules live in
+a tuple-keyed hash set and argv prefix rules in a token trie (see ArgvTrie),
+so those checks cost O(len(argv)) however many rules the policy has.
+"""
+import hashlib
 import json
+import os
 import re
 import shlex
 import sys
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# The regex parser is an undocumented CPython internal, used only to find the
+# leading literal that guards a pattern in PatternSet; without it (or if its
+# output changes shape) patterns are matched unguarded, which is slower but
+# equivalent.
+try:
+    try:  # Python 3.11+
+        from re import _constants as _sre, _parser as _sre_parser
+    except ImportError:  # older Pythons
+        import sre_constants as _sre  # type: ignore[no-redef]
+        import sre_parse as _sre_parser  # type: ignore[no-redef]
+    _sre_parse = _sre_parser.parse
+    _ANCHORS = {_sre.AT_BEGINNING: "^", _sre.AT_BOUNDARY: r"\b"}
+except Exception:
+    _sre = None
 
 
 POLICY_PATH = Path.home() / ".openclaw" / "security" / "command-policy.json"
+COMPILED_POLICY_PATH = Path.home() / ".openclaw" / "security" / ".command-policy.compiled.json"
+ARTIFACT_VERSION = 5
+NO_POLICY_VERSION = "none"
+
+Stamp = Tuple[int, int, int, int]
 
 
-def _load_policy() -> Dict[str, object]:
-    if not POLICY_PATH.exists():
-        return {}
+# Group references are numbered/named relative to the whole regex, so patterns
+# with backreferences or conditionals cannot be moved into a combined
+# alternation; named groups could collide with another pattern's.
+_UNCOMBINABLE = re.compile(r"\\[1-9]|\(\?P=|\(\?\(|\(\?P<")
+_DEFAULT_FLAGS = re.compile("").flags
+
+
+def _leading_literal(pattern: str) -> Optional[Tuple[str, str]]:
+    """(anchor, first character) every match of pattern starts with, if its parse tree guarantees one."""
+    if _sre is None:
+        return None
     try:
-        raw = json.loads(POLICY_PATH.read_text(encoding="utf-8"))
-        return raw if isinstance(raw, dict) else {}
-    except Exception:
-        return {}
+        items = list(_sre_parse(pattern))
+        anchor = ""
+        if items and items[0][0] is _sre.AT and items[0][1] in _ANCHORS:
+            anchor = _ANCHORS[items[0][1]]
+            items = items[1:]
+        if items and items[0][0] is _sre.LITERAL:
+            return anchor, chr(items[0][1])
+    except Exception:  # re.error, or a parser whose output no longer looks like this
+        return None
+    return None
+
+
+# Known answers; any disagreement means the parser changed and guards are not trusted.
+_LEADING_LITERAL_CHECKS = {
+    "^ab": ("^", "a"),
+    r"\bxy+": (r"\b", "x"),
+    r"\/tmp": ("", "/"),
+    "a|b": None,
+    "a?b": None,
+    "a*": None,
+    "[ab]c": None,
+    "(a)b": None,
+    "(?:ab)c": ("", "a"),
+    ".a": None,
+}
+if any(_leading_literal(p) != want for p, want in _LEADING_LITERAL_CHECKS.items()):
+    _sre = None
+
+
+class PatternSet:
+    """Ordered regex patterns matched with one combined alternation scan.
+
+    Patterns whose parse tree starts with a literal character (optionally
+    after ^ or \\b) are grouped by that anchor and character, and each group
+    sits behind a lookahead on the character, with the anchor factored out:
+
+        \\b(?:(?=r)(?:(?:p1)|(?:p2))|(?=s)(?:...))|^(?:...)|(?:other)
+
+    so at each position the engine checks the anchor once and enters only
+    the group for the character there instead of trying every branch. Other
+    patterns are plain branches of the same alternation. One search decides
+    the match; the pattern that fired is then identified by re-matching only
+    the patterns that can start with the character at the match position.
+    Patterns that cannot be combined (group references, conditionals, named
+    groups, inline global flags) are searched individually.
+    """
+
+    def __init__(self, patterns: List[str], separate: Optional[List[int]] = None) -> None:
+        self.patterns = patterns
+        if separate is None:
+            separate = [i for i, p in enumerate(patterns) if not self._combinable(p)]
+        self.separate = separate
+        skip = set(separate)
+        by_anchor: Dict[str, Dict[str, List[str]]] = {}
+        unguarded: List[str] = []
+        self._by_char: Dict[str, List[re.Pattern]] = {}
+        self._unguarded: List[re.Pattern] = []
+        for i, pattern in enumerate(patterns):
+            if i in skip:
+                continue
+            lead = _leading_literal(pattern)
+            if lead is None:
+                unguarded.append(pattern)
+                self._unguarded.append(re.compile(pattern))
+            else:
+                by_anchor.setdefault(lead[0], {}).setdefault(lead[1], []).append(pattern)
+                self._by_char.setdefault(lead[1], []).append(re.compile(pattern))
+        branches = [
+            anchor
+            + "(?:"
+            + "|".join(
+                f"(?={re.escape(char)})(?:" + "|".join(f"(?:{p})" for p in members) + ")"
+                for char, members in groups.items()
+            )
+            + ")"
+            for anchor, groups in by_anchor.items()
+        ]
+        branches += [f"(?:{p})" for p in unguarded]
+        self._extra: List[re.Pattern] = [re.compile(patterns[i]) for i in separate]
+        self._combined: Optional[re.Pattern] = None
+        if branches:
+            try:
+                self._combined = re.compile("|".join(branches))
+            except re.error:
+                # Should not happen after _combinable; stay correct by searching each pattern.
+                self._extra = [re.compile(p) for p in patterns]
+                self._by_char, self._unguarded = {}, []
+
+    @staticmethod
+    def _combinable(pattern: str) -> bool:
+        if _UNCOMBINABLE.search(pattern):
+            return False
+        try:
+            return re.compile(pattern).flags == _DEFAULT_FLAGS
+        except re.error:
+            return False
+
+    def __bool__(self) -> bool:
+        return bool(self.patterns)
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def search(self, text: str) -> Optional[str]:
+        """Return the source of a pattern that matches text, or None."""
+        if self._combined is not None:
+            m = self._combined.search(text)
+            if m is not None:
+                pos = m.start()
+                candidates = self._by_char.get(text[pos : pos + 1], []) + self._unguarded
+                for p in candidates:
+                    if p.match(text, pos):
+                        return p.pattern
+                return self._combined.pattern
+        for p in self._extra:
+            if p.search(text):
+                return p.pattern
+        return None
+
+
+class ArgvTrie:
+    """Token trie of argv prefixes; match() walks at most len(argv) nodes."""
+
+    # Tokens are non-empty strings, so "" can mark the end of a rule.
+    _END = ""
+
+    def __init__(self, prefixes: Iterable[List[str]] = ()) -> None:
+        self.prefixes: List[List[str]] = []
+        self._root: Dict[str, dict] = {}
+        for prefix in prefixes:
+            self.add(prefix)
+
+    def __bool__(self) -> bool:
+        return bool(self.prefixes)
+
+    def add(self, prefix: List[str]) -> None:
+        node = self._root
+        for token in prefix:
+            node = node.setdefault(token, {})
+        node[self._END] = {}
+        self.prefixes.append(list(prefix))
+
+    def match(self, argv: List[str]) -> Optional[List[str]]:
+        """Return the shortest rule that is a prefix of argv, or None."""
+        node = self._root
+        for depth, token in enumerate(argv):
+            node = node.get(token)  # type: ignore[assignment]
+            if node is None:
+                return None
+            if self._END in node:
+                return argv[: depth + 1]
+        return None
+
+
+@dataclass
+class CompiledPolicy:
+    version: str
+    allow: PatternSet = field(default_factory=lambda: PatternSet([]))
+    deny: PatternSet = field(default_factory=lambda: PatternSet([]))
+    allow_exact: Set[Tuple[str, ...]] = field(default_factory=set)
+    deny_exact: Set[Tuple[str, ...]] = field(default_factory=set)
+    allow_prefix: ArgvTrie = field(default_factory=ArgvTrie)
+    deny_prefix: ArgvTrie = field(default_factory=ArgvTrie)
+
 
+_MEMO: Dict[str, Tuple[Stamp, CompiledPolicy]] = {}
 
-def _compile_patterns(items: object) -> List[re.Pattern]:
+
+def _compile_patterns(items: object) -> PatternSet:
     if not isinstance(items, list):
-        return []
-    out: List[re.Pattern] = []
+        return PatternSet([])
+    out: List[str] = []
     for s in items:
         if not isinstance(s, str) or not s.strip():
             continue
         try:
-            out.append(re.compile(s))
+            re.compile(s)
         except re.error as e:
             sys.stderr.write(f"command_policy: skipping invalid regex pattern '{s}': {e}\n")
             continue
-    return out
+        out.append(s)
+    return PatternSet(out)
 
 
-def _match_any(patterns: List[re.Pattern], text: str) -> Optional[str]:
-    for p in patterns:
-        if p.search(text):
-            return p.pattern
-    return None
+def _match_any(patterns: PatternSet, text: str) -> Optional[str]:
+    return patterns.search(text)
 
 
 def _load_exact_rules(items: object) -> List[List[str]]:
@@ -47,13 +251,149 @@ def _load_exact_rules(items: object) -> List[List[str]]:
         return []
     out: List[List[str]] = []
     for entry in items:
-        if isinstance(entry, list) and all(isinstance(s, str) and s for s in entry):
+        # An empty rule would turn on allowlist mode without ever matching, or match nothing as a deny.
+        if isinstance(entry, list) and entry and all(isinstance(s, str) and s for s in entry):
             out.append(entry)
     return out
 
 
-def _match_exact(rules: List[List[str]], argv: List[str]) -> bool:
-    return any(rule == argv for rule in rules)
+def _match_exact(rules: Set[Tuple[str, ...]], argv: List[str]) -> bool:
+    return tuple(argv) in rules
+
+
+def _stamp(path: Path) -> Optional[Stamp]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _compile_raw(raw: bytes) -> CompiledPolicy:
+    version = hashlib.sha256(raw).hexdigest()[:16]
+    try:
+        pol = json.loads(raw.decode("utf-8"))
+    except Exception:
+        pol = {}
+    if not isinstance(pol, dict):
+        pol = {}
+    return CompiledPolicy(
+        version=version,
+        allow=_compile_patterns(pol.get("allow")),
+        deny=_compile_patterns(pol.get("deny")),
+        allow_exact={tuple(r) for r in _load_exact_rules(pol.get("allow_exact"))},
+        deny_exact={tuple(r) for r in _load_exact_rules(pol.get("deny_exact"))},
+        allow_prefix=ArgvTrie(_load_exact_rules(pol.get("allow_prefix"))),
+        deny_prefix=ArgvTrie(_load_exact_rules(pol.get("deny_prefix"))),
+    )
+
+
+def _load_artifact(artifact: Path, source: Path, stamp: Stamp) -> Optional[CompiledPolicy]:
+    try:
+        data = json.loads(artifact.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if (
+        not isinstance(data, dict)
+        or data.get("artifact_version") != ARTIFACT_VERSION
+        or data.get("source") != str(source)
+        or data.get("stamp") != list(stamp)
+    ):
+        return None
+    try:
+        # Patterns were validated and classified when the artifact was written.
+        return CompiledPolicy(
+            version=str(data["policy_version"]),
+            allow=PatternSet(list(data["allow"]), list(data["allow_separate"])),
+            deny=PatternSet(list(data["deny"]), list(data["deny_separate"])),
+            allow_exact={tuple(r) for r in data["allow_exact"]},
+            deny_exact={tuple(r) for r in data["deny_exact"]},
+            allow_prefix=ArgvTrie(data["allow_prefix"]),
+            deny_prefix=ArgvTrie(data["deny_prefix"]),
+        )
+    except (KeyError, TypeError, IndexError, ValueError, re.error):
+        return None
+
+
+def _save_artifact(artifact: Path, source: Path, stamp: Stamp, policy: CompiledPolicy) -> None:
+    """Best-effort atomic write; the artifact is only a cache and may be deleted at any time."""
+    data = {
+        "artifact_version": ARTIFACT_VERSION,
+        "source": str(source),
+        "stamp": list(stamp),
+        "policy_version": policy.version,
+        "allow": policy.allow.patterns,
+        "allow_separate": policy.allow.separate,
+        "deny": policy.deny.patterns,
+        "deny_separate": policy.deny.separate,
+        "allow_exact": sorted(policy.allow_exact),
+        "deny_exact": sorted(policy.deny_exact),
+        "allow_prefix": policy.allow_prefix.prefixes,
+        "deny_prefix": policy.deny_prefix.prefixes,
+    }
+    tmp = artifact.with_name(f".{artifact.name}.{os.getpid()}.tmp")
+    try:
+        artifact.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(str(tmp), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp, artifact)
+    except OSError:
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+
+
+def load_compiled_policy(path: Optional[Path] = None, artifact: Optional[Path] = None) -> CompiledPolicy:
+    """Return the compiled policy, recompiling only when the file's stamp changes."""
+    path = POLICY_PATH if path is None else path
+    artifact = COMPILED_POLICY_PATH if artifact is None else artifact
+    stamp = _stamp(path)
+    if stamp is None:
+        return CompiledPolicy(version=NO_POLICY_VERSION)
+    cached = _MEMO.get(str(path))
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    policy = _load_artifact(artifact, path, stamp)
+    if policy is None:
+        try:
+            raw = path.read_bytes()
+        except OSError:
+            return CompiledPolicy(version=NO_POLICY_VERSION)
+        policy = _compile_raw(raw)
+        # Only persist if the file did not change while it was being read.
+        if _stamp(path) == stamp:
+            _save_artifact(artifact, path, stamp, policy)
+    _MEMO[str(path)] = (stamp, policy)
+    return policy
+
+
+def current_policy_version(path: Optional[Path] = None, artifact: Optional[Path] = None) -> str:
+    """The policy_version evaluate_command would report now, without compiling the policy."""
+    path = POLICY_PATH if path is None else path
+    artifact = COMPILED_POLICY_PATH if artifact is None else artifact
+    stamp = _stamp(path)
+    if stamp is None:
+        return NO_POLICY_VERSION
+    cached = _MEMO.get(str(path))
+    if cached is not None and cached[0] == stamp:
+        return cached[1].version
+    try:
+        data = json.loads(artifact.read_text(encoding="utf-8"))
+        if (
+            isinstance(data, dict)
+            and data.get("artifact_version") == ARTIFACT_VERSION
+            and data.get("source") == str(path)
+            and data.get("stamp") == list(stamp)
+        ):
+            return str(data["policy_version"])
+    except (OSError, ValueError, KeyError):
+        pass
+    try:
+        return hashlib.sha256(path.read_bytes()).hexdigest()[:16]
+    except OSError:
+        return NO_POLICY_VERSION
 
 
 def evaluate_command(argv: List[str]) -> Dict[str, object]:
@@ -65,36 +405,52 @@ def evaluate_command(argv: List[str]) -> Dict[str, object]:
         "allow": ["^/usr/bin/apt\\b", "^/usr/bin/brew\\b"],
         "deny":  ["\\brm\\s+-rf\\b"],
         "allow_exact": [["/usr/bin/systemctl","restart","nginx"]],
-        "deny_exact":  [["/usr/bin/rm","-rf","/"]]
+        "deny_exact":  [["/usr/bin/rm","-rf","/"]],
+        "allow_prefix": [["/usr/bin/systemctl","status"]],
+        "deny_prefix":  [["/usr/bin/rm","-rf"]]
       }
 
     Behavior:
     - If policy file is missing: allow.
-    - If deny_exact or deny regex matches: block.
-    - If allow_exact is non-empty: require exact match.
+    - If deny_exact, deny_prefix or deny regex matches: block.
+    - If allow_exact or allow_prefix is non-empty: require an exact or prefix match.
     - Else if allow regex list is non-empty: require allow match.
+
+    A prefix rule matches any argv that starts with exactly those tokens.
+
+    Every decision includes "policy_version" ("none" when no policy file exists).
     """
+    pol = load_compiled_policy()
+    decision = _decide(pol, argv)
+    decision["policy_version"] = pol.version
+    return decision
+
+
+def _decide(pol: CompiledPolicy, argv: List[str]) -> Dict[str, object]:
     cmd_str = shlex.join(argv) if argv else ""
-    pol = _load_policy()
-    allow = _compile_patterns(pol.get("allow"))
-    deny = _compile_patterns(pol.get("deny"))
-    allow_exact = _load_exact_rules(pol.get("allow_exact"))
-    deny_exact = _load_exact_rules(pol.get("deny_exact"))
 
-    if deny_exact and _match_exact(deny_exact, argv):
+    if pol.deny_exact and _match_exact(pol.deny_exact, argv):
         return {"allowed": False, "reason": "deny_exact_match", "pattern": "exact"}
 
-    deny_match = _match_any(deny, cmd_str)
+    deny_prefix = pol.deny_prefix.match(argv)
+    if deny_prefix:
+        return {"allowed": False, "reason": "deny_prefix_match", "pattern": f"prefix:{shlex.join(deny_prefix)}"}
+
+    deny_match = _match_any(pol.deny, cmd_str)
     if deny_match:
         return {"allowed": False, "reason": "deny_match", "pattern": deny_match}
 
-    if allow_exact:
-        if not _match_exact(allow_exact, argv):
-            return {"allowed": False, "reason": "not_in_allow_exact", "pattern": None}
-        return {"allowed": True, "reason": "allow_exact_match", "pattern": "exact"}
+    if pol.allow_exact or pol.allow_prefix:
+        if _match_exact(pol.allow_exact, argv):
+            return {"allowed": True, "reason": "allow_exact_match", "pattern": "exact"}
+        allow_prefix = pol.allow_prefix.match(argv)
+        if allow_prefix:
+            return {"allowed": True, "reason": "allow_prefix_match", "pattern": f"prefix:{shlex.join(allow_prefix)}"}
+        reason = "not_in_allow_exact_or_prefix" if pol.allow_prefix else "not_in_allow_exact"
+        return {"allowed": False, "reason": reason, "pattern": None}
 
-    if allow:
-        allow_match = _match_any(allow, cmd_str)
+    if pol.allow:
+        allow_match = _match_any(pol.allow, cmd_str)
         if not allow_match:
             return {"allowed": False, "reason": "not_in_allowlist", "pattern": None}
         return {"allowed": True, "reason": "allow_match", "pattern": allow_match}
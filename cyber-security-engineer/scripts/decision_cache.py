@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""LRU cache of privileged-command checks (binary validation + policy decision).
+
+Entries are keyed by (argv tuple, policy_version, binary stamp), where the
+binary stamp is the (device, inode, mtime, uid, mode) of what argv[0]
+resolves to. Editing the policy changes its version, and replacing,
+touching, chown-ing or chmod-ing the binary changes its stamp, so a stale
+entry can never be hit, only left to age out.
+
+To keep hits cheap, the cache also remembers which policy_version the
+policy file had at a given (device, inode, mtime, size) stamp, so a hit
+needs neither command_policy nor a read of the policy.
+
+The cache is kept in memory and persisted best-effort (mode 0600, atomic
+rename) so separate guarded_privileged_exec invocations share it. It is
+written only on a miss, so the on-disk order is least-recently-used as of
+the last writer; concurrent writers may drop each other's new entries,
+which only costs a later miss. No network calls are made.
+"""
+import json
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+CACHE_PATH = Path.home() / ".openclaw" / "security" / ".command-decision-cache.json"
+# Same file and "no policy" version as command_policy, which is not imported on the hit path.
+POLICY_PATH = Path.home() / ".openclaw" / "security" / "command-policy.json"
+NO_POLICY_VERSION = "none"
+CACHE_VERSION = 2
+DEFAULT_MAX_ENTRIES = 512
+
+BinaryStamp = Tuple[int, int, int, int, int]
+PolicyStamp = List[int]
+CacheKey = Tuple[Tuple[str, ...], str, BinaryStamp]
+
+
+def _policy_stamp(path: Path) -> Optional[PolicyStamp]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return [st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size]
+
+
+def binary_stamp(path: str) -> Optional[BinaryStamp]:
+    """Stamp of the file an absolute path resolves to (symlinks followed), or None."""
+    if not path or not os.path.isabs(path):
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_uid, st.st_mode)
+
+
+class DecisionCache:
+    """Bounded LRU of {"error": ..., "decision": ...} values with hit/miss counters."""
+
+    def __init__(
+        self,
+        path: Optional[Path] = CACHE_PATH,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        policy_path: Path = POLICY_PATH,
+    ) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.policy_path = policy_path
+        self.policy_stamp: Optional[PolicyStamp] = None
+        self.policy_version_at_stamp: Optional[str] = None
+        self.entries: "OrderedDict[CacheKey, Dict[str, object]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._loaded = path is None
+
+    def _load(self) -> None:
+        self._loaded = True
+        assert self.path is not None
+        try:
+            st = self.path.stat()
+            # Same trust rule as the policy: ours, and nobody else can write it.
+            if st.st_uid != os.geteuid() or st.st_mode & 0o022:
+                return
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if not isinstance(data, dict) or data.get("cache_version") != CACHE_VERSION:
+            return
+        policy = data.get("policy")
+        if isinstance(policy, dict) and isinstance(policy.get("stamp"), list) and isinstance(policy.get("version"), str):
+            self.policy_stamp = policy["stamp"]
+            self.policy_version_at_stamp = policy["version"]
+        try:
+            for argv, version, stamp, value in data.get("entries") or []:
+                self.entries[(tuple(argv), str(version), tuple(stamp))] = value  # type: ignore[index]
+        except (TypeError, ValueError):
+            self.entries.clear()
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def policy_version(self) -> Optional[str]:
+        """The command policy's current version if known for its current stamp, else None."""
+        if not self._loaded:
+            self._load()
+        stamp = _policy_stamp(self.policy_path)
+        if stamp is None:
+            return NO_POLICY_VERSION
+        return self.policy_version_at_stamp if stamp == self.policy_stamp else None
+
+    def note_policy_version(self, compute: Callable[[], str]) -> str:
+        """Compute the policy version and remember it for the stamp it was computed at."""
+        before = _policy_stamp(self.policy_path)
+        version = compute()
+        if before is not None and _policy_stamp(self.policy_path) == before:
+            self.policy_stamp, self.policy_version_at_stamp = before, version
+        return version
+
+    def get(self, key: CacheKey) -> Optional[Dict[str, object]]:
+        if not self._loaded:
+            self._load()
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: CacheKey, value: Dict[str, object]) -> None:
+        if not self._loaded:
+            self._load()
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        self._save()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries)}
+
+    def _save(self) -> None:
+        """Best-effort atomic write; the cache may be deleted at any time."""
+        if self.path is None:
+            return
+        data = {
+            "cache_version": CACHE_VERSION,
+            "policy": {"stamp": self.policy_stamp, "version": self.policy_version_at_stamp},
+            "entries": [[list(argv), version, list(stamp), value] for (argv, version, stamp), value in self.entries.items()],
+        }
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(str(tmp), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(tmp, self.path)
+        except OSError:
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""Compiled egress allowlist index.
+
+egress_allowlist.json is a JSON array of rules. Each rule may set:
+  protocol    (default "tcp")
+  port        remote port; omitted = any port
+  command     process name, case-insensitive; omitted = any process
+  host_regex  regex searched against the remote host (max 200 chars)
+  host        exact remote host (ignored when host_regex is set)
+  cidr        remote address must fall inside this network, e.g. "10.0.0.0/8"
+  netns       only applies to connections tagged with this network namespace
+              ("host", a short container id or "net:[inode]"); omitted = any
+
+compile_allowlist() turns the rules into buckets keyed by
+(netns, protocol, port, command) holding an exact-host hash set, one combined
+precompiled regex and a prefix index for CIDRs, so a connection check costs
+a handful of hash lookups instead of a scan over every rule.
+"""
+import ipaddress
+import re
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from socket_table import HOST_NETNS  # noqa: E402
+
+MAX_HOST_REGEX_LEN = 200
+IPAddress = Union[ipaddress.IPv4Address, ipaddress.IPv6Address]
+IPNetwork = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+# Group references are relative to the whole regex, and before 3.11 a
+# mid-pattern inline flag only warns and applies to the entire alternation,
+# so patterns with either are matched on their own (as in command_policy).
+_UNCOMBINABLE = re.compile(r"\\[1-9]|\(\?P=|\(\?\(")
+_DEFAULT_FLAGS = re.compile("").flags
+
+
+def _parse_network(value: object) -> Optional[IPNetwork]:
+    try:
+        return ipaddress.ip_network(str(value), strict=False)
+    except ValueError:
+        return None
+
+
+def _parse_ip(host: str) -> Optional[IPAddress]:
+    try:
+        addr = ipaddress.ip_address(host)
+    except ValueError:
+        return None
+    if addr.version == 6 and addr.ipv4_mapped is not None:
+        return addr.ipv4_mapped
+    return addr
+
+
+def _compile_host_regex(pattern: object) -> Optional[re.Pattern]:
+    pattern = str(pattern)
+    if len(pattern) > MAX_HOST_REGEX_LEN:
+        return None
+    try:
+        return re.compile(pattern)
+    except re.error:
+        return None
+
+
+def rule_matches(
+    rule: Dict[str, object], host: str, port: int, proto: str, cmd: str, netns: str = HOST_NETNS
+) -> bool:
+    """Reference (uncompiled) evaluation of a single rule."""
+    if rule.get("netns") and str(rule.get("netns")) != netns:
+        return False
+    if str(rule.get("protocol") or "tcp").lower() != proto:
+        return False
+    if "port" in rule and int(rule.get("port") or 0) != port:
+        return False
+    if "command" in rule and str(rule.get("command") or "").lower() != cmd.lower():
+        return False
+    if rule.get("cidr"):
+        network = _parse_network(rule.get("cidr"))
+        addr = _parse_ip(host)
+        if network is None or addr is None or addr.version != network.version or addr not in network:
+            return False
+    host_re = rule.get("host_regex")
+    if host_re:
+        compiled = _compile_host_regex(host_re)
+        return bool(compiled and compiled.search(host))
+    host_exact = rule.get("host")
+    if host_exact and str(host_exact) != host:
+        return False
+    return True
+
+
+class CidrIndex:
+    """Longest-prefix style lookup: one hash set of masked network ints per prefix length.
+
+    This is a level-compressed prefix trie: only prefix lengths that actually
+    occur are probed, so a lookup costs at most one set probe per distinct
+    prefix length (typically a handful) regardless of how many CIDRs exist.
+    """
+
+    def __init__(self) -> None:
+        self._by_version: Dict[int, Dict[int, Set[int]]] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self._by_version)
+
+    def add(self, network: IPNetwork) -> None:
+        levels = self._by_version.setdefault(network.version, {})
+        shift = network.max_prefixlen - network.prefixlen
+        levels.setdefault(network.prefixlen, set()).add(int(network.network_address) >> shift)
+
+    def contains(self, addr: IPAddress) -> bool:
+        levels = self._by_version.get(addr.version)
+        if not levels:
+            return False
+        value = int(addr)
+        width = addr.max_prefixlen
+        for prefixlen, prefixes in levels.items():
+            if (value >> (width - prefixlen)) in prefixes:
+                return True
+        return False
+
+
+def _combinable(pattern: re.Pattern) -> bool:
+    return pattern.flags == _DEFAULT_FLAGS and not _UNCOMBINABLE.search(pattern.pattern)
+
+
+class _Bucket:
+    __slots__ = ("any_host", "hosts", "regex", "regex_extra", "cidrs", "residual", "patterns")
+
+    def __init__(self) -> None:
+        self.any_host = False
+        self.hosts: Set[str] = set()
+        self.regex: Optional[re.Pattern] = None
+        self.regex_extra: List[re.Pattern] = []
+        self.cidrs = CidrIndex()
+        # Rules combining cidr with host/host_regex are checked with rule_matches.
+        self.residual: List[Dict[str, object]] = []
+        self.patterns: List[re.Pattern] = []
+
+    def finalize(self) -> None:
+        combinable = [p for p in self.patterns if _combinable(p)]
+        self.regex_extra = [p for p in self.patterns if not _combinable(p)]
+        if combinable:
+            try:
+                self.regex = re.compile("|".join(f"(?:{p.pattern})" for p in combinable))
+            except re.error:
+                # e.g. the same group name in two patterns.
+                self.regex_extra.extend(combinable)
+        self.patterns = []
+
+    def matches(
+        self, host: str, addr: Optional[IPAddress], port: int, proto: str, cmd: str, netns: str
+    ) -> bool:
+        if self.any_host or host in self.hosts:
+            return True
+        if addr is not None and self.cidrs and self.cidrs.contains(addr):
+            return True
+        if self.regex is not None and self.regex.search(host):
+            return True
+        for pattern in self.regex_extra:
+            if pattern.search(host):
+                return True
+        for rule in self.residual:
+            if rule_matches(rule, host, port, proto, cmd, netns):
+                return True
+        return False
+
+
+BucketKey = Tuple[Optional[str], str, Optional[int], Optional[str]]
+
+
+class AllowlistIndex:
+    def __init__(self, rules: List[Dict[str, object]]) -> None:
+        self.rules_count = len(rules)
+        self._buckets: Dict[BucketKey, _Bucket] = {}
+        self.scoped = False
+        for rule in rules:
+            if isinstance(rule, dict):
+                self._add(rule)
+        for bucket in self._buckets.values():
+            bucket.finalize()
+
+    def _add(self, rule: Dict[str, object]) -> None:
+        proto = str(rule.get("protocol") or "tcp").lower()
+        try:
+            port = int(rule.get("port") or 0) if "port" in rule else None
+        except (TypeError, ValueError):
+            return
+        command = str(rule.get("command") or "").lower() if "command" in rule else None
+        netns = str(rule.get("netns")) if rule.get("netns") else None
+        self.scoped = self.scoped or netns is not None
+        bucket = self._buckets.setdefault((netns, proto, port, command), _Bucket())
+
+        host_re = rule.get("host_regex")
+        cidr = rule.get("cidr")
+        if cidr and (host_re or rule.get("host")):
+            bucket.residual.append(rule)
+        elif cidr:
+            network = _parse_network(cidr)
+            if network is not None:
+                bucket.cidrs.add(network)
+        elif host_re:
+            compiled = _compile_host_regex(host_re)
+            if compiled is not None:
+                bucket.patterns.append(compiled)
+        elif rule.get("host"):
+            bucket.hosts.add(str(rule.get("host")))
+        else:
+            bucket.any_host = True
+
+    def allows(self, conn: Dict[str, object], aliases: Iterable[str] = ()) -> bool:
+        """True if some rule allows conn; aliases are extra names for remote_host (see host_names)."""
+        host = str(conn.get("remote_host") or "")
+        port = int(conn.get("remote_port") or 0)
+        proto = str(conn.get("protocol") or "tcp").lower()
+        cmd = str(conn.get("command") or "")
+        cmd_key = cmd.lower()
+        netns = str(conn.get("netns") or HOST_NETNS)
+        addr: Optional[IPAddress] = None
+        parsed = False
+        # Unscoped rules first; namespace-scoped buckets only exist if some rule sets netns.
+        scopes = (None, netns) if self.scoped else (None,)
+        for scope in scopes:
+            for port_key, cmd_slot in ((port, None), (port, cmd_key), (None, None), (None, cmd_key)):
+                bucket = self._buckets.get((scope, proto, port_key, cmd_slot))
+                if bucket is None:
+                    continue
+                if bucket.cidrs and not parsed:
+                    addr, parsed = _parse_ip(host), True
+                if bucket.matches(host, addr, port, proto, cmd, netns):
+                    return True
+                # Hostnames never fall inside a CIDR, so aliases are matched without an address.
+                for alias in aliases:
+                    if bucket.matches(alias, None, port, proto, cmd, netns):
+                        return True
+        return False
+
+
+def compile_allowlist(rules: List[Dict[str, object]]) -> AllowlistIndex:
+    return AllowlistIndex(rules)
@@ -3,28 +3,81 @@ import argparse
 import json
 import re
 import shutil
+import signal
 import subprocess
 import sys
+import time
+from collections import deque
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
 
+# Allow importing sibling modules when executed from arbitrary cwd.
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import host_names  # noqa: E402
+import lsof_stream  # noqa: E402
+import socket_table  # noqa: E402
+from process_info import PROCESS_CACHE, username_for_uid  # noqa: E402
+from egress_allowlist import AllowlistIndex, compile_allowlist, rule_matches  # noqa: E402
+from host_names import HostNameCache, load_host_names  # noqa: E402
 
 DEFAULT_ALLOWLIST = Path.home() / ".openclaw" / "security" / "egress_allowlist.json"
+DEFAULT_WATCH_INTERVAL = 1.0
+DEFAULT_HISTORY_SIZE = 10000
 
 
 def parse_args() -> argparse.Namespace:
     p = argparse.ArgumentParser(description="Outbound TCP connection monitor against allowlist")
     p.add_argument("--allowlist", default=str(DEFAULT_ALLOWLIST), help="Allowlist JSON file")
     p.add_argument("--json", action="store_true", help="JSON output")
+    p.add_argument(
+        "--watch",
+        action="store_true",
+        help="Run as a sampler daemon, emitting NDJSON findings as unapproved connections appear",
+    )
+    p.add_argument(
+        "--interval",
+        type=float,
+        default=DEFAULT_WATCH_INTERVAL,
+        help="Seconds between samples in --watch mode (sub-second values are allowed)",
+    )
+    p.add_argument(
+        "--history-size",
+        type=int,
+        default=DEFAULT_HISTORY_SIZE,
+        help="Open/close events kept in the in-memory ring buffer in --watch mode",
+    )
+    p.add_argument(
+        "--history-file",
+        help="Where to dump the ring buffer as NDJSON on SIGUSR1 and on exit (--watch mode)",
+    )
+    p.add_argument("--output", help="Append NDJSON findings here instead of stdout (--watch mode)")
+    p.add_argument(
+        "--all-netns",
+        action="store_true",
+        help="Scan every network namespace (containers) and tag connections with netns (Linux)",
+    )
+    p.add_argument(
+        "--host-pins",
+        default=str(host_names.DEFAULT_PINS_PATH),
+        help='JSON object {"ip": "name" | ["name", ...]} used to match host/host_regex rules',
+    )
+    p.add_argument(
+        "--resolver-log",
+        action="append",
+        default=[],
+        help="dnsmasq or NDJSON resolver log to learn IP->name mappings from (repeatable)",
+    )
+    p.add_argument(
+        "--host-cache",
+        default=str(host_names.DEFAULT_CACHE_PATH),
+        help="Persisted IP->name cache (learned resolver-log names and log offsets)",
+    )
     return p.parse_args()
 
 
-def run_lsof() -> str:
-    cmd = ["lsof", "-nP", "-iTCP", "-sTCP:ESTABLISHED"]
-    proc = subprocess.run(cmd, capture_output=True, text=True)
-    if proc.returncode != 0:
-        raise RuntimeError(proc.stderr.strip() or "Failed to run lsof")
-    return proc.stdout
+def run_lsof() -> Iterator[Dict[str, object]]:
+    return lsof_stream.stream_lsof(["-iTCP", "-sTCP:ESTABLISHED"])
 
 
 def run_ss() -> str:
@@ -58,27 +111,20 @@ def _parse_host_port(s: str) -> Tuple[Optional[str], Optional[int]]:
     return m.group(1), int(m.group(2))
 
 
-def parse_lsof(text: str) -> List[Dict[str, object]]:
-    lines = [ln for ln in text.splitlines() if ln.strip()]
-    if len(lines) <= 1:
-        return []
+def parse_lsof(records: Iterable[Dict[str, object]]) -> List[Dict[str, object]]:
+    """Build connection records from streamed `lsof -F` records (see lsof_stream)."""
     out: List[Dict[str, object]] = []
     seen = set()
-    for ln in lines[1:]:
-        parts = ln.split()
-        if len(parts) < 9:
+    for record in records:
+        if record.get("state") not in (None, "ESTABLISHED"):
             continue
-        command = parts[0]
-        pid = parts[1]
-        user = parts[2]
-        name = parts[-1]
-        rhost, rport = _parse_host_port(name)
+        rhost, rport = _parse_host_port(str(record.get("name") or ""))
         if rport is None:
             continue
         entry = {
-            "command": command,
-            "pid": int(pid) if pid.isdigit() else pid,
-            "user": user,
+            "command": record.get("command"),
+            "pid": record.get("pid"),
+            "user": record.get("user") or record.get("uid"),
             "remote_host": rhost,
             "remote_port": rport,
             "protocol": "tcp",
@@ -95,17 +141,20 @@ def parse_ss(text: str) -> List[Dict[str, object]]:
     out: List[Dict[str, object]] = []
     seen = set()
     for ln in text.splitlines():
-        if not ln.strip() or ln.startswith("State"):
+        if not ln.strip() or ln.startswith(("State", "Recv-Q")):
             continue
         # ESTAB 0 0 192.168.0.10:49820 1.2.3.4:443 users:(("proc",pid=123,fd=...))
+        # With a `state` filter ss omits the State column: 0 0 local remote users:(...)
         parts = ln.split()
+        if parts[0].isdigit():
+            parts = ["ESTAB"] + parts
         if len(parts) < 5:
             continue
         remote = parts[4]
         rhost, rport = _parse_host_port(remote)
         if rport is None:
             continue
-        m = re.search(r'users:\\(\\(\"([^\"]+)\",pid=(\\d+)', ln)
+        m = re.search(r'users:\(\("([^"]+)",pid=(\d+)', ln)
         command = m.group(1) if m else "unknown"
         pid = int(m.group(2)) if m else "unknown"
         entry = {
@@ -157,7 +206,61 @@ def parse_netstat_windows(text: str) -> List[Dict[str, object]]:
     return out
 
 
-def collect_connections() -> Tuple[List[Dict[str, object]], str]:
+def connections_from_rows(rows: Iterable[Dict[str, object]]) -> List[Dict[str, object]]:
+    """Convert owner-attached socket_table rows into the same records parse_lsof produces."""
+    out: List[Dict[str, object]] = []
+    seen = set()
+    for row in rows:
+        entry = {
+            "command": row["command"],
+            "pid": row["pid"],
+            "user": row["user"],
+            "remote_host": row["remote_host"],
+            "remote_port": row["remote_port"],
+            "protocol": "tcp",
+        }
+        if "netns" in row:
+            entry["netns"] = row["netns"]
+            entry["container_id"] = row.get("container_id")
+        key = (entry["command"], entry["pid"], entry["remote_host"], entry["remote_port"], entry.get("netns"))
+        if key in seen:
+            continue
+        seen.add(key)
+        out.append(entry)
+    return out
+
+
+def collect_netlink() -> List[Dict[str, object]]:
+    rows = socket_table.read_tcp_sockets_netlink({"ESTABLISHED"})
+    return connections_from_rows(socket_table.attach_owners(rows))
+
+
+def collect_procfs() -> List[Dict[str, object]]:
+    return connections_from_rows(socket_table.attach_owners(socket_table.read_tcp_sockets({"ESTABLISHED"})))
+
+
+def collect_all_netns() -> List[Dict[str, object]]:
+    rows = socket_table.read_tcp_sockets_all_netns({"ESTABLISHED"})
+    return connections_from_rows(socket_table.attach_owners(rows))
+
+
+def collect_connections(all_netns: bool = False) -> Tuple[List[Dict[str, object]], str]:
+    if all_netns:
+        # sock_diag only sees the caller's namespace; per-namespace procfs covers containers.
+        if not socket_table.procfs_available():
+            raise RuntimeError("--all-netns requires Linux /proc")
+        return collect_all_netns(), "procfs-netns"
+    # Kernel-side state filtering via sock_diag; fall back to procfs, then external tools.
+    if socket_table.netlink_available():
+        try:
+            return collect_netlink(), "netlink"
+        except OSError:
+            pass
+    if socket_table.procfs_available():
+        try:
+            return collect_procfs(), "procfs"
+        except OSError:
+            pass
     if shutil.which("lsof"):
         return parse_lsof(run_lsof()), "lsof"
     if sys.platform.startswith("linux") and shutil.which("ss"):
@@ -174,65 +277,275 @@ def load_allowlist(path: Path) -> List[Dict[str, object]]:
     return raw if isinstance(raw, list) else []
 
 
-def is_allowed(conn: Dict[str, object], rules: List[Dict[str, object]]) -> bool:
-    host = str(conn.get("remote_host") or "")
+def is_allowed(
+    conn: Dict[str, object],
+    rules: Union[AllowlistIndex, List[Dict[str, object]]],
+    names: Optional[HostNameCache] = None,
+) -> bool:
+    """Check conn against the allowlist; names supplies known hostnames for the remote IP."""
+    aliases = names.names_for(conn.get("remote_host")) if names is not None else ()
+    if isinstance(rules, AllowlistIndex):
+        return rules.allows(conn, aliases)
     port = int(conn.get("remote_port") or 0)
     proto = str(conn.get("protocol") or "tcp").lower()
     cmd = str(conn.get("command") or "")
-    for rule in rules:
-        if not isinstance(rule, dict):
-            continue
-        if str(rule.get("protocol") or "tcp").lower() != proto:
-            continue
-        if "port" in rule and int(rule.get("port") or 0) != port:
-            continue
-        if "command" in rule and str(rule.get("command") or "").lower() != cmd.lower():
-            continue
-        host_re = rule.get("host_regex")
-        if host_re:
+    netns = str(conn.get("netns") or socket_table.HOST_NETNS)
+    return any(
+        isinstance(rule, dict) and rule_matches(rule, host, port, proto, cmd, netns)
+        for host in (str(conn.get("remote_host") or ""), *aliases)
+        for rule in rules
+    )
+
+
+def build_finding(conn: Dict[str, object], names: Optional[HostNameCache] = None) -> Dict[str, object]:
+    finding = {
+        "type": "unapproved-egress",
+        "severity": "medium",
+        "remote_host": conn.get("remote_host"),
+        "remote_port": conn.get("remote_port"),
+        "command": conn.get("command"),
+        "recommendation": "Add to egress allowlist with justification or terminate the connection.",
+    }
+    if conn.get("netns"):
+        finding["netns"] = conn.get("netns")
+    known = names.names_for(conn.get("remote_host")) if names is not None else ()
+    if known:
+        finding["remote_names"] = list(known)
+    return finding
+
+
+def _mtime_ns(path: Path) -> Optional[int]:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def _utc_now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+class EgressWatcher:
+    """Sample established sockets repeatedly and report only what changed.
+
+    Consecutive snapshots are diffed by kernel socket cookie (netlink) or by
+    connection tuple (other backends), so the allowlist is evaluated once per
+    new connection rather than once per socket per sample, and verdicts are
+    memoized per (host, port, command, netns) until the allowlist file or the
+    host-name sources (hosts, pins, resolver logs) change.
+    """
+
+    def __init__(
+        self,
+        allow_path: Path,
+        history_size: int,
+        out: TextIO,
+        all_netns: bool = False,
+        pins_path: Path = host_names.DEFAULT_PINS_PATH,
+        resolver_logs: Iterable[Path] = (),
+        host_cache_path: Optional[Path] = host_names.DEFAULT_CACHE_PATH,
+    ) -> None:
+        self.allow_path = allow_path
+        self.all_netns = all_netns
+        self.pins_path = pins_path
+        self.resolver_logs = list(resolver_logs)
+        self.host_cache_path = host_cache_path
+        self.names = HostNameCache()
+        self.names_stamp: Optional[Tuple[Optional[int], ...]] = None
+        self.names_generation = -1
+        self.out = out
+        self.events: Deque[Dict[str, object]] = deque(maxlen=max(1, history_size))
+        self.open: Dict[object, Dict[str, object]] = {}
+        self.rules = compile_allowlist([])
+        self.rules_loaded = False
+        self.rules_stamp: Optional[Tuple[int, int]] = None
+        self.verdicts: Dict[Tuple[object, ...], bool] = {}
+        self.use_netlink = socket_table.netlink_available() and not all_netns
+
+    def _reload_rules(self) -> None:
+        try:
+            st = self.allow_path.stat()
+            stamp: Optional[Tuple[int, int]] = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            stamp = None
+        if self.rules_loaded and stamp == self.rules_stamp:
+            return
+        self.rules = compile_allowlist(load_allowlist(self.allow_path) if stamp else [])
+        self.rules_loaded = True
+        self.rules_stamp = stamp
+        self.verdicts.clear()
+
+    def _reload_names(self) -> None:
+        # /etc/hosts and the pins file are re-read only when they change; logs are tailed every tick.
+        stamp = tuple(_mtime_ns(p) for p in (host_names.HOSTS_PATH, self.pins_path))
+        if stamp != self.names_stamp:
+            # A fresh cache restarts its generation count, so it cannot be compared with the old one.
+            self.names = load_host_names(self.host_cache_path, self.pins_path, self.resolver_logs)
+            self.names_stamp = stamp
+            self.names_generation = self.names.generation
+            self.verdicts.clear()
+            return
+        host_names.refresh(self.names, self.resolver_logs, self.host_cache_path)
+        if self.names.generation != self.names_generation:
+            self.names_generation = self.names.generation
+            self.verdicts.clear()
+
+    def _snapshot(self) -> Tuple[Dict[object, object], str]:
+        if self.use_netlink:
+            try:
+                return dict(socket_table.read_tcp_socket_keys_netlink({"ESTABLISHED"})), "netlink"
+            except OSError:
+                self.use_netlink = False
+        conns, tool = collect_connections(self.all_netns)
+        return {
+            (c["command"], c["pid"], c["remote_host"], c["remote_port"], c.get("netns")): c for c in conns
+        }, tool
+
+    def _records_for(self, added: Dict[object, object], tool: str) -> Dict[object, Dict[str, object]]:
+        if tool != "netlink":
+            records = dict(added)  # type: ignore[arg-type]
+            PROCESS_CACHE.enrich(records.values())
+            return records
+        if not added:
+            return {}
+        rows = {key: socket_table.decode_diag_msg(raw) for key, raw in added.items()}  # type: ignore[arg-type]
+        by_inode = {int(row["inode"]): key for key, row in rows.items()}
+        owners = socket_table.map_socket_inodes(set(by_inode))
+        records: Dict[object, Dict[str, object]] = {}
+        for key, row in rows.items():
+            pid, comm = (owners.get(int(row["inode"])) or [("unknown", "unknown")])[0]
+            records[key] = {
+                "command": comm,
+                "pid": pid,
+                "user": username_for_uid(int(row["uid"])),
+                "remote_host": row["remote_host"],
+                "remote_port": row["remote_port"],
+                "protocol": "tcp",
+            }
+        PROCESS_CACHE.enrich(records.values())
+        return records
+
+    def _allowed(self, conn: Dict[str, object]) -> bool:
+        key = (conn.get("remote_host"), conn.get("remote_port"), conn.get("command"), conn.get("netns"))
+        verdict = self.verdicts.get(key)
+        if verdict is None:
+            verdict = is_allowed(conn, self.rules, self.names)
+            self.verdicts[key] = verdict
+        return verdict
+
+    def emit(self, record: Dict[str, object]) -> None:
+        self.out.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self.out.flush()
+
+    def step(self) -> int:
+        """Take one sample; return the number of findings emitted."""
+        self._reload_rules()
+        self._reload_names()
+        current, tool = self._snapshot()
+        ts = _utc_now_iso()
+        emitted = 0
+        for key in [k for k in self.open if k not in current]:
+            conn = self.open.pop(key)
+            self.events.append({"ts_utc": ts, "event": "close", **conn})
+        added = {k: v for k, v in current.items() if k not in self.open}
+        for key, conn in self._records_for(added, tool).items():
+            allowed = self._allowed(conn)
+            self.open[key] = conn
+            self.events.append({"ts_utc": ts, "event": "open", "allowed": allowed, **conn})
+            if not allowed:
+                self.emit(
+                    {"ts_utc": ts, "tool": tool, "pid": conn.get("pid"), "exe": conn.get("exe"), **build_finding(conn, self.names)}
+                )
+                emitted += 1
+        return emitted
+
+    def dump_history(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w", encoding="utf-8") as f:
+            for event in self.events:
+                f.write(json.dumps(event, separators=(",", ":")) + "\n")
+
+
+def watch(args: argparse.Namespace, allow_path: Path) -> int:
+    out: TextIO = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+    history_path = Path(args.history_file).expanduser() if args.history_file else None
+    watcher = EgressWatcher(
+        allow_path,
+        args.history_size,
+        out,
+        args.all_netns,
+        Path(args.host_pins).expanduser(),
+        [Path(p).expanduser() for p in args.resolver_log],
+        Path(args.host_cache).expanduser(),
+    )
+    stop = {"requested": False}
+
+    def _stop(signum, frame) -> None:
+        stop["requested"] = True
+
+    def _dump(signum, frame) -> None:
+        if history_path is not None:
+            watcher.dump_history(history_path)
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, _dump)
+
+    interval = max(0.05, float(args.interval))
+    next_tick = time.monotonic()
+    try:
+        while not stop["requested"]:
             try:
-                pattern = str(host_re)
-                if len(pattern) > 200:
-                    continue
-                if not re.search(pattern, host, flags=0):
-                    continue
-            except (re.error, TimeoutError):
-                continue
-        else:
-            host_exact = rule.get("host")
-            if host_exact and str(host_exact) != host:
-                continue
-        return True
-    return False
+                watcher.step()
+            except Exception as exc:
+                watcher.emit({"ts_utc": _utc_now_iso(), "status": "error", "error": str(exc)})
+            next_tick += interval
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.monotonic()
+    finally:
+        if history_path is not None:
+            watcher.dump_history(history_path)
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+def build_report(
+    conns: List[Dict[str, object]], tool: str, allow_path: Path, names: Optional[HostNameCache] = None
+) -> Dict[str, object]:
+    rules = load_allowlist(allow_path)
+    PROCESS_CACHE.enrich(conns)
+    index = compile_allowlist(rules)
+    if names is None:
+        names = load_host_names()
+    return {
+        "status": "ok",
+        "allowlist_file": str(allow_path),
+        "allowlist_rules_count": len(rules),
+        "host_names_known": len(names),
+        "tool": tool,
+        "connections": conns,
+        "findings": [build_finding(c, names) for c in conns if not is_allowed(c, index, names)],
+    }
 
 
 def main() -> int:
     args = parse_args()
     allow_path = Path(args.allowlist).expanduser()
+    if args.watch:
+        return watch(args, allow_path)
     try:
-        conns, tool = collect_connections()
-        rules = load_allowlist(allow_path)
-        findings = []
-        for c in conns:
-            if not is_allowed(c, rules):
-                findings.append(
-                    {
-                        "type": "unapproved-egress",
-                        "severity": "medium",
-                        "remote_host": c.get("remote_host"),
-                        "remote_port": c.get("remote_port"),
-                        "command": c.get("command"),
-                        "recommendation": "Add to egress allowlist with justification or terminate the connection.",
-                    }
-                )
-        report = {
-            "status": "ok",
-            "allowlist_file": str(allow_path),
-            "allowlist_rules_count": len(rules),
-            "tool": tool,
-            "connections": conns,
-            "findings": findings,
-        }
+        conns, tool = collect_connections(args.all_netns)
+        names = load_host_names(
+            Path(args.host_cache).expanduser(),
+            Path(args.host_pins).expanduser(),
+            [Path(p).expanduser() for p in args.resolver_log],
+        )
+        report = build_report(conns, tool, allow_path, names)
     except Exception as exc:
         report = {"status": "error", "error": str(exc)}
 
@@ -0,0 +1,435 @@
+#!/usr/bin/env python3
+"""Optional resident session guard serving root_session_guard over a Unix socket.
+
+The daemon keeps SessionState in memory and applies the same transitions as
+root_session_guard.GuardTransaction, so a privileged invocation costs one
+socket round trip instead of a locked load and save of the state file.
+
+Persistence is write-behind: changes are flushed (locked, atomic) every
+--flush-interval seconds and on shutdown, except transitions that reduce
+privilege (drop, timeout drop), which are written through immediately so a
+crash can never resurrect an elevation. Direct writes to the state file
+(root_session_guard.py drop, clients that fell back to the file) are merged
+into unflushed changes before serving or flushing, with drops and expiries
+winning, so a flush never restores a dropped session. The socket is created mode 0600 and
+peers with a different uid are rejected where SO_PEERCRED is available.
+
+Clients use open_guard(), which falls back to the file-based
+GuardTransaction when the daemon is not running. Linux/macOS only.
+No network calls are made.
+"""
+import argparse
+import copy
+import json
+import os
+import selectors
+import signal
+import socket
+import struct
+import sys
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+# Allow importing sibling modules when executed from arbitrary cwd.
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import root_session_guard as guard  # noqa: E402
+
+DEFAULT_SOCKET_PATH = guard.STATE_PATH.with_name("root-session-guard.sock")
+DEFAULT_FLUSH_INTERVAL = 0.5
+CONNECT_TIMEOUT = 0.25
+MAX_REQUEST_BYTES = 1 << 20
+
+Stamp = Optional[Tuple[int, int, int]]
+
+
+def _file_stamp(path: Path) -> Stamp:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _approvals(state: Dict[str, object]) -> Set[Tuple[str, Tuple[str, ...]]]:
+    sessions = state.get("sessions") or {}
+    return {
+        (key, tuple(entry["argv"]))
+        for key, session in sessions.items()  # type: ignore[union-attr]
+        for entry in session.get("allowed_commands") or []
+    }
+
+
+def _merge(base: guard.SessionState, mine: guard.SessionState, disk: guard.SessionState) -> guard.SessionState:
+    """Three-way merge of a direct file write into unflushed daemon state; removals on either side win."""
+    merged = copy.deepcopy(mine)
+    if base.sessions and not disk.sessions:
+        merged.sessions.clear()  # a drop of every session also covers grants not yet flushed
+    for key in list(merged.sessions):
+        ours, theirs, before = merged.sessions[key], disk.sessions.get(key), base.sessions.get(key)
+        if theirs is None:
+            if before is not None:
+                del merged.sessions[key]  # dropped or expired in the file
+            continue
+        if before is not None:
+            for argv in set(before.allowed_commands) - set(theirs.allowed_commands):
+                ours.allowed_commands.pop(argv, None)
+        for argv, added_at in theirs.allowed_commands.items():
+            ours.allowed_commands.setdefault(argv, added_at)
+        # The earlier idle deadline wins.
+        if (guard.from_iso(theirs.idle_deadline_utc) or guard.now_utc()) < (
+            guard.from_iso(ours.idle_deadline_utc) or guard.now_utc()
+        ):
+            ours.idle_deadline_utc = theirs.idle_deadline_utc
+            ours.last_elevated_activity_utc = theirs.last_elevated_activity_utc
+    for key, theirs in disk.sessions.items():
+        if key not in base.sessions and key not in merged.sessions:
+            merged.sessions[key] = copy.deepcopy(theirs)  # granted through the file
+    if not merged.sessions and mine.sessions:
+        merged.privilege_mode = "normal"
+        merged.last_transition_utc = disk.last_transition_utc
+        merged.last_action = disk.last_action
+    return merged
+
+
+def _reduces_privilege(before: Dict[str, object], after: Dict[str, object]) -> bool:
+    if before.get("privilege_mode") == "elevated" and after.get("privilege_mode") != "elevated":
+        return True
+    return not _approvals(before) <= _approvals(after)
+
+
+class ResidentGuard:
+    """In-memory session state with write-behind persistence."""
+
+    def __init__(self, state_file: Path, flush_interval: float = DEFAULT_FLUSH_INTERVAL) -> None:
+        self.state_file = state_file
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.flushes = 0
+        self.timeout_minutes = guard.DEFAULT_TIMEOUT_MINUTES
+        with guard.state_lock(state_file):
+            self.state = guard.load_state(state_file)
+            self.stamp = _file_stamp(state_file)
+        # The file as of the last load or flush, to tell direct writes from our own changes.
+        self.base = copy.deepcopy(self.state)
+
+    def _reload_if_changed(self) -> None:
+        """Adopt direct writes to the file (root_session_guard.py drop, a client that fell back to it).
+
+        Unflushed changes are merged with drops and expiries winning, so
+        neither serving nor flushing can restore a dropped session. Caller
+        holds self.lock.
+        """
+        stamp = _file_stamp(self.state_file)
+        if stamp == self.stamp:
+            return
+        disk = guard.load_state(self.state_file)
+        self.state = _merge(self.base, self.state, disk) if self.dirty else disk
+        self.base = copy.deepcopy(disk)
+        self.stamp = stamp
+
+    def apply(self, ops: List[Dict[str, object]], timeout_minutes: int) -> List[object]:
+        """Apply ops atomically with respect to other clients and return each op's result."""
+        with self.lock:
+            self._reload_if_changed()
+            self.timeout_minutes = timeout_minutes
+            calls = []
+            for op in ops:
+                name = str(op.get("op"))
+                if name not in guard.GuardOps.OPERATIONS:
+                    raise ValueError(f"unknown operation: {name}")
+                args = op.get("args") or {}
+                if not isinstance(args, dict):
+                    raise ValueError("args must be an object")
+                calls.append((name, args))
+            before = self.state.as_dict()
+            # All or nothing: an op failing part-way (e.g. bad arguments) must not leave earlier ones applied.
+            snapshot = copy.deepcopy(self.state)
+            runner = guard.GuardOps(self.state, timeout_minutes)
+            results: List[object] = []
+            try:
+                for name, args in calls:
+                    results.append(getattr(runner, name)(**args))
+            except BaseException:
+                self.state = snapshot
+                raise
+            after = self.state.as_dict()
+            if after == before:
+                return results
+            self.dirty = True
+            write_through = _reduces_privilege(before, after)
+        if write_through:
+            self.flush()
+        return results
+
+    def flush(self) -> None:
+        with self.lock:
+            if not self.dirty:
+                return
+            with guard.state_lock(self.state_file):
+                # Under the file lock, so a direct write cannot land between the merge and the save.
+                self._reload_if_changed()
+                guard.save_state(self.state_file, self.state)
+                self.stamp = _file_stamp(self.state_file)
+            self.base = copy.deepcopy(self.state)
+            self.dirty = False
+            self.flushes += 1
+
+    def sweep(self) -> None:
+        """Periodic expiry of idle sessions; removals are privilege drops, so flush right away."""
+        with self.lock:
+            if guard.sweep_expired(self.state, self.timeout_minutes):
+                self.dirty = True
+
+    def flush_loop(self, stop: threading.Event) -> None:
+        while not stop.wait(self.flush_interval):
+            try:
+                self.sweep()
+                self.flush()
+            except OSError:
+                pass
+
+
+def _peer_uid(conn: socket.socket) -> Optional[int]:
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+    creds = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    return struct.unpack("3i", creds)[1]
+
+
+class GuardServer:
+    """Single-threaded selector loop; ops take microseconds and are serialized anyway."""
+
+    def __init__(self, socket_path: Path, resident: ResidentGuard) -> None:
+        self.socket_path = socket_path
+        self.resident = resident
+        self.selector = selectors.DefaultSelector()
+        self.buffers: Dict[socket.socket, bytes] = {}
+        self.stopping = threading.Event()
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o177)
+        try:
+            self.listener.bind(str(socket_path))
+        finally:
+            os.umask(old_umask)
+        os.chmod(str(socket_path), 0o600)
+        self.listener.listen(64)
+        self.selector.register(self.listener, selectors.EVENT_READ)
+
+    def _accept(self) -> None:
+        conn, _ = self.listener.accept()
+        uid = _peer_uid(conn)
+        if uid is not None and uid != os.getuid():
+            conn.close()
+            return
+        self.buffers[conn] = b""
+        self.selector.register(conn, selectors.EVENT_READ)
+
+    def _close(self, conn: socket.socket) -> None:
+        self.selector.unregister(conn)
+        self.buffers.pop(conn, None)
+        conn.close()
+
+    def handle_line(self, line: bytes) -> Dict[str, object]:
+        try:
+            request = json.loads(line)
+            if str(Path(request.get("state_file", ""))) != str(self.resident.state_file):
+                raise ValueError("daemon serves a different state file")
+            results = self.resident.apply(
+                list(request.get("ops") or []),
+                int(request.get("timeout_minutes") or guard.DEFAULT_TIMEOUT_MINUTES),
+            )
+            return {"status": "ok", "results": results}
+        except Exception as exc:
+            return {"status": "error", "error": str(exc)}
+
+    def _serve(self, conn: socket.socket) -> None:
+        try:
+            chunk = conn.recv(65536)
+        except OSError:
+            chunk = b""
+        if not chunk:
+            self._close(conn)
+            return
+        data = self.buffers[conn] + chunk
+        *lines, rest = data.split(b"\n")
+        if len(rest) > MAX_REQUEST_BYTES:
+            self._close(conn)
+            return
+        self.buffers[conn] = rest
+        try:
+            for line in lines:
+                response = self.handle_line(line)
+                conn.sendall(json.dumps(response, separators=(",", ":")).encode("utf-8") + b"\n")
+        except OSError:
+            self._close(conn)
+
+    def serve_forever(self) -> None:
+        while not self.stopping.is_set():
+            for key, _ in self.selector.select(timeout=0.5):
+                if key.fileobj is self.listener:
+                    self._accept()
+                else:
+                    self._serve(key.fileobj)  # type: ignore[arg-type]
+
+    def shutdown(self) -> None:
+        self.stopping.set()
+
+    def server_close(self) -> None:
+        for conn in list(self.buffers):
+            self._close(conn)
+        self.selector.close()
+        self.listener.close()
+
+
+class DaemonTransaction:
+    """Client counterpart of GuardTransaction backed by the resident daemon.
+
+    Mutating calls are queued and sent together with the next query, or on
+    exit, as one request that the daemon applies atomically.
+    """
+
+    def __init__(self, sock: socket.socket, state_file: Path, timeout_minutes: int) -> None:
+        self.sock = sock
+        self.reader = sock.makefile("rb")
+        self.state_file = state_file
+        self.timeout_minutes = timeout_minutes
+        self.pending: List[Dict[str, object]] = []
+
+    def __enter__(self) -> "DaemonTransaction":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            if exc_type is None and self.pending:
+                self._send([])
+        finally:
+            self.reader.close()
+            self.sock.close()
+
+    def _send(self, ops: List[Dict[str, object]]) -> List[object]:
+        batch, self.pending = self.pending + ops, []
+        request = {"state_file": str(self.state_file), "timeout_minutes": self.timeout_minutes, "ops": batch}
+        self.sock.sendall(json.dumps(request, separators=(",", ":")).encode("utf-8") + b"\n")
+        line = self.reader.readline(MAX_REQUEST_BYTES)
+        if not line:
+            raise RuntimeError("session guard daemon closed the connection")
+        response = json.loads(line)
+        if response.get("status") != "ok":
+            raise RuntimeError(str(response.get("error") or "session guard daemon error"))
+        return list(response.get("results") or [])
+
+    def _query(self, op: str, **args: object) -> object:
+        return self._send([{"op": op, "args": args}])[-1]
+
+    def _queue(self, op: str, **args: object) -> None:
+        self.pending.append({"op": op, "args": args})
+
+    def preflight(self) -> Tuple[Dict[str, object], int]:
+        result, code = self._query("preflight")  # type: ignore[misc]
+        return result, code
+
+    def authorize(self, argv: List[str], session_id: Optional[str] = None) -> Tuple[Dict[str, object], int]:
+        result, code = self._query("authorize", argv=argv, session_id=session_id)  # type: ignore[misc]
+        return result, code
+
+    def approve(self, reason: str, argv: List[str], session_id: Optional[str] = None) -> None:
+        self._queue("approve", reason=reason, argv=argv, session_id=session_id)
+
+    def elevated_used(self, session_id: Optional[str] = None) -> None:
+        self._queue("elevated_used", session_id=session_id)
+
+    def normal_used(self) -> None:
+        self._queue("normal_used")
+
+    def drop(self, reason: str = "manual-drop", session_id: Optional[str] = None) -> None:
+        self._queue("drop", reason=reason, session_id=session_id)
+
+    def status(self) -> Dict[str, object]:
+        return self._query("status")  # type: ignore[return-value]
+
+
+def connect(socket_path: Path) -> Optional[socket.socket]:
+    if not hasattr(socket, "AF_UNIX") or not socket_path.exists():
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(CONNECT_TIMEOUT)
+    try:
+        sock.connect(str(socket_path))
+    except OSError:
+        sock.close()
+        return None
+    sock.settimeout(None)
+    return sock
+
+
+def open_guard(
+    state_file: Path = guard.STATE_PATH,
+    timeout_minutes: int = guard.DEFAULT_TIMEOUT_MINUTES,
+    socket_path: Path = DEFAULT_SOCKET_PATH,
+) -> Union[DaemonTransaction, guard.GuardTransaction]:
+    """Return a daemon-backed transaction if the daemon is up, else a file-based one."""
+    state_file = Path(os.path.expanduser(str(state_file)))
+    sock = connect(socket_path)
+    if sock is None:
+        return guard.GuardTransaction(state_file, timeout_minutes)
+    return DaemonTransaction(sock, state_file, timeout_minutes)
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Resident OpenClaw session guard (Unix socket)")
+    p.add_argument("--state-file", default=str(guard.STATE_PATH), help="Path to session state JSON file")
+    p.add_argument("--socket", default=str(DEFAULT_SOCKET_PATH), help="Unix socket path to listen on")
+    p.add_argument(
+        "--flush-interval",
+        type=float,
+        default=DEFAULT_FLUSH_INTERVAL,
+        help="Seconds between write-behind flushes (privilege drops are always written immediately)",
+    )
+    return p.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    if not hasattr(socket, "AF_UNIX"):
+        print(json.dumps({"status": "error", "error": "Unix domain sockets are not supported here"}))
+        return 1
+    state_file = Path(os.path.expanduser(args.state_file))
+    socket_path = Path(os.path.expanduser(args.socket))
+    existing = connect(socket_path)
+    if existing is not None:
+        existing.close()
+        print(json.dumps({"status": "error", "error": f"daemon already listening on {socket_path}"}))
+        return 1
+    if socket_path.exists():
+        socket_path.unlink()  # stale socket from a previous run
+    guard.ensure_parent(socket_path)
+
+    resident = ResidentGuard(state_file, max(0.01, args.flush_interval))
+    server = GuardServer(socket_path, resident)
+    stop = threading.Event()
+    flusher = threading.Thread(target=resident.flush_loop, args=(stop,), daemon=True)
+    flusher.start()
+
+    def _stop(signum, frame) -> None:
+        server.shutdown()
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+    print(json.dumps({"status": "ok", "socket": str(socket_path), "state_file": str(state_file)}), flush=True)
+    try:
+        server.serve_forever()
+    finally:
+        stop.set()
+        server.server_close()
+        try:
+            socket_path.unlink()
+        except OSError:
+            pass
+        resident.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,20 +1,40 @@
 #!/usr/bin/env python3
 """Guarded privileged execution with approval, policy checks, and audit logging.
 Review before enabling. No network calls are made from this script.
+
+--manifest runs a JSON list of argvs as one batch: every command is validated
+and policy-checked before anything runs, one approval covers the whole set,
+and the commands run in order (or up to --parallel at a time) with their own
+exec_start/exec_finish audit records tagged with a shared batch id.
+
+With OPENCLAW_EXEC_TRACE=<file>, wall-clock phase marks up to the moment the
+real command is spawned are written to that file (see bench_sudo_shim.py).
 """
 import argparse
 import json
 import os
 import subprocess
 import sys
+import time
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
+
+# Marked before the sibling imports, which dominate cold start.
+_TRACE_PATH = os.environ.get("OPENCLAW_EXEC_TRACE")
+_TRACE = [("started", time.time_ns())] if _TRACE_PATH else []
 
 # Allow importing sibling modules when executed from arbitrary cwd.
 sys.path.insert(0, str(Path(__file__).resolve().parent))
-from audit_logger import append_audit  # noqa: E402
-from command_policy import evaluate_command  # noqa: E402
+# Imported lazily where used, to keep sudo-shim cold start short: command_policy
+# (decision-cache misses only), guard_daemon (only when its socket exists),
+# uuid and concurrent.futures (--manifest only).
+from audit_logger import append_audit, flush_audit  # noqa: E402
+from decision_cache import DecisionCache, binary_stamp  # noqa: E402
 from prompt_policy import load_policy  # noqa: E402
+from root_session_guard import STATE_PATH, GuardTransaction, session_key  # noqa: E402
+
+# Same path as guard_daemon.DEFAULT_SOCKET_PATH, without importing the daemon module.
+DEFAULT_SOCKET_PATH = STATE_PATH.with_name("root-session-guard.sock")
 
 SAFE_ENV_VARS = {
     "PATH": "/usr/bin:/bin:/usr/sbin:/sbin",
@@ -26,18 +46,37 @@ SAFE_ENV_VARS = {
 # Explicit allowlist: only the vars above are passed to subprocesses.
 # LD_PRELOAD, LD_LIBRARY_PATH, PYTHONPATH, IFS, CDPATH, etc. are excluded.
 
+_DECISIONS = DecisionCache()
 
-def run_guard(args, *guard_args):
-    cmd = [
-        sys.executable,
-        str(Path(__file__).with_name("root_session_guard.py")),
-        "--state-file",
-        args.state_file,
-        "--timeout-minutes",
-        str(args.timeout_minutes),
-        *guard_args,
-    ]
-    return subprocess.run(cmd, capture_output=True, text=True)
+
+def _trace(phase: str) -> None:
+    if _TRACE_PATH:
+        _TRACE.append((phase, time.time_ns()))
+
+
+def _write_trace() -> None:
+    """Best-effort dump of the phase marks, once, right before the real command starts."""
+    global _TRACE_PATH
+    if not _TRACE_PATH:
+        return
+    _trace("exec")
+    t0 = os.environ.get("OPENCLAW_TRACE_T0")
+    try:
+        with open(_TRACE_PATH, "w", encoding="utf-8") as f:
+            json.dump({"t0_ns": int(t0) if t0 and t0.isdigit() else None, "marks": _TRACE}, f)
+    except OSError:
+        pass
+    _TRACE_PATH = None
+
+
+def guard(args):
+    """One session-guard transaction: via guard_daemon.py if it is running, else in-process on the state file."""
+    socket_path = Path(os.path.expanduser(args.guard_socket))
+    if socket_path.exists():
+        from guard_daemon import open_guard
+
+        return open_guard(Path(args.state_file), args.timeout_minutes, socket_path)
+    return GuardTransaction(Path(args.state_file), args.timeout_minutes)
 
 
 def ask_for_approval(reason: str, command_argv: List[str]) -> bool:
@@ -52,6 +91,21 @@ def ask_for_approval(reason: str, command_argv: List[str]) -> bool:
     return approved
 
 
+def ask_for_manifest_approval(reason: str, manifest: List[List[str]], batch: str) -> bool:
+    append_audit({"action": "approval_requested", "reason": reason, "manifest": manifest, "batch": batch})
+    print("Approval required for elevated execution of a command batch.")
+    print(f"Reason: {reason}")
+    print(f"Commands ({len(manifest)}):")
+    for i, argv in enumerate(manifest, 1):
+        print(f"  {i}. {json.dumps(argv)}")
+    answer = input("Approve elevated access for all of these commands? [y/N]: ").strip().lower()
+    approved = answer in {"y", "yes"}
+    append_audit(
+        {"action": "approval_decision", "reason": reason, "manifest": manifest, "batch": batch, "approved": approved}
+    )
+    return approved
+
+
 def _validate_binary(path: str, allow_setuid: bool = False) -> Optional[str]:
     """Validate a binary path. Returns error string if invalid, else None."""
     if not path:
@@ -98,7 +152,39 @@ def _validate_command_argv(argv: List[str]) -> Optional[str]:
     return None
 
 
-def run_command(argv: List[str], use_sudo: bool, sudo_kill_cache: bool) -> int:
+def check_command(argv: List[str]) -> Tuple[Optional[str], Dict[str, object], str]:
+    """_validate_command_argv + evaluate_command, through the LRU decision cache.
+
+    Returns (validation error, policy decision, "hit" or "miss").
+    """
+    stamp = binary_stamp(argv[0]) if argv else None
+    if stamp is not None:
+        version = _DECISIONS.policy_version()
+        if version is None:
+            from command_policy import current_policy_version
+
+            version = _DECISIONS.note_policy_version(current_policy_version)
+        cached = _DECISIONS.get((tuple(argv), version, stamp))
+        if cached is not None:
+            return cached.get("error"), dict(cached.get("decision") or {}), "hit"  # type: ignore[return-value]
+    from command_policy import current_policy_version, evaluate_command
+
+    err = _validate_command_argv(argv)
+    decision = evaluate_command(argv) if err is None else {}
+    # Only cache what was checked: skip if the binary changed underneath us.
+    if stamp is not None and binary_stamp(argv[0]) == stamp:
+        version = str(decision.get("policy_version") or current_policy_version())
+        _DECISIONS.put((tuple(argv), version, stamp), {"error": err, "decision": decision})
+    return err, decision, "miss"
+
+
+def run_command(
+    argv: List[str],
+    use_sudo: bool,
+    sudo_kill_cache: bool,
+    policy_version: Optional[str] = None,
+    tags: Optional[Dict[str, object]] = None,
+) -> int:
     sudo_bin = os.environ.get("OPENCLAW_REAL_SUDO", "/usr/bin/sudo")
     if use_sudo:
         err = _validate_binary(sudo_bin, allow_setuid=True)
@@ -112,9 +198,15 @@ def run_command(argv: List[str], use_sudo: bool, sudo_kill_cache: bool) -> int:
     if use_sudo and sudo_kill_cache:
         # Best-effort: ensure sudo timestamp for this user is not reused implicitly.
         subprocess.run([sudo_bin, "-k"], check=False, capture_output=True, text=True)
-    append_audit({"action": "exec_start", "argv": argv, "use_sudo": use_sudo})
+    tag = tags or {}
+    append_audit(
+        {"action": "exec_start", "argv": argv, "use_sudo": use_sudo, "policy_version": policy_version, **tag}
+    )
+    # The approval trail and exec_start must be on disk before the command can run.
+    flush_audit()
+    _write_trace()
     result = subprocess.run(exec_argv, env=SAFE_ENV_VARS)
-    append_audit({"action": "exec_finish", "argv": argv, "use_sudo": use_sudo, "returncode": result.returncode})
+    append_audit({"action": "exec_finish", "argv": argv, "use_sudo": use_sudo, "returncode": result.returncode, **tag})
     return result.returncode
 
 
@@ -133,6 +225,11 @@ def parse_args() -> argparse.Namespace:
         default=30,
         help="Idle timeout for elevated mode / approval session",
     )
+    parser.add_argument(
+        "--guard-socket",
+        default=str(DEFAULT_SOCKET_PATH),
+        help="guard_daemon.py socket; falls back to the state file when no daemon is listening",
+    )
     parser.add_argument(
         "--reason",
         required=True,
@@ -155,6 +252,22 @@ def parse_args() -> argparse.Namespace:
         default=False,
         help="Keep elevated session after command (still restricted to allowlisted argv; expires on idle timeout)",
     )
+    parser.add_argument(
+        "--manifest",
+        help='JSON file ("-" for stdin) with a list of argvs to run as one approved batch',
+    )
+    parser.add_argument(
+        "--parallel",
+        type=int,
+        default=1,
+        help="With --manifest: run up to N commands at once (default 1: in order)",
+    )
+    parser.add_argument(
+        "--continue-on-error",
+        action="store_true",
+        default=False,
+        help="With --manifest: keep running the remaining commands after one fails (sequential mode)",
+    )
     parser.add_argument(
         "command",
         nargs=argparse.REMAINDER,
@@ -171,8 +284,230 @@ def _get_task_session_id() -> Optional[str]:
     return session_id
 
 
+def _check_policy_files() -> Optional[int]:
+    if os.environ.get("OPENCLAW_REQUIRE_POLICY_FILES") != "1":
+        return None
+    required = [
+        Path.home() / ".openclaw" / "security" / "command-policy.json",
+        Path.home() / ".openclaw" / "security" / "approved_ports.json",
+        Path.home() / ".openclaw" / "security" / "egress_allowlist.json",
+    ]
+    missing = [str(p) for p in required if not p.exists()]
+    if missing:
+        append_audit({"action": "policy_files_missing", "missing": missing})
+        print("Missing required policy files. Refusing privileged execution.", file=sys.stderr)
+        return 7
+    return None
+
+
+def _check_untrusted_source(event: Dict[str, object]) -> Optional[int]:
+    prompt_policy = load_policy()
+    if prompt_policy.get("require_confirmation_for_untrusted") and os.environ.get("OPENCLAW_UNTRUSTED_SOURCE") == "1":
+        confirm = input("Untrusted content source detected. Proceed? [y/N]: ").strip().lower()
+        if confirm not in {"y", "yes"}:
+            append_audit({"action": "untrusted_source_block", **event})
+            return 5
+        append_audit({"action": "untrusted_source_confirmed", **event})
+    return None
+
+
+def _check_approval_token(event: Dict[str, object]) -> Optional[int]:
+    token_required = os.environ.get("OPENCLAW_APPROVAL_TOKEN")
+    if not token_required:
+        return None
+    env_path = Path.home() / ".openclaw" / "env"
+    if env_path.exists() and (env_path.stat().st_mode & 0o077):
+        print("Warning: ~/.openclaw/env permissions are too open; tighten to 600.")
+    token = input("Enter approval token: ").strip()
+    if token != token_required:
+        append_audit({"action": "approval_token_failed", **event})
+        print("Invalid approval token.", file=sys.stderr)
+        return 4
+    append_audit({"action": "approval_token_ok", **event})
+    return None
+
+
+def load_manifest(source: str) -> List[List[str]]:
+    """Read a manifest: a JSON list of argv arrays (or {"commands": [...]})."""
+    text = sys.stdin.read() if source == "-" else Path(os.path.expanduser(source)).read_text(encoding="utf-8")
+    raw = json.loads(text)
+    if isinstance(raw, dict):
+        raw = raw.get("commands")
+    if not isinstance(raw, list) or not raw:
+        raise ValueError("manifest must be a non-empty JSON list of argv arrays")
+    manifest: List[List[str]] = []
+    for i, argv in enumerate(raw, 1):
+        if not isinstance(argv, list) or not argv or not all(isinstance(x, str) for x in argv):
+            raise ValueError(f"manifest entry {i} must be a non-empty JSON array of strings")
+        manifest.append(argv)
+    return manifest
+
+
+def run_manifest(args: argparse.Namespace) -> int:
+    """Validate, approve once, and run a batch of privileged commands."""
+    import uuid
+    from concurrent.futures import ThreadPoolExecutor
+
+    batch = uuid.uuid4().hex[:12]
+    try:
+        manifest = load_manifest(args.manifest)
+    except (OSError, ValueError) as exc:
+        print(f"Invalid manifest: {exc}", file=sys.stderr)
+        return 2
+    if args.parallel < 1:
+        print("--parallel must be at least 1.", file=sys.stderr)
+        return 2
+
+    code = _check_policy_files()
+    if code is not None:
+        return code
+
+    # Everything is checked before anything is approved or run: one bad entry rejects the batch.
+    policy_versions: List[Optional[str]] = []
+    cache_states: List[str] = []
+    for i, argv in enumerate(manifest, 1):
+        err, policy_result, cache_state = check_command(argv)
+        if err:
+            append_audit(
+                {"action": "command_invalid", "argv": argv, "error": err, "batch": batch, "decision_cache": cache_state}
+            )
+            print(f"Invalid command (manifest entry {i}): {err}", file=sys.stderr)
+            return 8
+        if not policy_result.get("allowed", False):
+            append_audit(
+                {
+                    "action": "policy_block",
+                    "argv": argv,
+                    "reason": policy_result.get("reason"),
+                    "pattern": policy_result.get("pattern"),
+                    "policy_version": policy_result.get("policy_version"),
+                    "batch": batch,
+                    "decision_cache": cache_state,
+                }
+            )
+            print(f"Command blocked by policy (manifest entry {i}).", file=sys.stderr)
+            return 3
+        policy_versions.append(policy_result.get("policy_version"))
+        cache_states.append(cache_state)
+
+    session_id = _get_task_session_id()
+    if session_id == "__MISSING__":
+        append_audit({"action": "session_id_missing", "manifest": manifest, "batch": batch})
+        print("Task session id is required but not provided.", file=sys.stderr)
+        return 6
+
+    try:
+        with guard(args) as g:
+            pending = [argv for argv in manifest if g.authorize(argv, session_id)[1] == 2]
+    except Exception as exc:
+        print(f"Session guard error: {exc}", file=sys.stderr)
+        return 1
+
+    event: Dict[str, object] = {"manifest": manifest, "batch": batch}
+    code = _check_untrusted_source(event)
+    if code is not None:
+        return code
+
+    if pending and not ask_for_manifest_approval(args.reason, manifest, batch):
+        print("User denied elevated access. Running in normal mode is required.")
+        with guard(args) as g:
+            g.normal_used()
+        append_audit({"action": "approval_denied", "reason": args.reason, **event})
+        return 1
+    if pending:
+        code = _check_approval_token(event)
+        if code is not None:
+            return code
+
+    # All approvals and the elevated-used mark are one state transaction.
+    try:
+        with guard(args) as g:
+            for argv in pending:
+                g.approve(args.reason, argv, session_id)
+            if args.use_sudo:
+                g.elevated_used(session_id)
+    except Exception as exc:
+        print(f"Session guard error: {exc}", file=sys.stderr)
+        return 1
+    if pending:
+        append_audit(
+            {"action": "approval_granted", "reason": args.reason, "session_id": session_id, "approved": pending, **event}
+        )
+
+    sudo_bin = os.environ.get("OPENCLAW_REAL_SUDO", "/usr/bin/sudo")
+    returncodes: List[Optional[int]] = [None] * len(manifest)
+    append_audit({"action": "batch_start", "count": len(manifest), "parallel": args.parallel, **event})
+    try:
+        if args.use_sudo and args.sudo_kill_cache:
+            # Once for the batch rather than per command, so sudo prompts at most once.
+            subprocess.run([sudo_bin, "-k"], check=False, capture_output=True, text=True)
+        if args.parallel == 1:
+            for i, argv in enumerate(manifest):
+                returncodes[i] = run_command(
+                    argv,
+                    args.use_sudo,
+                    False,
+                    policy_versions[i],
+                    {"batch": batch, "session_id": session_id, "decision_cache": cache_states[i]},
+                )
+                if returncodes[i] != 0 and not args.continue_on_error:
+                    break
+        else:
+            if args.use_sudo:
+                # Prompt (if at all) before workers start, not from several at once.
+                subprocess.run([sudo_bin, "-v"], check=False)
+            with ThreadPoolExecutor(max_workers=min(args.parallel, len(manifest))) as pool:
+                futures = [
+                    pool.submit(
+                        run_command,
+                        argv,
+                        args.use_sudo,
+                        False,
+                        policy_versions[i],
+                        {"batch": batch, "session_id": session_id, "decision_cache": cache_states[i]},
+                    )
+                    for i, argv in enumerate(manifest)
+                ]
+                for i, future in enumerate(futures):
+                    returncodes[i] = future.result()
+        for i, argv in enumerate(manifest):
+            if returncodes[i] is None:
+                append_audit({"action": "exec_skipped", "argv": argv, "batch": batch, "reason": "earlier-failure"})
+    finally:
+        append_audit(
+            {"action": "batch_finish", "returncodes": returncodes, "decision_cache_stats": _DECISIONS.stats(), **event}
+        )
+        if not args.keep_session:
+            _drop_after_command(args, session_id, event)
+        if args.use_sudo and args.sudo_kill_cache:
+            subprocess.run([sudo_bin, "-k"], check=False, capture_output=True, text=True)
+
+    # Skipped commands only follow a failure, so the first non-zero code is the batch result.
+    return next((rc for rc in returncodes if rc), 0)
+
+
+def _drop_after_command(args: argparse.Namespace, session_id: Optional[str], event: Dict[str, object]) -> None:
+    """Best-effort post-command drop: a guard failure is audited and never replaces the command's result."""
+    try:
+        with guard(args) as g:
+            g.drop("post-command", session_key(session_id))
+    except Exception as exc:
+        print(f"Session guard error: {exc}", file=sys.stderr)
+        append_audit(
+            {"action": "drop_failed", "reason": "post-command", "session_id": session_id, "error": str(exc), **event}
+        )
+        return
+    append_audit({"action": "drop_elevation", "reason": "post-command", "session_id": session_id, **event})
+
+
 def main() -> int:
+    _trace("imported")
     args = parse_args()
+    if args.manifest:
+        if args.command and args.command != ["--"]:
+            print("Use either --manifest or a command, not both.", file=sys.stderr)
+            return 2
+        return run_manifest(args)
     if not args.command:
         print("No command supplied.", file=sys.stderr)
         return 2
@@ -184,26 +519,18 @@ def main() -> int:
         print("No command supplied after -- delimiter.", file=sys.stderr)
         return 2
 
-    if os.environ.get("OPENCLAW_REQUIRE_POLICY_FILES") == "1":
-        required = [
-            Path.home() / ".openclaw" / "security" / "command-policy.json",
-            Path.home() / ".openclaw" / "security" / "approved_ports.json",
-            Path.home() / ".openclaw" / "security" / "egress_allowlist.json",
-        ]
-        missing = [str(p) for p in required if not p.exists()]
-        if missing:
-            append_audit({"action": "policy_files_missing", "missing": missing})
-            print("Missing required policy files. Refusing privileged execution.", file=sys.stderr)
-            return 7
-
-    # Validate command path + ownership
-    err = _validate_command_argv(argv)
+    code = _check_policy_files()
+    if code is not None:
+        return code
+
+    # Validate command path + ownership, then the command policy.
+    err, policy_result, cache_state = check_command(argv)
+    _trace("checked")
     if err:
-        append_audit({"action": "command_invalid", "argv": argv, "error": err})
+        append_audit({"action": "command_invalid", "argv": argv, "error": err, "decision_cache": cache_state})
         print(f"Invalid command: {err}", file=sys.stderr)
         return 8
 
-    policy_result = evaluate_command(argv)
     if not policy_result.get("allowed", False):
         append_audit(
             {
@@ -211,6 +538,8 @@ def main() -> int:
                 "argv": argv,
                 "reason": policy_result.get("reason"),
                 "pattern": policy_result.get("pattern"),
+                "policy_version": policy_result.get("policy_version"),
+                "decision_cache": cache_state,
             }
         )
         print("Command blocked by policy.", file=sys.stderr)
@@ -222,60 +551,58 @@ def main() -> int:
         print("Task session id is required but not provided.", file=sys.stderr)
         return 6
 
-    argv_json = json.dumps(argv)
-    if session_id:
-        authz = run_guard(args, "authorize", "--argv-json", argv_json, "--session-id", session_id)
-    else:
-        authz = run_guard(args, "authorize", "--argv-json", argv_json)
-    if authz.returncode not in (0, 2):
-        sys.stderr.write(authz.stderr or authz.stdout)
-        return authz.returncode
+    try:
+        with guard(args) as g:
+            _, authz_code = g.authorize(argv, session_id)
+    except Exception as exc:
+        print(f"Session guard error: {exc}", file=sys.stderr)
+        return 1
+    _trace("authorized")
 
-    needs_approval = authz.returncode == 2
-    prompt_policy = load_policy()
-    if prompt_policy.get("require_confirmation_for_untrusted") and os.environ.get("OPENCLAW_UNTRUSTED_SOURCE") == "1":
-        confirm = input("Untrusted content source detected. Proceed? [y/N]: ").strip().lower()
-        if confirm not in {"y", "yes"}:
-            append_audit({"action": "untrusted_source_block", "argv": argv})
-            return 5
-        append_audit({"action": "untrusted_source_confirmed", "argv": argv})
+    needs_approval = authz_code == 2
+    code = _check_untrusted_source({"argv": argv})
+    if code is not None:
+        return code
 
     if needs_approval and not ask_for_approval(args.reason, argv):
         print("User denied elevated access. Running in normal mode is required.")
-        run_guard(args, "normal-used")
+        with guard(args) as g:
+            g.normal_used()
         append_audit({"action": "approval_denied", "reason": args.reason, "argv": argv})
         return 1
 
     if needs_approval:
-        token_required = os.environ.get("OPENCLAW_APPROVAL_TOKEN")
-        if token_required:
-            env_path = Path.home() / ".openclaw" / "env"
-            if env_path.exists() and (env_path.stat().st_mode & 0o077):
-                print("Warning: ~/.openclaw/env permissions are too open; tighten to 600.")
-            token = input("Enter approval token: ").strip()
-            if token != token_required:
-                append_audit({"action": "approval_token_failed", "argv": argv})
-                print("Invalid approval token.", file=sys.stderr)
-                return 4
-            append_audit({"action": "approval_token_ok", "argv": argv})
-
-        approve_args = ["approve", "--reason", args.reason, "--argv-json", argv_json]
-        if session_id:
-            approve_args += ["--session-id", session_id]
-        approve = run_guard(args, *approve_args)
-        if approve.returncode != 0:
-            sys.stderr.write(approve.stderr or approve.stdout)
-            return approve.returncode
+        code = _check_approval_token({"argv": argv})
+        if code is not None:
+            return code
+
+    _trace("approval")
+    # Approval and the elevated-used mark are one state transaction.
+    try:
+        with guard(args) as g:
+            if needs_approval:
+                g.approve(args.reason, argv, session_id)
+            if args.use_sudo:
+                g.elevated_used(session_id)
+    except Exception as exc:
+        print(f"Session guard error: {exc}", file=sys.stderr)
+        return 1
+    if needs_approval:
         append_audit({"action": "approval_granted", "reason": args.reason, "argv": argv, "session_id": session_id})
+    _trace("approved")
 
     try:
-        if args.use_sudo:
-            run_guard(args, "elevated-used")
-        return run_command(argv, args.use_sudo, args.sudo_kill_cache)
+        return run_command(
+            argv,
+            args.use_sudo,
+            args.sudo_kill_cache,
+            policy_result.get("policy_version"),
+            {"session_id": session_id, "decision_cache": cache_state},
+        )
     finally:
         if not args.keep_session:
-            run_guard(args, "drop")
-            append_audit({"action": "drop_elevation", "argv": argv, "reason": "post-command"})
+            # Only this task's scope; other sessions keep their approvals.
+            _drop_after_command(args, session_id, {"argv": argv})
         if args.use_sudo and args.sudo_kill_cache:
             sudo_bin = os.environ.get("OPENCLAW_REAL_SUDO", "/usr/bin/sudo")
             subprocess.run([sudo_bin, "-k"], check=False, capture_output=True, text=True)
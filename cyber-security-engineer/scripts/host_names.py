@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""Passive IP -> hostname cache for egress allowlist matching.
+
+The monitors list sockets numerically (lsof -n, procfs, netlink), so
+remote_host is always an IP address. This cache lets host/host_regex rules
+match anyway, without any DNS lookups, by learning names from offline sources:
+
+  /etc/hosts             static, never expires
+  host pins file         JSON object {"ip": "name" | ["name", ...]}, never expires
+  resolver logs          dnsmasq "reply <name> is <ip>" lines or NDJSON records
+                         {"name": ..., "ip": ..., "ttl": ...}; entries expire
+
+Resolver-log entries expire after their TTL (default DEFAULT_TTL seconds).
+Learned entries and per-log read offsets are persisted to a JSON cache file,
+so each run only parses what was appended to the logs since the last one.
+No network calls are made.
+"""
+import ipaddress
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+DEFAULT_CACHE_PATH = Path.home() / ".openclaw" / "security" / "host-name-cache.json"
+DEFAULT_PINS_PATH = Path.home() / ".openclaw" / "security" / "host-pins.json"
+HOSTS_PATH = Path("/etc/hosts")
+DEFAULT_TTL = 3600
+CACHE_VERSION = 1
+
+_DNSMASQ_REPLY = re.compile(r"\breply (\S+) is ([0-9A-Fa-f:.]+)\s*$")
+
+
+def _normalize_ip(value: object) -> Optional[str]:
+    try:
+        addr = ipaddress.ip_address(str(value).strip().split("%", 1)[0])
+    except ValueError:
+        return None
+    if addr.version == 6 and addr.ipv4_mapped is not None:
+        addr = addr.ipv4_mapped
+    return addr.compressed
+
+
+def _normalize_name(value: object) -> str:
+    return str(value).strip().rstrip(".").lower()
+
+
+class HostNameCache:
+    """IP -> {name: expires_at} where expires_at None means the name never expires."""
+
+    def __init__(self, ttl: int = DEFAULT_TTL) -> None:
+        self.ttl = ttl
+        self.entries: Dict[str, Dict[str, Optional[float]]] = {}
+        # path -> {"inode": int, "offset": int}
+        self.log_offsets: Dict[str, Dict[str, int]] = {}
+        self.generation = 0
+        self.dirty = False
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, ip: object, name: object, expires_at: Optional[float] = None) -> None:
+        key = _normalize_ip(ip)
+        host = _normalize_name(name)
+        if key is None or not host or _normalize_ip(host) is not None:
+            return
+        names = self.entries.setdefault(key, {})
+        current = names.get(host, 0.0)
+        if current is None:
+            return
+        if expires_at is None or expires_at > current:
+            if host not in names:
+                # Only a new name can change an allowlist verdict; TTL refreshes cannot.
+                self.generation += 1
+            names[host] = expires_at
+
+    def names_for(self, ip: object, now: Optional[float] = None) -> Tuple[str, ...]:
+        names = self.entries.get(str(ip))
+        if not names:
+            return ()
+        now = time.time() if now is None else now
+        return tuple(name for name, expires in names.items() if expires is None or expires > now)
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Drop expired names; return how many were removed."""
+        now = time.time() if now is None else now
+        removed = 0
+        for ip in list(self.entries):
+            names = self.entries[ip]
+            for name in [n for n, expires in names.items() if expires is not None and expires <= now]:
+                del names[name]
+                removed += 1
+            if not names:
+                del self.entries[ip]
+        if removed:
+            self.generation += 1
+            self.dirty = True
+        return removed
+
+    def load_hosts_file(self, path: Path = HOSTS_PATH) -> None:
+        try:
+            text = path.read_text(encoding="utf-8", errors="replace")
+        except OSError:
+            return
+        for line in text.splitlines():
+            parts = line.split("#", 1)[0].split()
+            for name in parts[1:]:
+                self.add(parts[0], name)
+
+    def load_pins(self, path: Path = DEFAULT_PINS_PATH) -> None:
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if not isinstance(data, dict):
+            return
+        for ip, names in data.items():
+            for name in names if isinstance(names, list) else [names]:
+                self.add(ip, name)
+
+    def _parse_log_line(self, line: str, now: float) -> None:
+        line = line.strip()
+        if not line:
+            return
+        if line.startswith("{"):
+            try:
+                record = json.loads(line)
+            except ValueError:
+                return
+            if not isinstance(record, dict):
+                return
+            name = record.get("name") or record.get("query")
+            ip = record.get("ip") or record.get("answer") or record.get("address")
+            try:
+                ttl = float(record.get("ttl") or self.ttl)
+            except (TypeError, ValueError):
+                ttl = float(self.ttl)
+            if name and ip:
+                self.add(ip, name, now + ttl)
+            return
+        match = _DNSMASQ_REPLY.search(line)
+        if match:
+            self.add(match.group(2), match.group(1), now + self.ttl)
+
+    def ingest_resolver_log(self, path: Path, now: Optional[float] = None) -> None:
+        """Parse lines appended to a resolver log since the last recorded offset."""
+        now = time.time() if now is None else now
+        try:
+            st = path.stat()
+        except OSError:
+            return
+        state = self.log_offsets.get(str(path))
+        offset = 0
+        if state and state.get("inode") == st.st_ino and int(state.get("offset", 0)) <= st.st_size:
+            offset = int(state["offset"])
+        if offset == st.st_size and state is not None:
+            return
+        try:
+            with path.open("rb") as f:
+                f.seek(offset)
+                data = f.read()
+        except OSError:
+            return
+        # Only consume complete lines; a partial trailing line is read next time.
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].decode("utf-8", "replace").splitlines():
+            self._parse_log_line(line, now)
+        self.log_offsets[str(path)] = {"inode": st.st_ino, "offset": offset + end}
+        self.dirty = True
+
+    def to_json(self) -> Dict[str, object]:
+        # Static names are re-read from their sources on every load; only learned ones persist.
+        learned = {
+            ip: {name: expires for name, expires in names.items() if expires is not None}
+            for ip, names in self.entries.items()
+        }
+        return {
+            "version": CACHE_VERSION,
+            "entries": {ip: names for ip, names in learned.items() if names},
+            "log_offsets": self.log_offsets,
+        }
+
+    def load(self, path: Path) -> None:
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return
+        if not isinstance(data, dict) or data.get("version") != CACHE_VERSION:
+            return
+        for ip, names in (data.get("entries") or {}).items():
+            if isinstance(names, dict):
+                for name, expires in names.items():
+                    if isinstance(expires, (int, float)):
+                        self.add(ip, name, float(expires))
+        offsets = data.get("log_offsets")
+        if isinstance(offsets, dict):
+            self.log_offsets = {
+                str(p): {"inode": int(v.get("inode", 0)), "offset": int(v.get("offset", 0))}
+                for p, v in offsets.items()
+                if isinstance(v, dict)
+            }
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(self.to_json(), separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, path)
+        self.dirty = False
+
+
+def load_host_names(
+    cache_path: Optional[Path] = DEFAULT_CACHE_PATH,
+    pins_path: Path = DEFAULT_PINS_PATH,
+    resolver_logs: Iterable[Path] = (),
+    hosts_path: Path = HOSTS_PATH,
+    ttl: int = DEFAULT_TTL,
+) -> HostNameCache:
+    """Build the cache from its persisted form plus every offline source (best-effort)."""
+    cache = HostNameCache(ttl)
+    if cache_path is not None:
+        cache.load(cache_path)
+    cache.load_hosts_file(hosts_path)
+    cache.load_pins(pins_path)
+    refresh(cache, resolver_logs, cache_path)
+    return cache
+
+
+def refresh(cache: HostNameCache, resolver_logs: Iterable[Path], cache_path: Optional[Path]) -> None:
+    """Tail resolver logs, evict expired names and persist the cache if anything changed."""
+    now = time.time()
+    for log in resolver_logs:
+        cache.ingest_resolver_log(log, now)
+    cache.prune(now)
+    if cache.dirty and cache_path is not None:
+        try:
+            cache.save(cache_path)
+        except OSError:
+            pass
@@ -122,16 +122,24 @@ fi
 
 REASON="\${OPENCLAW_PRIV_REASON:-OpenClaw requested privileged execution}"
 # Sanitize reason: strip shell metacharacters to prevent injection
-REASON="\$(printf '%s' "\${REASON}" | tr -d '\`\$\\!;|&<>(){}' | head -c 200)"
+# (parameter expansion, not a tr|head pipeline: no extra processes per sudo call)
+REASON="\${REASON//[\\\`\\\$\\\\!;|&\\<\\>\\(\\)\\{\\}]/}"
+REASON="\${REASON:0:200}"
 export OPENCLAW_REAL_SUDO="\${REAL_SUDO_OVERRIDE}"
 export OPENCLAW_PYTHON3="\${PYTHON3_OVERRIDE}"
-exec "\${PYTHON3_OVERRIDE}" "\${SKILL_DIR}/scripts/guarded_privileged_exec.py" \
+# -I -S: no user site/PYTHON* env and no site-packages scan; the entry stub imports
+# guarded_privileged_exec as a module so its bytecode is reused from __pycache__.
+exec "\${PYTHON3_OVERRIDE}" -I -S "\${SKILL_DIR}/scripts/sudo_shim_entry.py" \
   --reason "\${REASON}" \
   --use-sudo \
   -- "\$@"
 EOF
 chmod 700 "${WRAPPER}"
 
+# Precompile the guard scripts so the first sudo call does not pay for it (best-effort).
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+"${PYTHON3}" -m compileall -q "${SCRIPT_DIR}" >/dev/null 2>&1 || true
+
 log "Installed sudo shim: ${WRAPPER}"
 
 if [[ "$(uname -s)" == "Darwin" ]]; then
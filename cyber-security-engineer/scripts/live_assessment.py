@@ -7,14 +7,25 @@ import argparse
 import json
 import os
 import shutil
+import sqlite3
 import subprocess
+import sys
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 
 AUDIT_LOG = Path.home() / ".openclaw" / "security" / "privileged-audit.jsonl"
 OPENCLAW_DIR = Path.home() / ".openclaw"
+SCRIPTS_DIR = Path(__file__).resolve().parent
+DEFAULT_PORT_MONITOR = SCRIPTS_DIR / "port_monitor.py"
+
+# Allow importing sibling modules when executed from arbitrary cwd.
+sys.path.insert(0, str(SCRIPTS_DIR))
+from audit_chain import verify as verify_audit_chain  # noqa: E402
+from audit_segments import load_manifest  # noqa: E402
+from audit_store import ingest as ingest_audit_store, report as audit_store_report  # noqa: E402
+from socket_snapshot import build_reports, collect_snapshot  # noqa: E402
 
 
 def run_cmd(cmd: List[str]) -> str:
@@ -156,7 +167,42 @@ def alt_privilege_paths_present() -> bool:
 
 
 def audit_log_present() -> bool:
-    return AUDIT_LOG.exists() and AUDIT_LOG.stat().st_size > 0
+    # A freshly rotated active log may be empty; closed segments still count.
+    return (AUDIT_LOG.exists() and AUDIT_LOG.stat().st_size > 0) or bool(load_manifest(AUDIT_LOG))
+
+
+def audit_activity(days: int = 30) -> Optional[Dict[str, Any]]:
+    """Bring the audit analytics store up to date and summarize the last *days* of privileged activity."""
+    if not audit_log_present():
+        return None
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    try:
+        ingest_audit_store(AUDIT_LOG)
+        rows = audit_store_report(
+            since=since, names=["overview", "approvals", "policy_blocks", "top_commands"], limit=3
+        )
+    except (sqlite3.Error, OSError) as exc:
+        return {"error": str(exc)}
+    return {
+        "days": days,
+        "overview": rows["overview"][0],
+        "approvals": rows["approvals"][0],
+        "policy_blocks": rows["policy_blocks"][0],
+        "top_commands": rows["top_commands"],
+    }
+
+
+def _activity_summary(activity: Dict[str, Any]) -> str:
+    overview, approvals, blocks = activity["overview"], activity["approvals"], activity["policy_blocks"]
+    text = (
+        f"last {activity['days']}d: {overview['runs'] or 0} privileged runs in {overview['sessions'] or 0} sessions,"
+        f" approvals {approvals['granted'] or 0} granted / {approvals['denied'] or 0} denied,"
+        f" {blocks['blocked'] or 0} policy blocks"
+    )
+    if blocks["block_rate"] is not None:
+        text += f" ({blocks['block_rate'] * 100:.1f}% of attempts)"
+    top = ", ".join(f"{r['argv0']} ({r['runs']})" for r in activity["top_commands"])
+    return text + f", top commands: {top or 'none'}"
 
 
 def backup_configured() -> bool:
@@ -166,17 +212,12 @@ def backup_configured() -> bool:
     return False
 
 
-def collect_runtime_signals(port_monitor_script: Path) -> Dict[str, object]:
-    openclaw_bin = resolve_openclaw_bin()
-    openclaw_config_text = run_cmd(["cat", str(Path.home() / ".openclaw" / "openclaw.json")])
-    doctor_text = run_cmd([openclaw_bin, "doctor"])
-    gateway_status_text = run_cmd([openclaw_bin, "gateway", "status"])
-    version_text = run_cmd([openclaw_bin, "--version"])
-
-    port_report_raw = run_cmd(["python3", str(port_monitor_script), "--json"])
-    egress_report_raw = run_cmd(
-        ["python3", str(Path(__file__).resolve().parent / "egress_monitor.py"), "--json"]
-    )
+def collect_network_reports_subprocess(
+    port_monitor_script: Path, all_netns: bool = False
+) -> Tuple[Dict[str, object], Dict[str, object]]:
+    extra = ["--all-netns"] if all_netns else []
+    port_report_raw = run_cmd(["python3", str(port_monitor_script), "--json", *extra])
+    egress_report_raw = run_cmd(["python3", str(SCRIPTS_DIR / "egress_monitor.py"), "--json", *extra])
 
     try:
         port_report = json.loads(port_report_raw)
@@ -187,6 +228,42 @@ def collect_runtime_signals(port_monitor_script: Path) -> Dict[str, object]:
         egress_report = json.loads(egress_report_raw)
     except Exception:
         egress_report = {"status": "error", "findings": [], "connections": []}
+    return port_report, egress_report
+
+
+def collect_network_reports(all_netns: bool = False) -> Tuple[Dict[str, object], Dict[str, object]]:
+    """Enumerate sockets once and evaluate both the port and egress reports against it."""
+    try:
+        snapshot = collect_snapshot(all_netns)
+    except Exception as exc:
+        return (
+            {"status": "error", "error": str(exc), "findings": [], "listening_services": []},
+            {"status": "error", "error": str(exc), "findings": [], "connections": []},
+        )
+    return build_reports(snapshot)
+
+
+def collect_runtime_signals(
+    port_monitor_script: Path,
+    port_report_out: Optional[Path] = None,
+    egress_report_out: Optional[Path] = None,
+    all_netns: bool = False,
+) -> Dict[str, object]:
+    openclaw_bin = resolve_openclaw_bin()
+    openclaw_config_text = run_cmd(["cat", str(Path.home() / ".openclaw" / "openclaw.json")])
+    doctor_text = run_cmd([openclaw_bin, "doctor"])
+    gateway_status_text = run_cmd([openclaw_bin, "gateway", "status"])
+    version_text = run_cmd([openclaw_bin, "--version"])
+
+    if port_monitor_script.resolve() == DEFAULT_PORT_MONITOR:
+        port_report, egress_report = collect_network_reports(all_netns)
+    else:
+        # A custom port monitor script is honoured by running both monitors separately.
+        port_report, egress_report = collect_network_reports_subprocess(port_monitor_script, all_netns)
+    if port_report_out is not None:
+        write_json(port_report_out, port_report)
+    if egress_report_out is not None:
+        write_json(egress_report_out, egress_report)
 
     return {
         "openclaw_config_text": openclaw_config_text,
@@ -196,6 +273,8 @@ def collect_runtime_signals(port_monitor_script: Path) -> Dict[str, object]:
         "version_text": version_text,
         "port_report": port_report,
         "egress_report": egress_report,
+        "audit_chain": check_audit_chain() if audit_log_present() else None,
+        "audit_activity": audit_activity(),
         "env_flags": load_env_flags(),
         "command_policy": load_json_file(Path.home() / ".openclaw" / "security" / "command-policy.json"),
         "prompt_policy": load_json_file(Path.home() / ".openclaw" / "security" / "prompt-policy.json"),
@@ -203,6 +282,18 @@ def collect_runtime_signals(port_monitor_script: Path) -> Dict[str, object]:
     }
 
 
+def check_audit_chain() -> Dict[str, object]:
+    """Incremental chain verification; an unreadable log or state file is reported as a failure."""
+    try:
+        return verify_audit_chain(AUDIT_LOG)
+    except (OSError, ValueError) as exc:
+        return {
+            "status": "fail",
+            "error": {"file": str(AUDIT_LOG), "seq": None, "problem": f"verification error: {exc}"},
+            "unverifiable": True,
+        }
+
+
 def set_check(
     checks_by_id: Dict[str, Dict[str, object]],
     check_id: str,
@@ -283,18 +374,48 @@ def build_assessment(assessment: Dict[str, object], signals: Dict[str, object])
     )
 
     audit_ok = audit_log_present()
-    set_check(
-        checks_by_id,
-        "audit_logging_privileged_actions",
-        "compliant" if audit_ok else "partial",
-        "medium",
-        "Privileged audit log is populated." if audit_ok else "Privileged audit log not yet populated.",
-        f"Audit log path: {AUDIT_LOG}",
-        "Audit trail is missing or empty.",
-        "Run privileged tasks via guarded_privileged_exec.py to populate audit logs.",
-        "SecOps",
-        due_in(21),
-    )
+    chain = signals.get("audit_chain")
+    if isinstance(chain, dict) and chain.get("status") == "fail":
+        error = chain.get("error") or {}
+        unverifiable = bool(chain.get("unverifiable"))
+        set_check(
+            checks_by_id,
+            "audit_logging_privileged_actions",
+            "violation",
+            "high",
+            "Privileged audit log could not be verified."
+            if unverifiable
+            else "Privileged audit log failed hash-chain verification.",
+            f"Audit log path: {AUDIT_LOG}; {error.get('file')} seq {error.get('seq')}: {error.get('problem')}",
+            "The audit trail's integrity cannot be established."
+            if unverifiable
+            else "Audit records were modified, removed or reordered after they were written.",
+            "Investigate the named record, preserve the log and segments, then run audit_chain.py verify --full.",
+            "SecOps",
+            due_in(1),
+        )
+    else:
+        evidence = f"Audit log path: {AUDIT_LOG}"
+        activity = signals.get("audit_activity")
+        if isinstance(activity, dict) and "error" not in activity:
+            evidence += f"; {_activity_summary(activity)}"
+        if isinstance(chain, dict):
+            evidence += (
+                f"; chain verified to seq {chain.get('to_seq')} (head {chain.get('head_digest')}),"
+                f" anchor seq {chain.get('anchor_seq')}"
+            )
+        set_check(
+            checks_by_id,
+            "audit_logging_privileged_actions",
+            "compliant" if audit_ok else "partial",
+            "medium",
+            "Privileged audit log is populated." if audit_ok else "Privileged audit log not yet populated.",
+            evidence,
+            "Audit trail is missing or empty.",
+            "Run privileged tasks via guarded_privileged_exec.py to populate audit logs.",
+            "SecOps",
+            due_in(21),
+        )
 
     set_check(
         checks_by_id,
@@ -538,9 +659,16 @@ def parse_args() -> argparse.Namespace:
     p.add_argument("--assessment-file", required=True, help="Path to assessment JSON to update")
     p.add_argument(
         "--port-monitor-script",
-        default=str(Path(__file__).resolve().parent / "port_monitor.py"),
+        default=str(DEFAULT_PORT_MONITOR),
         help="Path to port monitor script",
     )
+    p.add_argument("--port-report-out", help="Also write the port monitor report JSON here")
+    p.add_argument("--egress-report-out", help="Also write the egress monitor report JSON here")
+    p.add_argument(
+        "--all-netns",
+        action="store_true",
+        help="Include sockets from every network namespace (containers) in the port/egress checks",
+    )
     return p.parse_args()
 
 
@@ -548,7 +676,12 @@ def main() -> int:
     args = parse_args()
     assessment_path = Path(args.assessment_file)
     assessment = load_json(assessment_path)
-    signals = collect_runtime_signals(Path(args.port_monitor_script))
+    signals = collect_runtime_signals(
+        Path(args.port_monitor_script),
+        Path(args.port_report_out) if args.port_report_out else None,
+        Path(args.egress_report_out) if args.egress_report_out else None,
+        args.all_netns,
+    )
     updated = build_assessment(assessment, signals)
     write_json(assessment_path, updated)
     print(
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Streaming reader for machine-readable `lsof -F` output.
+
+Field mode prints one field per line, prefixed by a single identifier
+character, so command names containing spaces parse correctly and the
+output can be consumed line by line without buffering it all in memory.
+No network calls are made.
+"""
+import subprocess
+import tempfile
+from typing import Dict, Iterable, Iterator, List, Optional
+
+# p=pid c=command u=uid L=login f=fd n=name T=TCP info (ST=state, QR/QS=queues)
+LSOF_FIELDS = "pcuLfnT"
+
+
+def parse_lsof_fields(lines: Iterable[str]) -> Iterator[Dict[str, object]]:
+    """Yield one record per open file: pid, command, uid, user, fd, name, state."""
+    process: Dict[str, object] = {}
+    current: Optional[Dict[str, object]] = None
+    for line in lines:
+        line = line.rstrip("\n")
+        if not line:
+            continue
+        tag, value = line[0], line[1:]
+        if tag == "p":
+            if current is not None and "name" in current:
+                yield current
+            current = None
+            process = {"pid": int(value) if value.isdigit() else value, "command": "unknown", "uid": None, "user": None}
+        elif tag == "c":
+            process["command"] = value
+        elif tag == "u":
+            process["uid"] = int(value) if value.isdigit() else value
+        elif tag == "L":
+            process["user"] = value
+        elif tag == "f":
+            if current is not None and "name" in current:
+                yield current
+            current = {**process, "fd": value}
+        elif tag == "n":
+            # Without an fd field, a second name starts the next file of the same process.
+            if current is None or "name" in current:
+                if current is not None:
+                    yield current
+                current = {**process}
+            current["name"] = value
+        elif tag == "T" and value.startswith("ST="):
+            if current is not None:
+                current["state"] = value[3:]
+    if current is not None and "name" in current:
+        yield current
+
+
+def stream_lsof(selectors: List[str]) -> Iterator[Dict[str, object]]:
+    """Run `lsof -nP +c 0 -F ... <selectors>` and yield records as lsof prints them."""
+    cmd = ["lsof", "-nP", "+c", "0", "-F", LSOF_FIELDS, *selectors]
+    # stderr goes to a temp file so a chatty lsof can never block on a full pipe.
+    with tempfile.TemporaryFile(mode="w+", encoding="utf-8") as err:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=err, text=True)
+        produced = False
+        try:
+            assert proc.stdout is not None
+            for record in parse_lsof_fields(proc.stdout):
+                produced = True
+                yield record
+        finally:
+            if proc.stdout is not None:
+                proc.stdout.close()
+            returncode = proc.wait()
+        # lsof exits 1 with no diagnostics when nothing matched the selectors.
+        if returncode != 0 and not produced:
+            err.seek(0)
+            message = err.read().strip()
+            if message or returncode != 1:
+                raise RuntimeError(message or "Failed to run lsof")
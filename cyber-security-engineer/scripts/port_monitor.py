@@ -6,8 +6,13 @@ import shutil
 import subprocess
 import sys
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 
+# Allow importing sibling modules when executed from arbitrary cwd.
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import lsof_stream  # noqa: E402
+import socket_table  # noqa: E402
+from process_info import PROCESS_CACHE  # noqa: E402
 
 INSECURE_PORT_RECOMMENDATIONS = {
     20: "Use SFTP (22) or FTPS (990) instead of FTP data.",
@@ -38,15 +43,16 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Print JSON output only",
     )
+    parser.add_argument(
+        "--all-netns",
+        action="store_true",
+        help="Scan every network namespace (containers) and tag listeners with netns (Linux)",
+    )
     return parser.parse_args()
 
 
-def run_lsof() -> str:
-    cmd = ["lsof", "-nP", "-iTCP", "-sTCP:LISTEN"]
-    proc = subprocess.run(cmd, capture_output=True, text=True)
-    if proc.returncode != 0:
-        raise RuntimeError(proc.stderr.strip() or "Failed to run lsof")
-    return proc.stdout
+def run_lsof() -> Iterator[Dict[str, object]]:
+    return lsof_stream.stream_lsof(["-iTCP", "-sTCP:LISTEN"])
 
 
 def run_ss() -> str:
@@ -79,27 +85,20 @@ def parse_name(name: str) -> Tuple[Optional[str], Optional[int]]:
     return host, port
 
 
-def parse_lsof_output(text: str) -> List[Dict[str, object]]:
-    lines = [line for line in text.splitlines() if line.strip()]
-    if len(lines) <= 1:
-        return []
+def parse_lsof_output(records: Iterable[Dict[str, object]]) -> List[Dict[str, object]]:
+    """Build listener entries from streamed `lsof -F` records (see lsof_stream)."""
     entries: List[Dict[str, object]] = []
     seen = set()
-    for line in lines[1:]:
-        parts = line.split()
-        if len(parts) < 9:
+    for record in records:
+        if record.get("state") not in (None, "LISTEN"):
             continue
-        command = parts[0]
-        pid = parts[1]
-        user = parts[2]
-        name = parts[-2] if parts[-1] == "(LISTEN)" else parts[-1]
-        host, port = parse_name(name)
+        host, port = parse_name(str(record.get("name") or ""))
         if port is None:
             continue
         entry = {
-            "command": command,
-            "pid": int(pid) if pid.isdigit() else pid,
-            "user": user,
+            "command": record.get("command"),
+            "pid": record.get("pid"),
+            "user": record.get("user") or record.get("uid"),
             "host": host,
             "port": port,
             "protocol": "tcp",
@@ -178,7 +177,51 @@ def parse_netstat_windows_output(text: str) -> List[Dict[str, object]]:
     return entries
 
 
-def collect_entries() -> Tuple[List[Dict[str, object]], str]:
+def entries_from_rows(rows: Iterable[Dict[str, object]]) -> List[Dict[str, object]]:
+    """Convert owner-attached socket_table rows into listener entries."""
+    entries: List[Dict[str, object]] = []
+    seen = set()
+    for row in rows:
+        entry = {
+            "command": row["command"],
+            "pid": row["pid"],
+            "user": row["user"],
+            "host": row["local_host"],
+            "port": row["local_port"],
+            "protocol": "tcp",
+        }
+        if "netns" in row:
+            entry["netns"] = row["netns"]
+            entry["container_id"] = row.get("container_id")
+        dedupe_key = (
+            entry["command"], entry["pid"], entry["host"], entry["port"], entry["protocol"], entry.get("netns"),
+        )
+        if dedupe_key in seen:
+            continue
+        seen.add(dedupe_key)
+        entries.append(entry)
+    return entries
+
+
+def collect_procfs_entries() -> List[Dict[str, object]]:
+    return entries_from_rows(socket_table.attach_owners(socket_table.read_tcp_sockets({"LISTEN"})))
+
+
+def collect_netns_entries() -> List[Dict[str, object]]:
+    return entries_from_rows(socket_table.attach_owners(socket_table.read_tcp_sockets_all_netns({"LISTEN"})))
+
+
+def collect_entries(all_netns: bool = False) -> Tuple[List[Dict[str, object]], str]:
+    if all_netns:
+        if not socket_table.procfs_available():
+            raise RuntimeError("--all-netns requires Linux /proc")
+        return collect_netns_entries(), "procfs-netns"
+    # Reading /proc/net directly avoids lsof walking every fd of every process.
+    if socket_table.procfs_available():
+        try:
+            return collect_procfs_entries(), "procfs"
+        except OSError:
+            pass
     if shutil.which("lsof"):
         return parse_lsof_output(run_lsof()), "lsof"
     if sys.platform.startswith("linux") and shutil.which("ss"):
@@ -188,9 +231,58 @@ def collect_entries() -> Tuple[List[Dict[str, object]], str]:
     raise RuntimeError("No supported port listing tool found (lsof/ss/netstat)")
 
 
-def load_approved_ports(path: Path) -> List[Dict[str, object]]:
+PUBLIC_BIND_HOSTS = frozenset(("*", "0.0.0.0", "::"))
+
+
+class ApprovedPorts:
+    """Approved-port rules plus a (port, protocol, netns) -> allowed-commands index.
+
+    A value of None in the index means some rule for that key has no command
+    restriction, so any process is approved. Rules without "netns" are stored
+    under netns None and apply in every network namespace; rules with it only
+    approve listeners tagged with that namespace ("host" for the host itself).
+    """
+
+    def __init__(self, rules: List[Dict[str, object]]) -> None:
+        self.rules = rules
+        self.index: Dict[Tuple[int, str, Optional[str]], Optional[Set[str]]] = {}
+        self.scoped = False
+        for rule in rules:
+            netns = str(rule["netns"]) if rule.get("netns") else None
+            try:
+                key = (int(rule.get("port")), str(rule.get("protocol", "tcp")).lower(), netns)
+            except (TypeError, ValueError):
+                continue
+            self.scoped = self.scoped or netns is not None
+            rule_cmd = rule.get("command")
+            if not rule_cmd:
+                self.index[key] = None
+                continue
+            if key in self.index and self.index[key] is None:
+                continue
+            self.index.setdefault(key, set()).add(str(rule_cmd).lower())
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def __iter__(self) -> Iterator[Dict[str, object]]:
+        return iter(self.rules)
+
+    def _approves_key(self, key: Tuple[int, str, Optional[str]], command: str) -> bool:
+        if key not in self.index:
+            return False
+        commands = self.index[key]
+        return commands is None or command in commands
+
+    def approves(self, port: int, protocol: str, command: str, netns: str = socket_table.HOST_NETNS) -> bool:
+        if self._approves_key((port, protocol, None), command):
+            return True
+        return self.scoped and self._approves_key((port, protocol, netns), command)
+
+
+def load_approved_ports(path: Path) -> ApprovedPorts:
     if not path.exists():
-        return []
+        return ApprovedPorts([])
     with path.open("r", encoding="utf-8") as f:
         data = json.load(f)
     if not isinstance(data, list):
@@ -202,63 +294,78 @@ def load_approved_ports(path: Path) -> List[Dict[str, object]]:
         if "port" not in item:
             continue
         normalized.append(item)
-    return normalized
+    return ApprovedPorts(normalized)
 
 
-def is_approved(entry: Dict[str, object], approved: List[Dict[str, object]]) -> bool:
-    for rule in approved:
-        if int(rule.get("port")) != int(entry["port"]):
-            continue
-        rule_proto = str(rule.get("protocol", "tcp")).lower()
-        if rule_proto != str(entry["protocol"]).lower():
-            continue
-        rule_cmd = rule.get("command")
-        if rule_cmd and str(rule_cmd).lower() != str(entry["command"]).lower():
-            continue
-        return True
-    return False
+def is_approved(entry: Dict[str, object], approved: Union[ApprovedPorts, List[Dict[str, object]]]) -> bool:
+    if not isinstance(approved, ApprovedPorts):
+        approved = ApprovedPorts(list(approved))
+    return approved.approves(
+        int(entry["port"]),
+        str(entry["protocol"]).lower(),
+        str(entry["command"]).lower(),
+        str(entry.get("netns") or socket_table.HOST_NETNS),
+    )
 
 
-def build_findings(entries: List[Dict[str, object]], approved: List[Dict[str, object]]) -> List[Dict[str, object]]:
+def build_findings(
+    entries: List[Dict[str, object]], approved: Union[ApprovedPorts, List[Dict[str, object]]]
+) -> List[Dict[str, object]]:
+    if not isinstance(approved, ApprovedPorts):
+        approved = ApprovedPorts(list(approved))
+    approves = approved.approves
+    insecure = INSECURE_PORT_RECOMMENDATIONS
     findings: List[Dict[str, object]] = []
+
+    def append(finding: Dict[str, object], netns: Optional[str]) -> None:
+        if netns is not None:
+            finding["netns"] = netns
+        findings.append(finding)
+
     for entry in entries:
         port = int(entry["port"])
-        host = str(entry.get("host") or "")
+        command = entry["command"]
+        netns = entry.get("netns")
+        scope = str(netns or socket_table.HOST_NETNS)
 
-        if not is_approved(entry, approved):
-            findings.append(
+        if not approves(port, str(entry["protocol"]).lower(), str(command).lower(), scope):
+            append(
                 {
                     "severity": "medium",
                     "type": "unapproved-port",
                     "port": port,
-                    "command": entry["command"],
+                    "command": command,
                     "message": "Listening port is not in approved baseline.",
                     "recommendation": "Approve it with business justification or close the service.",
-                }
+                },
+                netns,
             )
 
-        if port in INSECURE_PORT_RECOMMENDATIONS:
-            findings.append(
+        recommendation = insecure.get(port)
+        if recommendation is not None:
+            append(
                 {
                     "severity": "high",
                     "type": "insecure-port",
                     "port": port,
-                    "command": entry["command"],
+                    "command": command,
                     "message": "Insecure protocol/port detected.",
-                    "recommendation": INSECURE_PORT_RECOMMENDATIONS[port],
-                }
+                    "recommendation": recommendation,
+                },
+                netns,
             )
 
-        if host in ("*", "0.0.0.0", "::"):
-            findings.append(
+        if str(entry.get("host") or "") in PUBLIC_BIND_HOSTS:
+            append(
                 {
                     "severity": "medium",
                     "type": "public-bind",
                     "port": port,
-                    "command": entry["command"],
+                    "command": command,
                     "message": "Service listens on all interfaces.",
                     "recommendation": "Bind to localhost or a restricted interface unless external exposure is required.",
-                }
+                },
+                netns,
             )
     return findings
 
@@ -270,32 +377,36 @@ def output_text(report: Dict[str, object]) -> None:
     if report["findings"]:
         print("")
         for finding in report["findings"]:
+            scope = f" [netns {finding['netns']}]" if finding.get("netns") else ""
             print(
                 f"- [{finding['severity'].upper()}] {finding['type']} "
-                f"port {finding['port']} ({finding['command']}): {finding['recommendation']}"
+                f"port {finding['port']} ({finding['command']}){scope}: {finding['recommendation']}"
             )
 
 
+def build_report(entries: List[Dict[str, object]], tool_used: str, approved_path: Path) -> Dict[str, object]:
+    approved = load_approved_ports(approved_path)
+    PROCESS_CACHE.enrich(entries)
+    return {
+        "status": "ok",
+        "approved_file": str(approved_path),
+        "approved_rules_count": len(approved),
+        "tool": tool_used,
+        "listening_services": entries,
+        "findings": build_findings(entries, approved),
+    }
+
+
 def main() -> int:
     args = parse_args()
     approved_path = Path(args.approved_file).expanduser()
     try:
-        entries, tool_used = collect_entries()
-        approved = load_approved_ports(approved_path)
-        findings = build_findings(entries, approved)
+        entries, tool_used = collect_entries(args.all_netns)
+        report = build_report(entries, tool_used, approved_path)
     except Exception as exc:
         print(json.dumps({"status": "error", "error": str(exc)}))
         return 1
 
-    report = {
-        "status": "ok",
-        "approved_file": str(approved_path),
-        "approved_rules_count": len(approved),
-        "tool": tool_used,
-        "listening_services": entries,
-        "findings": findings,
-    }
-
     if args.json:
         print(json.dumps(report, indent=2))
     else:
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""Memoized process attribution from /proc/<pid> (comm, exe, uid/user, start time).
+
+Entries are keyed on (pid, starttime), so a recycled PID is never confused
+with the process that used it before. A cache hit costs one read of
+/proc/<pid>/stat, which keeps lookups cheap enough for per-sample use in
+long-running watchers. Linux only; elsewhere lookups return None.
+No network calls are made.
+"""
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+try:
+    import pwd
+except ImportError:  # Windows
+    pwd = None  # type: ignore[assignment]
+
+
+PROC_ROOT = Path("/proc")
+DEFAULT_MAX_ENTRIES = 8192
+
+
+@dataclass(frozen=True)
+class ProcessInfo:
+    pid: int
+    comm: str
+    exe: Optional[str]
+    uid: Optional[int]
+    user: Optional[str]
+    start_time_utc: Optional[str]
+
+
+_USER_NAMES: Dict[int, Optional[str]] = {}
+
+
+def username_for_uid(uid: int) -> Optional[str]:
+    if uid not in _USER_NAMES:
+        try:
+            _USER_NAMES[uid] = pwd.getpwuid(uid).pw_name if pwd else str(uid)
+        except KeyError:
+            _USER_NAMES[uid] = str(uid)
+    return _USER_NAMES[uid]
+
+
+def _clock_ticks() -> int:
+    try:
+        return int(os.sysconf("SC_CLK_TCK"))
+    except (AttributeError, ValueError, OSError):
+        return 100
+
+
+def _boot_time(proc_root: Path) -> Optional[float]:
+    try:
+        with open(f"{proc_root}/stat", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("btime "):
+                    return float(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def _read_stat(proc_root: Path, pid: int) -> Optional[Tuple[str, int]]:
+    """Return (comm, starttime ticks) from /proc/<pid>/stat."""
+    try:
+        with open(f"{proc_root}/{pid}/stat", "rb") as f:
+            raw = f.read()
+    except OSError:
+        return None
+    # comm may itself contain spaces or parentheses; it ends at the last ')'.
+    open_paren = raw.find(b"(")
+    close_paren = raw.rfind(b")")
+    if open_paren < 0 or close_paren < 0:
+        return None
+    fields = raw[close_paren + 2 :].split()
+    try:
+        starttime = int(fields[19])  # field 22 overall; fields here start at field 3
+    except (IndexError, ValueError):
+        return None
+    return raw[open_paren + 1 : close_paren].decode("utf-8", "replace"), starttime
+
+
+class ProcessCache:
+    def __init__(self, proc_root: Path = PROC_ROOT, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.proc_root = proc_root
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[int, int], ProcessInfo]" = OrderedDict()
+        self._ticks = _clock_ticks()
+        self._boot: Optional[float] = None
+        self._boot_loaded = False
+
+    def _start_time_utc(self, starttime: int) -> Optional[str]:
+        if not self._boot_loaded:
+            self._boot = _boot_time(self.proc_root)
+            self._boot_loaded = True
+        if self._boot is None:
+            return None
+        ts = datetime.fromtimestamp(self._boot + starttime / self._ticks, timezone.utc)
+        return ts.isoformat().replace("+00:00", "Z")
+
+    def get(self, pid: object) -> Optional[ProcessInfo]:
+        if not isinstance(pid, int) or pid <= 0:
+            return None
+        stat = _read_stat(self.proc_root, pid)
+        if stat is None:
+            return None
+        comm, starttime = stat
+        key = (pid, starttime)
+        info = self._entries.get(key)
+        if info is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return info
+        self.misses += 1
+        try:
+            exe: Optional[str] = os.readlink(f"{self.proc_root}/{pid}/exe")
+        except OSError:
+            exe = None
+        try:
+            uid: Optional[int] = os.stat(f"{self.proc_root}/{pid}").st_uid
+        except OSError:
+            uid = None
+        info = ProcessInfo(
+            pid=pid,
+            comm=comm,
+            exe=exe,
+            uid=uid,
+            user=username_for_uid(uid) if uid is not None else None,
+            start_time_utc=self._start_time_utc(starttime),
+        )
+        self._entries[key] = info
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return info
+
+    def enrich(self, records: Iterable[Dict[str, object]]) -> None:
+        """Add exe/uid/start time to monitor records in place and fill missing user/command."""
+        for record in records:
+            info = self.get(record.get("pid"))
+            if info is None:
+                continue
+            record["exe"] = info.exe
+            record["uid"] = info.uid
+            record["process_start_utc"] = info.start_time_utc
+            if not record.get("user"):
+                record["user"] = info.user
+            if record.get("command") in (None, "", "unknown"):
+                record["command"] = info.comm
+
+
+# Shared by port_monitor, egress_monitor and socket_table within one process.
+PROCESS_CACHE = ProcessCache()
@@ -1,17 +1,34 @@
 #!/usr/bin/env python3
 """Root session guard with idle-timeout and allowlisted argv scoping.
 Review before use. No network calls are made from this script.
+
+Each task session (OPENCLAW_TASK_SESSION_ID; callers without one share a
+default scope) holds its own set of approved argvs and its own idle deadline,
+so concurrent tasks never overwrite each other's elevation. Expired sessions
+are dropped lazily when looked up and by a periodic sweep.
+
+State writes are serialized with an exclusive flock on a sibling ".lock" file
+and land atomically (temp file + rename), so concurrent privileged
+invocations never lose updates and lock-free readers always see a complete
+snapshot.
 """
 import argparse
 import json
 import os
+from contextlib import contextmanager
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
 
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locking, writes are still atomic.
+    fcntl = None  # type: ignore[assignment]
 
 DEFAULT_TIMEOUT_MINUTES = 30
+DEFAULT_SESSION_KEY = "__default__"
+SWEEP_INTERVAL_SECONDS = 60
 STATE_PATH = Path.home() / ".openclaw" / "security" / "root-session-state.json"
 
 
@@ -31,10 +48,41 @@ def from_iso(value: Optional[str]) -> Optional[datetime]:
     return datetime.fromisoformat(value)
 
 
+ArgvKey = Tuple[str, ...]
+
+
 @dataclass
-class AllowedCommand:
-    argv: List[str]
-    added_at_utc: str
+class TaskSession:
+    """Elevation scope of one task session: its approved argvs and its own idle deadline."""
+
+    approved_reason: Optional[str]
+    last_elevated_activity_utc: str
+    idle_deadline_utc: str
+    # argv tuple -> added_at_utc; a hash lookup regardless of how many commands are approved.
+    allowed_commands: Dict[ArgvKey, str] = field(default_factory=dict)
+
+    def touch(self, now: datetime, timeout_minutes: int) -> None:
+        self.last_elevated_activity_utc = to_iso(now)
+        self.idle_deadline_utc = to_iso(now + timedelta(minutes=timeout_minutes))
+
+    def expired(self, now: datetime, timeout_minutes: int) -> bool:
+        # The stored deadline, or the caller's (possibly shorter) timeout, whichever comes first.
+        deadline = from_iso(self.idle_deadline_utc)
+        last = from_iso(self.last_elevated_activity_utc)
+        if deadline is None or last is None:
+            return True
+        return now >= deadline or now - last >= timedelta(minutes=timeout_minutes)
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "approved_reason": self.approved_reason,
+            "last_elevated_activity_utc": self.last_elevated_activity_utc,
+            "idle_deadline_utc": self.idle_deadline_utc,
+            "allowed_commands": [
+                {"argv": list(argv), "added_at_utc": added_at_utc}
+                for argv, added_at_utc in self.allowed_commands.items()
+            ],
+        }
 
 
 @dataclass
@@ -44,27 +92,30 @@ class SessionState:
     last_normal_activity_utc: Optional[str]
     last_transition_utc: str
     last_action: str
-    # When in elevated mode, restrict which privileged commands are allowed to run.
-    allowed_commands: List[AllowedCommand] = field(default_factory=list)
-    approved_reason: Optional[str] = None
-    approved_session_id: Optional[str] = None
+    # Per task session elevation scopes; elevated mode means at least one live scope.
+    sessions: Dict[str, TaskSession] = field(default_factory=dict)
+    last_sweep_utc: Optional[str] = None
+
+    def approval_count(self) -> int:
+        return sum(len(s.allowed_commands) for s in self.sessions.values())
 
-    def as_dict(self) -> Dict[str, Optional[str]]:
+    def as_dict(self) -> Dict[str, object]:
         return {
             "privilege_mode": self.privilege_mode,
             "last_elevated_activity_utc": self.last_elevated_activity_utc,
             "last_normal_activity_utc": self.last_normal_activity_utc,
             "last_transition_utc": self.last_transition_utc,
             "last_action": self.last_action,
-            "approved_reason": self.approved_reason,
-            "approved_session_id": self.approved_session_id,
-            "allowed_commands": [
-                {"argv": e.argv, "added_at_utc": e.added_at_utc}
-                for e in self.allowed_commands
-            ],
+            "last_sweep_utc": self.last_sweep_utc,
+            "sessions": {key: session.as_dict() for key, session in self.sessions.items()},
         }
 
 
+def session_key(session_id: Optional[str]) -> str:
+    """Scope key for a task session id; callers without one share DEFAULT_SESSION_KEY."""
+    return session_id or DEFAULT_SESSION_KEY
+
+
 def ensure_parent(path: Path) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
 
@@ -77,48 +128,132 @@ def default_state() -> SessionState:
         last_normal_activity_utc=ts,
         last_transition_utc=ts,
         last_action="init-normal",
-        allowed_commands=[],
-        approved_reason=None,
-        approved_session_id=None,
     )
 
 
+def lock_path(path: Path) -> Path:
+    return path.with_name(path.name + ".lock")
+
+
+@contextmanager
+def state_lock(path: Path) -> Iterator[None]:
+    """Hold an exclusive advisory lock for a read-modify-write of the state file."""
+    ensure_parent(path)
+    fd = os.open(str(lock_path(path)), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        # Closing the descriptor releases the flock.
+        os.close(fd)
+
+
+def _write_atomic(path: Path, text: str, replace: bool = True) -> None:
+    """Write text to a temp file in the same directory, fsync it, then rename it into place.
+
+    With replace=False an existing file is left untouched (used to create defaults
+    without clobbering a state another process just wrote).
+    """
+    ensure_parent(path)
+    # O_EXCL temp name instead of tempfile.mkstemp: importing tempfile costs more than a sudo-shim call should.
+    tmp = str(path.with_name(f".{path.name}.{os.getpid()}.{os.urandom(4).hex()}.tmp"))
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        if replace:
+            os.replace(tmp, path)
+        else:
+            try:
+                os.link(tmp, path)
+            except FileExistsError:
+                pass
+    finally:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+
+
+def _state_text(state: SessionState) -> str:
+    return json.dumps(state.as_dict(), indent=2) + "\n"
+
+
 def load_state(path: Path) -> SessionState:
-    if not path.exists():
+    """Read the state without locking; atomic writes guarantee a complete snapshot."""
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            raw = json.load(f)
+    except FileNotFoundError:
         state = default_state()
-        save_state(path, state)
+        _write_atomic(path, _state_text(state), replace=False)
         return state
-    with path.open("r", encoding="utf-8") as f:
-        raw = json.load(f)
-    allowed_raw = raw.get("allowed_commands") or []
-    allowed: List[AllowedCommand] = []
-    if isinstance(allowed_raw, list):
-        for entry in allowed_raw:
-            if not isinstance(entry, dict):
-                continue
-            argv = entry.get("argv")
-            added_at_utc = entry.get("added_at_utc")
-            if isinstance(argv, list) and all(isinstance(x, str) for x in argv) and isinstance(
-                added_at_utc, str
-            ):
-                allowed.append(AllowedCommand(argv=argv, added_at_utc=added_at_utc))
+    sessions: Dict[str, TaskSession] = {}
+    sessions_raw = raw.get("sessions")
+    if isinstance(sessions_raw, dict):
+        for key, entry in sessions_raw.items():
+            session = _parse_session(entry)
+            if isinstance(key, str) and session is not None:
+                sessions[key] = session
+    elif raw.get("privilege_mode") == "elevated" and raw.get("allowed_commands"):
+        # Pre-session-map state file: carry its single scope over as one session.
+        last = raw.get("last_elevated_activity_utc") or to_iso(now_utc())
+        deadline = from_iso(last) or now_utc()
+        session = _parse_session(
+            {
+                "approved_reason": raw.get("approved_reason"),
+                "last_elevated_activity_utc": last,
+                "idle_deadline_utc": to_iso(deadline + timedelta(minutes=DEFAULT_TIMEOUT_MINUTES)),
+                "allowed_commands": raw.get("allowed_commands"),
+            }
+        )
+        if session is not None:
+            sessions[session_key(raw.get("approved_session_id"))] = session
     return SessionState(
-        privilege_mode=raw.get("privilege_mode", "normal"),
+        privilege_mode="elevated" if sessions else "normal",
         last_elevated_activity_utc=raw.get("last_elevated_activity_utc"),
         last_normal_activity_utc=raw.get("last_normal_activity_utc"),
         last_transition_utc=raw.get("last_transition_utc", to_iso(now_utc())),
         last_action=raw.get("last_action", "unknown"),
+        sessions=sessions,
+        last_sweep_utc=raw.get("last_sweep_utc"),
+    )
+
+
+def _parse_session(entry: object) -> Optional[TaskSession]:
+    if not isinstance(entry, dict):
+        return None
+    last = entry.get("last_elevated_activity_utc")
+    deadline = entry.get("idle_deadline_utc")
+    if not isinstance(last, str) or not isinstance(deadline, str):
+        return None
+    allowed: Dict[ArgvKey, str] = {}
+    allowed_raw = entry.get("allowed_commands") or []
+    if isinstance(allowed_raw, list):
+        for item in allowed_raw:
+            if not isinstance(item, dict):
+                continue
+            argv = item.get("argv")
+            added_at_utc = item.get("added_at_utc")
+            if isinstance(argv, list) and all(isinstance(x, str) for x in argv) and isinstance(
+                added_at_utc, str
+            ):
+                allowed[tuple(argv)] = added_at_utc
+    reason = entry.get("approved_reason")
+    return TaskSession(
+        approved_reason=reason if isinstance(reason, str) else None,
+        last_elevated_activity_utc=last,
+        idle_deadline_utc=deadline,
         allowed_commands=allowed,
-        approved_reason=raw.get("approved_reason"),
-        approved_session_id=raw.get("approved_session_id"),
     )
 
 
 def save_state(path: Path, state: SessionState) -> None:
-    ensure_parent(path)
-    with path.open("w", encoding="utf-8") as f:
-        json.dump(state.as_dict(), f, indent=2)
-        f.write("\n")
+    """Atomically replace the state file; hold state_lock() around the read-modify-write."""
+    _write_atomic(path, _state_text(state))
 
 
 def minutes_since(ts_iso: Optional[str]) -> Optional[float]:
@@ -129,28 +264,58 @@ def minutes_since(ts_iso: Optional[str]) -> Optional[float]:
     return round(delta.total_seconds() / 60.0, 2)
 
 
-def preflight(state: SessionState, timeout_minutes: int) -> int:
+def _after_removal(state: SessionState, now: datetime, action: str) -> None:
+    state.last_transition_utc = to_iso(now)
+    state.last_action = action
+    if not state.sessions:
+        state.privilege_mode = "normal"
+
+
+def sweep_expired(
+    state: SessionState, timeout_minutes: int, now: Optional[datetime] = None, force: bool = False
+) -> int:
+    """Drop every idle-expired session; unless forced, at most once per SWEEP_INTERVAL_SECONDS."""
+    now = now or now_utc()
+    if not state.sessions:
+        return 0
+    last = from_iso(state.last_sweep_utc)
+    if not force and last is not None and (now - last).total_seconds() < SWEEP_INTERVAL_SECONDS:
+        return 0
+    state.last_sweep_utc = to_iso(now)
+    expired = [key for key, session in state.sessions.items() if session.expired(now, timeout_minutes)]
+    for key in expired:
+        del state.sessions[key]
+    if expired:
+        _after_removal(state, now, "timeout-drop")
+    return len(expired)
+
+
+def live_session(
+    state: SessionState, session_id: Optional[str], timeout_minutes: int, now: Optional[datetime] = None
+) -> Optional[TaskSession]:
+    """Look up a session's scope, expiring it lazily if its idle deadline has passed."""
+    now = now or now_utc()
+    key = session_key(session_id)
+    session = state.sessions.get(key)
+    if session is not None and session.expired(now, timeout_minutes):
+        del state.sessions[key]
+        _after_removal(state, now, "timeout-drop")
+        return None
+    return session
+
+
+def preflight_result(state: SessionState, timeout_minutes: int) -> Tuple[Dict[str, object], int]:
     idle_mins = minutes_since(state.last_elevated_activity_utc)
-    timed_out = (
-        state.privilege_mode == "elevated"
-        and idle_mins is not None
-        and idle_mins >= timeout_minutes
-    )
+    swept = sweep_expired(state, timeout_minutes, force=True)
 
     action = "continue-normal"
     approval_required = True
-    if state.privilege_mode == "elevated" and not timed_out:
+    if state.sessions:
         action = "elevated-active"
         # Approval is still required per-command unless the command is already allowlisted.
         approval_required = False
-    elif timed_out:
+    elif swept:
         action = "drop-elevation"
-        state.privilege_mode = "normal"
-        state.allowed_commands = []
-        state.approved_reason = None
-        state.approved_session_id = None
-        state.last_transition_utc = to_iso(now_utc())
-        state.last_action = "timeout-drop"
 
     result = {
         "status": "REQUIRES_APPROVAL" if approval_required else "ELEVATED_AVAILABLE",
@@ -158,105 +323,201 @@ def preflight(state: SessionState, timeout_minutes: int) -> int:
         "idle_minutes_since_elevated": idle_mins,
         "timeout_minutes": timeout_minutes,
         "action": action,
-        "allowed_commands_count": len(state.allowed_commands),
+        "allowed_commands_count": state.approval_count(),
+        "active_sessions": len(state.sessions),
+        "expired_sessions": swept,
     }
+    return result, 2 if approval_required else 0
+
+
+def preflight(state: SessionState, timeout_minutes: int) -> int:
+    result, code = preflight_result(state, timeout_minutes)
     print(json.dumps(result, indent=2))
-    return 2 if approval_required else 0
+    return code
 
 
-def is_allowed(state: SessionState, argv: List[str]) -> bool:
+def is_allowed(state: SessionState, argv: List[str], session_id: Optional[str] = None) -> bool:
     if not argv:
         return False
-    for entry in state.allowed_commands:
-        if entry.argv == argv:
-            return True
-    return False
+    session = state.sessions.get(session_key(session_id))
+    return session is not None and tuple(argv) in session.allowed_commands
 
 
-def authorize(state: SessionState, timeout_minutes: int, argv: List[str], session_id: Optional[str]) -> int:
-    idle_mins = minutes_since(state.last_elevated_activity_utc)
-    timed_out = (
-        state.privilege_mode == "elevated"
-        and idle_mins is not None
-        and idle_mins >= timeout_minutes
-    )
-    if timed_out:
-        state.privilege_mode = "normal"
-        state.allowed_commands = []
-        state.approved_reason = None
-        state.approved_session_id = None
-        state.last_transition_utc = to_iso(now_utc())
-        state.last_action = "timeout-drop"
-
-    session_ok = session_id is None or state.approved_session_id in (None, session_id)
-    allowed = state.privilege_mode == "elevated" and is_allowed(state, argv) and session_ok
+def authorize_result(
+    state: SessionState, timeout_minutes: int, argv: List[str], session_id: Optional[str]
+) -> Tuple[Dict[str, object], int]:
+    now = now_utc()
+    sweep_expired(state, timeout_minutes, now)
+    session = live_session(state, session_id, timeout_minutes, now)
+    allowed = session is not None and bool(argv) and tuple(argv) in session.allowed_commands
     approval_required = not allowed
 
     result = {
         "status": "REQUIRES_APPROVAL" if approval_required else "AUTHORIZED",
         "privilege_mode": state.privilege_mode,
-        "idle_minutes_since_elevated": idle_mins,
+        "idle_minutes_since_elevated": minutes_since(session.last_elevated_activity_utc) if session else None,
         "timeout_minutes": timeout_minutes,
         "allowed": allowed,
-        "allowed_commands_count": len(state.allowed_commands),
+        "allowed_commands_count": len(session.allowed_commands) if session else 0,
         "session_id": session_id,
-        "session_ok": session_ok,
+        "session_ok": session is not None,
+        "active_sessions": len(state.sessions),
     }
-    print(json.dumps(result, indent=2))
-    return 2 if approval_required else 0
+    return result, 2 if approval_required else 0
 
 
-def approve_command(state: SessionState, reason: str, argv: List[str], session_id: Optional[str]) -> None:
-    ts = to_iso(now_utc())
+def authorize(state: SessionState, timeout_minutes: int, argv: List[str], session_id: Optional[str]) -> int:
+    result, code = authorize_result(state, timeout_minutes, argv, session_id)
+    print(json.dumps(result, indent=2))
+    return code
+
+
+def approve_command(
+    state: SessionState,
+    reason: str,
+    argv: List[str],
+    session_id: Optional[str],
+    timeout_minutes: int = DEFAULT_TIMEOUT_MINUTES,
+) -> None:
+    now = now_utc()
+    ts = to_iso(now)
+    session = live_session(state, session_id, timeout_minutes, now)
+    if session is None:
+        session = TaskSession(approved_reason=reason, last_elevated_activity_utc=ts, idle_deadline_utc=ts)
+        state.sessions[session_key(session_id)] = session
+    session.approved_reason = reason
+    session.touch(now, timeout_minutes)
+    if argv:
+        session.allowed_commands.setdefault(tuple(argv), ts)
     state.privilege_mode = "elevated"
     state.last_elevated_activity_utc = ts
     state.last_transition_utc = ts
     state.last_action = "approved-command"
-    state.approved_reason = reason
-    state.approved_session_id = session_id
-    if argv and not is_allowed(state, argv):
-        state.allowed_commands.append(AllowedCommand(argv=argv, added_at_utc=ts))
 
 
-def mark_elevated_used(state: SessionState) -> None:
-    ts = to_iso(now_utc())
-    state.privilege_mode = "elevated"
+def mark_elevated_used(
+    state: SessionState, session_id: Optional[str] = None, timeout_minutes: int = DEFAULT_TIMEOUT_MINUTES
+) -> None:
+    now = now_utc()
+    ts = to_iso(now)
+    session = state.sessions.get(session_key(session_id))
+    if session is not None:
+        session.touch(now, timeout_minutes)
+        state.privilege_mode = "elevated"
     state.last_elevated_activity_utc = ts
     state.last_transition_utc = ts
     state.last_action = "elevated-used"
 
 
 def mark_normal_used(state: SessionState) -> None:
+    # Other sessions may still hold elevation, so only the activity is recorded.
     ts = to_iso(now_utc())
-    state.privilege_mode = "normal"
     state.last_normal_activity_utc = ts
     state.last_transition_utc = ts
     state.last_action = "normal-used"
 
 
-def drop(state: SessionState, reason: str) -> None:
-    ts = to_iso(now_utc())
-    state.privilege_mode = "normal"
-    state.allowed_commands = []
-    state.approved_reason = None
-    state.approved_session_id = None
-    state.last_transition_utc = ts
-    state.last_action = reason
+def drop(state: SessionState, reason: str, session_id: Optional[str] = None) -> None:
+    """Drop one session's scope, or every session's when session_id is None."""
+    if session_id is None:
+        state.sessions.clear()
+    else:
+        state.sessions.pop(session_id, None)
+    _after_removal(state, now_utc(), reason)
 
 
-def status(state: SessionState, timeout_minutes: int) -> None:
-    idle_mins = minutes_since(state.last_elevated_activity_utc)
-    timed_out = (
-        state.privilege_mode == "elevated"
-        and idle_mins is not None
-        and idle_mins >= timeout_minutes
-    )
+def status_result(state: SessionState, timeout_minutes: int) -> Dict[str, object]:
+    now = now_utc()
     result = state.as_dict()
-    result["idle_minutes_since_elevated"] = idle_mins
+    sessions = result["sessions"]
+    expired = 0
+    for key, session in state.sessions.items():
+        timed_out = session.expired(now, timeout_minutes)
+        expired += timed_out
+        sessions[key]["idle_minutes_since_elevated"] = minutes_since(session.last_elevated_activity_utc)  # type: ignore[index]
+        sessions[key]["timed_out"] = timed_out  # type: ignore[index]
+    result["idle_minutes_since_elevated"] = minutes_since(state.last_elevated_activity_utc)
     result["timeout_minutes"] = timeout_minutes
-    result["timed_out"] = timed_out
-    result["approval_required"] = state.privilege_mode != "elevated" or timed_out
-    print(json.dumps(result, indent=2))
+    result["timed_out"] = bool(expired)
+    result["allowed_commands_count"] = state.approval_count()
+    result["approval_required"] = len(state.sessions) == expired
+    return result
+
+
+def status(state: SessionState, timeout_minutes: int) -> None:
+    print(json.dumps(status_result(state, timeout_minutes), indent=2))
+
+
+class GuardOps:
+    """Session-guard transitions applied to an in-memory SessionState.
+
+    Shared by GuardTransaction (file-backed) and guard_daemon.py (resident).
+    """
+
+    OPERATIONS = ("preflight", "authorize", "approve", "elevated_used", "normal_used", "drop", "status")
+
+    def __init__(self, state: SessionState, timeout_minutes: int = DEFAULT_TIMEOUT_MINUTES) -> None:
+        self.state = state
+        self.timeout_minutes = timeout_minutes
+
+    def preflight(self) -> Tuple[Dict[str, object], int]:
+        return preflight_result(self.state, self.timeout_minutes)
+
+    def authorize(self, argv: List[str], session_id: Optional[str] = None) -> Tuple[Dict[str, object], int]:
+        return authorize_result(self.state, self.timeout_minutes, argv, session_id)
+
+    def approve(self, reason: str, argv: List[str], session_id: Optional[str] = None) -> None:
+        approve_command(self.state, reason, argv, session_id, self.timeout_minutes)
+
+    def elevated_used(self, session_id: Optional[str] = None) -> None:
+        mark_elevated_used(self.state, session_id, self.timeout_minutes)
+
+    def normal_used(self) -> None:
+        mark_normal_used(self.state)
+
+    def drop(self, reason: str = "manual-drop", session_id: Optional[str] = None) -> None:
+        drop(self.state, reason, session_id)
+
+    def status(self) -> Dict[str, object]:
+        return status_result(self.state, self.timeout_minutes)
+
+
+class GuardTransaction(GuardOps):
+    """Load the session state once, apply several transitions, save once.
+
+    In-process equivalent of running this script's subcommands back to back:
+
+        with GuardTransaction(state_file, timeout_minutes) as guard:
+            guard.approve(reason, argv, session_id)
+            guard.elevated_used(session_id)
+
+    The state lock is held for the whole block, so keep it short (no prompts
+    inside). The state is written on exit only if a transition changed it, and
+    not at all if the block raised.
+    """
+
+    def __init__(self, state_file: Path = STATE_PATH, timeout_minutes: int = DEFAULT_TIMEOUT_MINUTES) -> None:
+        super().__init__(default_state(), timeout_minutes)
+        self.state_file = Path(os.path.expanduser(str(state_file)))
+        self._loaded: Dict[str, object] = {}
+        self._lock = state_lock(self.state_file)
+
+    def __enter__(self) -> "GuardTransaction":
+        self._lock.__enter__()
+        try:
+            self.state = load_state(self.state_file)
+        except BaseException:
+            self._lock.__exit__(None, None, None)
+            raise
+        self._loaded = self.state.as_dict()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            if exc_type is None and self.state.as_dict() != self._loaded:
+                save_state(self.state_file, self.state)
+        finally:
+            self._lock.__exit__(None, None, None)
 
 
 def parse_args() -> argparse.Namespace:
@@ -296,9 +557,14 @@ def parse_args() -> argparse.Namespace:
         help='Command argv as JSON array, e.g. ["launchctl","print","..."]',
     )
     approve.add_argument("--session-id", help="Task session id to scope approvals")
-    sub.add_parser("elevated-used", help="Mark elevated mode as used now")
+    used = sub.add_parser("elevated-used", help="Mark elevated mode as used now")
+    used.add_argument("--session-id", help="Task session whose idle deadline to extend")
     sub.add_parser("normal-used", help="Mark normal mode activity now")
-    sub.add_parser("drop", help="Drop to normal mode")
+    drop_parser = sub.add_parser("drop", help="Drop to normal mode")
+    drop_parser.add_argument(
+        "--session-id",
+        help=f"Drop only this task session's scope ({DEFAULT_SESSION_KEY} for callers without one); default: all",
+    )
     sub.add_parser("status", help="Print current state and timeout info")
     return parser.parse_args()
 
@@ -306,47 +572,42 @@ def parse_args() -> argparse.Namespace:
 def main() -> int:
     args = parse_args()
     state_file = Path(os.path.expanduser(args.state_file))
-    state = load_state(state_file)
 
-    if args.command == "preflight":
-        code = preflight(state, args.timeout_minutes)
-        save_state(state_file, state)
-        return code
-    if args.command == "authorize":
-        argv = json.loads(args.argv_json)
-        if not isinstance(argv, list) or not all(isinstance(x, str) for x in argv):
-            print('{"status":"ERROR","error":"argv-json must be a JSON array of strings"}')
-            return 2
-        code = authorize(state, args.timeout_minutes, argv, args.session_id)
-        save_state(state_file, state)
-        return code
-    if args.command == "approve":
+    if args.command == "status":
+        # Read-only: lock-free snapshot.
+        status(load_state(state_file), args.timeout_minutes)
+        return 0
+    if args.command in ("authorize", "approve"):
         argv = json.loads(args.argv_json)
         if not isinstance(argv, list) or not all(isinstance(x, str) for x in argv):
             print('{"status":"ERROR","error":"argv-json must be a JSON array of strings"}')
             return 2
-        approve_command(state, args.reason, argv, args.session_id)
-        save_state(state_file, state)
-        print('{"status":"OK","action":"approved-command"}')
-        return 0
-    if args.command == "elevated-used":
-        mark_elevated_used(state)
-        save_state(state_file, state)
-        print('{"status":"OK","action":"elevated-used"}')
-        return 0
-    if args.command == "normal-used":
-        mark_normal_used(state)
-        save_state(state_file, state)
-        print('{"status":"OK","action":"normal-used"}')
-        return 0
-    if args.command == "drop":
-        drop(state, "manual-drop")
-        save_state(state_file, state)
-        print('{"status":"OK","action":"drop-elevation"}')
-        return 0
-    if args.command == "status":
-        status(state, args.timeout_minutes)
-        return 0
+
+    with GuardTransaction(state_file, args.timeout_minutes) as guard:
+        if args.command == "preflight":
+            result, code = guard.preflight()
+            print(json.dumps(result, indent=2))
+            return code
+        if args.command == "authorize":
+            result, code = guard.authorize(argv, args.session_id)
+            print(json.dumps(result, indent=2))
+            return code
+        if args.command == "approve":
+            guard.approve(args.reason, argv, args.session_id)
+            print('{"status":"OK","action":"approved-command"}')
+            return 0
+        if args.command == "elevated-used":
+            guard.elevated_used(args.session_id)
+            print('{"status":"OK","action":"elevated-used"}')
+            return 0
+        if args.command == "normal-used":
+            guard.normal_used()
+            print('{"status":"OK","action":"normal-used"}')
+            return 0
+        if args.command == "drop":
+            guard.drop("manual-drop", args.session_id)
+            print('{"status":"OK","action":"drop-elevation"}')
+            return 0
     return 1
 
 
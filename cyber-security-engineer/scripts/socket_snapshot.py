@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""One TCP socket enumeration shared by the port and egress evaluators.
+
+collect_snapshot() lists LISTEN and ESTABLISHED sockets together in a single
+pass (netlink, procfs, lsof, ss or netstat, in that order of preference, or
+per-namespace procfs with all_netns) and
+build_reports() turns that one snapshot into the same reports port_monitor.py
+and egress_monitor.py print with --json. No network calls are made.
+"""
+import shutil
+import subprocess
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# Allow importing sibling modules when executed from arbitrary cwd.
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+import egress_monitor  # noqa: E402
+import lsof_stream  # noqa: E402
+import port_monitor  # noqa: E402
+import socket_table  # noqa: E402
+
+SNAPSHOT_STATES = {"LISTEN", "ESTABLISHED"}
+
+
+@dataclass
+class SocketSnapshot:
+    tool: str
+    listeners: List[Dict[str, object]] = field(default_factory=list)
+    connections: List[Dict[str, object]] = field(default_factory=list)
+
+
+def _from_rows(rows: List[Dict[str, object]], tool: str) -> SocketSnapshot:
+    # One /proc/*/fd scan attributes listeners and connections together.
+    owned = socket_table.attach_owners(rows)
+    return SocketSnapshot(
+        tool=tool,
+        listeners=port_monitor.entries_from_rows(r for r in owned if r["state"] == "LISTEN"),
+        connections=egress_monitor.connections_from_rows(r for r in owned if r["state"] == "ESTABLISHED"),
+    )
+
+
+def _run_text(cmd: List[str]) -> str:
+    proc = subprocess.run(cmd, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip() or f"Failed to run {cmd[0]}")
+    return proc.stdout
+
+
+def collect_snapshot(all_netns: bool = False) -> SocketSnapshot:
+    if all_netns:
+        if not socket_table.procfs_available():
+            raise RuntimeError("--all-netns requires Linux /proc")
+        return _from_rows(socket_table.read_tcp_sockets_all_netns(SNAPSHOT_STATES), "procfs-netns")
+    if socket_table.netlink_available():
+        try:
+            return _from_rows(socket_table.read_tcp_sockets_netlink(SNAPSHOT_STATES), "netlink")
+        except OSError:
+            pass
+    if socket_table.procfs_available():
+        try:
+            return _from_rows(socket_table.read_tcp_sockets(SNAPSHOT_STATES), "procfs")
+        except OSError:
+            pass
+    if shutil.which("lsof"):
+        records = list(lsof_stream.stream_lsof(["-iTCP", "-sTCP:LISTEN,ESTABLISHED"]))
+        return SocketSnapshot(
+            tool="lsof",
+            listeners=port_monitor.parse_lsof_output(records),
+            connections=egress_monitor.parse_lsof(records),
+        )
+    if sys.platform.startswith("linux") and shutil.which("ss"):
+        text = _run_text(["ss", "-tanp"])
+        established = "\n".join(ln for ln in text.splitlines() if ln.startswith("ESTAB"))
+        return SocketSnapshot(
+            tool="ss",
+            listeners=port_monitor.parse_ss_output(text),
+            connections=egress_monitor.parse_ss(established),
+        )
+    if sys.platform.startswith("win") and shutil.which("netstat"):
+        text = _run_text(["netstat", "-ano", "-p", "tcp"])
+        return SocketSnapshot(
+            tool="netstat",
+            listeners=port_monitor.parse_netstat_windows_output(text),
+            connections=egress_monitor.parse_netstat_windows(text),
+        )
+    raise RuntimeError("No supported socket listing tool found (lsof/ss/netstat)")
+
+
+def build_reports(
+    snapshot: SocketSnapshot,
+    approved_path: Path = port_monitor.DEFAULT_APPROVED_PATH,
+    allow_path: Path = egress_monitor.DEFAULT_ALLOWLIST,
+) -> Tuple[Dict[str, object], Dict[str, object]]:
+    """Return (port report, egress report) evaluated against the same snapshot."""
+    try:
+        port_report = port_monitor.build_report(snapshot.listeners, snapshot.tool, approved_path)
+    except Exception as exc:
+        port_report = {"status": "error", "error": str(exc)}
+    try:
+        egress_report = egress_monitor.build_report(snapshot.connections, snapshot.tool, allow_path)
+    except Exception as exc:
+        egress_report = {"status": "error", "error": str(exc)}
+    return port_report, egress_report
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""Read TCP socket tables directly from the Linux kernel.
+
+Two backends are provided: procfs (/proc/net/tcp*) and NETLINK_SOCK_DIAG.
+Used by port_monitor.py and egress_monitor.py as a fast alternative to
+spawning lsof/ss. read_tcp_sockets_all_netns() additionally covers every
+network namespace on the host (containers). No network calls are made and
+nothing is written to disk.
+"""
+import ipaddress
+import os
+import re
+import socket
+import struct
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from process_info import PROCESS_CACHE, ProcessCache, username_for_uid
+
+PROC_ROOT = Path("/proc")
+
+# Kernel TCP state codes as printed in the `st` column of /proc/net/tcp*.
+TCP_STATES = {
+    "01": "ESTABLISHED",
+    "02": "SYN_SENT",
+    "03": "SYN_RECV",
+    "04": "FIN_WAIT1",
+    "05": "FIN_WAIT2",
+    "06": "TIME_WAIT",
+    "07": "CLOSE",
+    "08": "CLOSE_WAIT",
+    "09": "LAST_ACK",
+    "0A": "LISTEN",
+    "0B": "CLOSING",
+}
+STATE_CODES = {name: code for code, name in TCP_STATES.items()}
+
+HOST_NETNS = "host"
+DEFAULT_NETNS_WORKERS = 8
+_CONTAINER_ID = re.compile(r"([0-9a-f]{64})")
+
+# linux/netlink.h, linux/sock_diag.h, linux/inet_diag.h
+NETLINK_SOCK_DIAG = 4
+SOCK_DIAG_BY_FAMILY = 20
+NLM_F_REQUEST = 0x1
+NLM_F_DUMP = 0x300
+NLMSG_ERROR = 0x2
+NLMSG_DONE = 0x3
+NLMSG_HDR = struct.Struct("=IHHII")
+INET_DIAG_REQ_V2 = struct.Struct("=BBBBI48x")
+# family, state, timer, retrans, sport, dport, src, dst, ifindex, cookie, expires, rqueue, wqueue, uid, inode.
+# Ports and addresses in inet_diag_sockid are network byte order; the rest is host order.
+INET_DIAG_MSG = struct.Struct("=BBBB2s2s16s16sI8sIIIII")
+
+
+def procfs_available(proc_root: Path = PROC_ROOT) -> bool:
+    return sys.platform.startswith("linux") and os.access(str(proc_root / "net" / "tcp"), os.R_OK)
+
+
+def _swap_words(raw: bytes) -> bytes:
+    # The kernel prints each 32-bit word of the address in host byte order.
+    if sys.byteorder != "little":
+        return raw
+    return b"".join(raw[i : i + 4][::-1] for i in range(0, len(raw), 4))
+
+
+def decode_address(value: str) -> Tuple[str, int]:
+    """Decode `0100007F:1F90` (or the 32-hex-digit IPv6 form) into (host, port)."""
+    hex_addr, hex_port = value.split(":", 1)
+    raw = _swap_words(bytes.fromhex(hex_addr))
+    port = int(hex_port, 16)
+    if len(raw) == 4:
+        return ".".join(str(b) for b in raw), port
+    # IPv4-mapped IPv6 (::ffff:a.b.c.d) is reported as plain IPv4, like lsof does.
+    if raw[:12] == b"\x00" * 10 + b"\xff\xff":
+        return ".".join(str(b) for b in raw[12:]), port
+    return str(ipaddress.IPv6Address(raw)), port
+
+
+def read_tcp_table(path: Path, states: Optional[Set[str]] = None) -> List[Dict[str, object]]:
+    """Parse one /proc/net/tcp or tcp6 file, optionally keeping only the given state names."""
+    codes = {STATE_CODES[s] for s in states} if states else None
+    rows: List[Dict[str, object]] = []
+    with path.open("r", encoding="ascii") as f:
+        next(f, None)  # header
+        for line in f:
+            parts = line.split()
+            if len(parts) < 10:
+                continue
+            state = parts[3]
+            if codes is not None and state not in codes:
+                continue
+            try:
+                local_host, local_port = decode_address(parts[1])
+                remote_host, remote_port = decode_address(parts[2])
+                uid = int(parts[7])
+                inode = int(parts[9])
+            except ValueError:
+                continue
+            rows.append(
+                {
+                    "local_host": local_host,
+                    "local_port": local_port,
+                    "remote_host": remote_host,
+                    "remote_port": remote_port,
+                    "state": TCP_STATES.get(state, state),
+                    "uid": uid,
+                    "inode": inode,
+                }
+            )
+    return rows
+
+
+def read_tcp_sockets(
+    states: Optional[Set[str]] = None, net_dir: Path = PROC_ROOT / "net"
+) -> List[Dict[str, object]]:
+    rows: List[Dict[str, object]] = []
+    for name in ("tcp", "tcp6"):
+        path = net_dir / name
+        if not path.exists():
+            continue
+        rows.extend(read_tcp_table(path, states))
+    return rows
+
+
+def _diag_host(family: int, raw: bytes) -> str:
+    if family == socket.AF_INET:
+        return socket.inet_ntop(socket.AF_INET, raw[:4])
+    if raw[:12] == b"\x00" * 10 + b"\xff\xff":
+        return socket.inet_ntop(socket.AF_INET, raw[12:])
+    return socket.inet_ntop(socket.AF_INET6, raw)
+
+
+def _split_diag_chunk(data: bytes, seq: int) -> Tuple[List[bytes], bool]:
+    """Return (inet_diag_msg payloads, dump finished) for one recv() buffer."""
+    hdr_size = NLMSG_HDR.size
+    msg_end = hdr_size + INET_DIAG_MSG.size
+    size = len(data)
+    # Fast path: a full dump chunk is normally a run of messages with byte-identical
+    # headers (same length, type, flags, seq). Verify that and slice without
+    # unpacking each header individually.
+    if size >= hdr_size:
+        head = data[:hdr_size]
+        msg_len, msg_type, _, msg_seq, _ = NLMSG_HDR.unpack(head)
+        stride = (msg_len + 3) & ~3
+        if (
+            msg_len >= msg_end
+            and size % stride == 0
+            and msg_type == SOCK_DIAG_BY_FAMILY
+            and msg_seq == seq
+        ):
+            count = size // stride
+            words = memoryview(data).cast("I")
+            step = stride // 4
+            # Compare each header word across all messages with strided C-level slices.
+            if all(words[i::step].tobytes() == head[i * 4 : i * 4 + 4] * count for i in range(hdr_size // 4)):
+                return [data[o + hdr_size : o + msg_end] for o in range(0, size, stride)], False
+    payloads: List[bytes] = []
+    offset = 0
+    while offset + hdr_size <= size:
+        msg_len, msg_type, _, msg_seq, _ = NLMSG_HDR.unpack_from(data, offset)
+        if msg_len < hdr_size:
+            return payloads, True
+        if msg_seq == seq:
+            if msg_type == NLMSG_DONE:
+                return payloads, True
+            if msg_type == NLMSG_ERROR:
+                (errno_neg,) = struct.unpack_from("=i", data, offset + hdr_size)
+                raise OSError(-errno_neg, "sock_diag dump failed")
+            if msg_type == SOCK_DIAG_BY_FAMILY:
+                payloads.append(data[offset + hdr_size : offset + msg_end])
+        offset += (msg_len + 3) & ~3
+    return payloads, False
+
+
+def _netlink_dump(sock: socket.socket, family: int, state_mask: int, seq: int) -> Iterator[bytes]:
+    """Yield the raw inet_diag_msg payload of every socket in one dump."""
+    req = INET_DIAG_REQ_V2.pack(family, socket.IPPROTO_TCP, 0, 0, state_mask)
+    hdr = NLMSG_HDR.pack(NLMSG_HDR.size + len(req), SOCK_DIAG_BY_FAMILY, NLM_F_REQUEST | NLM_F_DUMP, seq, 0)
+    sock.send(hdr + req)
+    while True:
+        payloads, done = _split_diag_chunk(sock.recv(1 << 17), seq)
+        yield from payloads
+        if done:
+            return
+
+
+def decode_diag_msg(raw: bytes) -> Dict[str, object]:
+    fam, state, _, _, sport, dport, src, dst, _, _, _, _, _, uid, inode = INET_DIAG_MSG.unpack(raw)
+    return {
+        "local_host": _diag_host(fam, src),
+        "local_port": int.from_bytes(sport, "big"),
+        "remote_host": _diag_host(fam, dst),
+        "remote_port": int.from_bytes(dport, "big"),
+        "state": TCP_STATES.get(f"{state:02X}", str(state)),
+        "uid": uid,
+        "inode": inode,
+    }
+
+
+def netlink_available() -> bool:
+    return sys.platform.startswith("linux") and hasattr(socket, "AF_NETLINK")
+
+
+def _state_mask(states: Optional[Set[str]]) -> int:
+    if not states:
+        return 0xFFFFFFFF
+    mask = 0
+    for name in states:
+        mask |= 1 << int(STATE_CODES[name], 16)
+    return mask
+
+
+def _iter_netlink(states: Optional[Set[str]]) -> Iterator[bytes]:
+    state_mask = _state_mask(states)
+    sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_SOCK_DIAG)
+    try:
+        sock.bind((0, 0))
+        yield from _netlink_dump(sock, socket.AF_INET, state_mask, 1)
+        yield from _netlink_dump(sock, socket.AF_INET6, state_mask, 2)
+    finally:
+        sock.close()
+
+
+def read_tcp_sockets_netlink(states: Optional[Set[str]] = None) -> List[Dict[str, object]]:
+    """Bulk-dump TCP sockets (v4 + v6) via NETLINK_SOCK_DIAG, filtered by state in the kernel."""
+    return [decode_diag_msg(raw) for raw in _iter_netlink(states)]
+
+
+def read_tcp_socket_keys_netlink(states: Optional[Set[str]] = None) -> Dict[bytes, bytes]:
+    """Like read_tcp_sockets_netlink but undecoded: {socket cookie: raw msg}.
+
+    The kernel socket cookie is unique for the lifetime of a socket, so this is
+    meant for high-frequency samplers that diff consecutive snapshots and only
+    decode (with decode_diag_msg) the sockets that actually changed.
+    """
+    return {raw[44:52]: raw for raw in _iter_netlink(states)}
+
+
+def map_socket_inodes(
+    wanted: Optional[Set[int]] = None, proc_root: Path = PROC_ROOT
+) -> Dict[int, List[Tuple[int, str]]]:
+    """Map socket inode -> [(pid, comm), ...] with one pass over /proc/*/fd.
+
+    Processes we are not allowed to inspect are skipped silently, so an
+    unprivileged caller only sees its own sockets (same as lsof).
+    """
+    owners: Dict[int, List[Tuple[int, str]]] = {}
+    # The shared cache reads /proc; any other procfs root gets its own.
+    cache = PROCESS_CACHE if Path(proc_root) == PROCESS_CACHE.proc_root else ProcessCache(Path(proc_root))
+    try:
+        pids = [name for name in os.listdir(str(proc_root)) if name.isdigit()]
+    except OSError:
+        return owners
+    for pid in pids:
+        fd_dir = f"{proc_root}/{pid}/fd"
+        try:
+            fds = os.listdir(fd_dir)
+        except OSError:
+            continue
+        comm: Optional[str] = None
+        for fd in fds:
+            try:
+                target = os.readlink(f"{fd_dir}/{fd}")
+            except OSError:
+                continue
+            if not target.startswith("socket:["):
+                continue
+            inode = int(target[8:-1])
+            if wanted is not None and inode not in wanted:
+                continue
+            if comm is None:
+                info = cache.get(int(pid))
+                comm = info.comm if info is not None else "unknown"
+            owners.setdefault(inode, []).append((int(pid), comm))
+    return owners
+
+
+def attach_owners(rows: Iterable[Dict[str, object]], proc_root: Path = PROC_ROOT) -> List[Dict[str, object]]:
+    """Expand socket rows into one row per owning process, adding command/pid/user."""
+    rows = list(rows)
+    owners = map_socket_inodes({int(r["inode"]) for r in rows}, proc_root)
+    out: List[Dict[str, object]] = []
+    for row in rows:
+        user = username_for_uid(int(row["uid"]))
+        procs = owners.get(int(row["inode"])) or [("unknown", "unknown")]
+        for pid, comm in procs:
+            out.append({**row, "command": comm, "pid": pid, "user": user})
+    return out
+
+
+def netns_inode(pid: object, proc_root: Path = PROC_ROOT) -> Optional[int]:
+    try:
+        return os.stat(f"{proc_root}/{pid}/ns/net").st_ino
+    except OSError:
+        return None
+
+
+def discover_net_namespaces(proc_root: Path = PROC_ROOT) -> Dict[int, int]:
+    """Map each distinct network namespace inode to one representative PID (the lowest)."""
+    namespaces: Dict[int, int] = {}
+    try:
+        pids = sorted(int(name) for name in os.listdir(str(proc_root)) if name.isdigit())
+    except OSError:
+        return namespaces
+    for pid in pids:
+        inode = netns_inode(pid, proc_root)
+        if inode is not None and inode not in namespaces:
+            namespaces[inode] = pid
+    return namespaces
+
+
+def container_id_for(pid: int, proc_root: Path = PROC_ROOT) -> Optional[str]:
+    """Best-effort short container id (docker/containerd/CRI-O) from /proc/<pid>/cgroup."""
+    try:
+        with open(f"{proc_root}/{pid}/cgroup", "r", encoding="utf-8", errors="replace") as f:
+            match = _CONTAINER_ID.search(f.read())
+    except OSError:
+        return None
+    return match.group(1)[:12] if match else None
+
+
+def _read_namespace(
+    inode: int, pid: int, host_inode: Optional[int], states: Optional[Set[str]], proc_root: Path
+) -> List[Dict[str, object]]:
+    container_id = None if inode == host_inode else container_id_for(pid, proc_root)
+    if inode == host_inode:
+        label = HOST_NETNS
+    else:
+        label = container_id or f"net:[{inode}]"
+    try:
+        rows = read_tcp_sockets(states, proc_root / str(pid) / "net")
+    except OSError:
+        # The representative process exited or is not inspectable.
+        return []
+    for row in rows:
+        row["netns"] = label
+        row["netns_inode"] = inode
+        row["container_id"] = container_id
+    return rows
+
+
+def read_tcp_sockets_all_netns(
+    states: Optional[Set[str]] = None,
+    max_workers: int = DEFAULT_NETNS_WORKERS,
+    proc_root: Path = PROC_ROOT,
+) -> List[Dict[str, object]]:
+    """Read TCP sockets from every network namespace, tagging rows with netns/container_id.
+
+    Each namespace is read through a representative PID's /proc/<pid>/net/tcp*,
+    with namespaces scanned in parallel on a bounded thread pool. Socket inodes
+    are global, so attach_owners() still works on the combined rows.
+    """
+    namespaces = discover_net_namespaces(proc_root)
+    host_inode = netns_inode("self", proc_root)
+    if not namespaces:
+        return []
+    workers = max(1, min(max_workers, len(namespaces)))
+    rows: List[Dict[str, object]] = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_read_namespace, inode, pid, host_inode, states, proc_root)
+            for inode, pid in namespaces.items()
+        ]
+        for future in futures:
+            rows.extend(future.result())
+    return rows
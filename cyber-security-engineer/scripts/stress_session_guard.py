@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""Stress test for concurrent root-session state updates.
+
+Runs N worker processes against one temporary state file (never the real
+~/.openclaw state) while a reader process polls it lock-free:
+
+  phase 1  every worker approves K distinct argvs in its own task session
+           with no drop; all N*K approvals must be present afterwards (no
+           lost updates)
+  phase 2  every worker runs K authorize/approve/drop cycles in a second
+           session of its own; those sessions must be gone afterwards while
+           every phase-1 session keeps all of its approvals
+
+The reader counts snapshots that fail to parse (torn writes). Exits non-zero
+if any check fails. No network calls are made.
+"""
+import argparse
+import json
+import multiprocessing
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from root_session_guard import GuardTransaction, load_state  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Stress-test concurrent session guard updates")
+    p.add_argument("--workers", type=int, default=8, help="Parallel worker processes")
+    p.add_argument("--cycles", type=int, default=50, help="Operations per worker per phase")
+    p.add_argument("--json", action="store_true", help="JSON output")
+    return p.parse_args()
+
+
+def approve_worker(state_file: str, worker: int, cycles: int) -> None:
+    for i in range(cycles):
+        with GuardTransaction(Path(state_file)) as guard:
+            guard.approve("stress", ["/usr/bin/true", f"w{worker}", f"c{i}"], f"approve-{worker}")
+
+
+def cycle_worker(state_file: str, worker: int, cycles: int) -> None:
+    for i in range(cycles):
+        argv = ["/usr/bin/true", f"w{worker}", f"c{i}"]
+        session = f"cycle-{worker}"
+        with GuardTransaction(Path(state_file)) as guard:
+            guard.authorize(argv, session)
+        with GuardTransaction(Path(state_file)) as guard:
+            guard.approve("stress", argv, session)
+            guard.elevated_used(session)
+        with GuardTransaction(Path(state_file)) as guard:
+            guard.drop("post-command", session)
+
+
+def reader(state_file: str, stop, counters) -> None:
+    reads = torn = 0
+    while not stop.is_set():
+        try:
+            text = Path(state_file).read_text(encoding="utf-8")
+        except FileNotFoundError:
+            continue
+        reads += 1
+        try:
+            json.loads(text)
+        except ValueError:
+            torn += 1
+    counters["reads"] = reads
+    counters["torn"] = torn
+
+
+def run_phase(target, state_file: str, workers: int, cycles: int) -> float:
+    procs = [multiprocessing.Process(target=target, args=(state_file, w, cycles)) for w in range(workers)]
+    start = time.perf_counter()
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+    if any(proc.exitcode != 0 for proc in procs):
+        raise RuntimeError("a worker process failed")
+    return time.perf_counter() - start
+
+
+def main() -> int:
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        state_file = str(Path(tmp) / "root-session-state.json")
+        with multiprocessing.Manager() as manager:
+            counters: Dict[str, int] = manager.dict()
+            stop = manager.Event()
+            watcher = multiprocessing.Process(target=reader, args=(state_file, stop, counters))
+            watcher.start()
+            try:
+                approve_secs = run_phase(approve_worker, state_file, args.workers, args.cycles)
+                approved = load_state(Path(state_file)).approval_count()
+                cycle_secs = run_phase(cycle_worker, state_file, args.workers, args.cycles)
+                final = load_state(Path(state_file))
+            finally:
+                stop.set()
+                watcher.join()
+            reads, torn = counters.get("reads", 0), counters.get("torn", 0)
+
+    expected = args.workers * args.cycles
+    failures: List[str] = []
+    if approved != expected:
+        failures.append(f"lost updates: {expected - approved} of {expected} approvals missing")
+    if any(key.startswith("cycle-") for key in final.sessions):
+        failures.append("cycle sessions were not dropped")
+    if final.approval_count() != expected:
+        failures.append("dropping cycle sessions disturbed the approve-phase sessions")
+    if torn:
+        failures.append(f"{torn} torn reads")
+    result = {
+        "status": "ok" if not failures else "fail",
+        "workers": args.workers,
+        "cycles": args.cycles,
+        "approvals_expected": expected,
+        "approvals_present": approved,
+        "final_sessions": len(final.sessions),
+        "final_approvals": final.approval_count(),
+        "lock_free_reads": reads,
+        "torn_reads": torn,
+        "approve_phase_ops_per_sec": round(expected / approve_secs, 1),
+        "cycle_phase_cycles_per_sec": round(expected / cycle_secs, 1),
+        "failures": failures,
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        for key, value in result.items():
+            print(f"{key:>28}: {value}")
+    return 0 if not failures else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,18 @@
+"""Entry point for the ~/.openclaw/bin/sudo shim.
+
+Runs guarded_privileged_exec.main() with guarded_privileged_exec imported as a
+module rather than executed as __main__, so its bytecode comes from
+__pycache__ (revalidated against the source mtime) instead of being
+recompiled on every sudo call. The shim runs this with python3 -I -S.
+"""
+import os
+import sys
+
+_SCRIPTS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, _SCRIPTS)
+# Usage and error messages name the real script, as when it is run directly.
+sys.argv[0] = os.path.join(_SCRIPTS, "guarded_privileged_exec.py")
+
+from guarded_privileged_exec import main  # noqa: E402
+
+raise SystemExit(main())